@@ -2,20 +2,64 @@ import chess
 import chess.engine
 import chess.pgn
 import io
-from engines import init_stockfish
-from movegen import get_ordered_moves
+import chess.polyglot
+from engines import init_stockfish, EnginePool, EvalCache
+from batch_eval import ordered_moves
 
-engine = init_stockfish()
+engine = None  # shared Stockfish process, started on first use, see get_engine
+BEST_MOVE_LIMIT = chess.engine.Limit(time=0.5)
+ACPL_LIMIT = chess.engine.Limit(depth=15)
+BLUNDER_FRACTION = 0.25  # the bottom quarter of the ordered moves are blunders
 
+# Stockfish processes the post-game analysis is spread over, started on first use
+_engine_pool = None
 
-# TODO: make asynchronous
-def analyse_best_move(pgn_source, is_pgn_file=False):
+
+def get_engine() -> chess.engine.SimpleEngine:
+    """Get the shared Stockfish process, starting it on first use."""
+    global engine
+    if engine is None:
+        engine = init_stockfish()
+    return engine
+
+
+def get_engine_pool(size: int) -> EnginePool:
+    """
+    Get the analysis pool, with the shared engine as one of its processes.
+
+    Args:
+        size (int): Number of Stockfish processes.
+
+    Returns:
+        EnginePool: The pool.
+    """
+    global _engine_pool
+    if _engine_pool is not None and len(_engine_pool.engines) != size:
+        close_engine_pool()
+    if _engine_pool is None:
+        _engine_pool = EnginePool.start(size, [get_engine()])
+    return _engine_pool
+
+
+def close_engine_pool():
+    """Stop the analysis processes, apart from the shared engine."""
+    global _engine_pool
+    if _engine_pool is not None:
+        _engine_pool.close(keep=[engine])
+        _engine_pool = None
+
+
+def analyse_best_move(pgn_source, is_pgn_file=False, limit=BEST_MOVE_LIMIT, engines=1):
     """Analyse a PGN file or string with Stockfish and compares White's moves between the PGN and Stockfish's best move.\n
     Used for the best move counter in Chess.NET.
+    White's positions are searched in parallel by a pool of Stockfish processes, each from a new game, and their best
+    moves are merged back in game order. With a depth limit the count is the same for any number of engines.
 
     Args:
         pgn_source (str): PGN string to analyse.
         is_pgn_file (bool, optional): Used for analysing a PGN file from disk. Defaults to False.
+        limit (chess.engine.Limit, optional): Search limit per position. Defaults to 0.5 seconds.
+        engines (int, optional): Number of Stockfish processes. Defaults to 1.
 
     Returns:
         int: Number of times Stockfish agreed with White's move.
@@ -29,18 +73,20 @@ def analyse_best_move(pgn_source, is_pgn_file=False):
 
     board = game.board()
     stockfish_agree_count = 0
-
+    white_positions = []  # position before each of White's moves, and the move played
     for move in game.mainline_moves():
         if board.turn == chess.WHITE:
-            # Get Stockfish's best move for the current position
-            stockfish_move = engine.play(board, chess.engine.Limit(time=0.5)).move
-            print(stockfish_move.uci())
+            white_positions.append((board.copy(), move))
+        board.push(move)
 
-            # Compare moves
-            if move == stockfish_move:
-                stockfish_agree_count += 1
+    # Get Stockfish's best move for each position
+    results = get_engine_pool(engines).play([position for position, _ in white_positions], limit)
+    for (_, move), result in zip(white_positions, results):
+        print(result.move.uci())
 
-        board.push(move)
+        # Compare moves
+        if move == result.move:
+            stockfish_agree_count += 1
 
     print("Number of times Stockfish agreed with White's move:", stockfish_agree_count)
     return stockfish_agree_count
@@ -69,10 +115,7 @@ def analyse_blunders(pgn_source, is_pgn_file=False):
     blunder_count = 0
 
     for move in game.mainline_moves():
-        move_list = get_ordered_moves(board)  # get ordered moves, ordered by quality dsc
-        num_blunders = int(len(move_list) * 0.25)  # bottom 25% of moves are considered blunders
-        blunder_moves = move_list[-num_blunders:]
-        if move in blunder_moves:
+        if is_blunder(board, move):
             blunder_count += 1
         board.push(move)
 
@@ -80,29 +123,50 @@ def analyse_blunders(pgn_source, is_pgn_file=False):
     return blunder_count
 
 
-def generate_ACPL(board, move, engine=None):
+def is_blunder(board, move):
+    """Whether move is in the bottom BLUNDER_FRACTION of the position's moves, ordered by quality."""
+    move_list = ordered_moves(board)  # get ordered moves, ordered by quality dsc (vectorised)
+    num_blunders = int(len(move_list) * BLUNDER_FRACTION)
+    blunder_moves = move_list[-num_blunders:]
+    return move in blunder_moves
+
+
+def generate_ACPL(board, move, engine=None, cache=None):
     """
     Evaluate the given move by comparing it against the engine's best move.
     The ACPL is positive if it's a loss for White, and negative if it's a loss for Black,
     indicating the move's quality from the player's perspective.
 
     Args:
-        engine (chess.engine.SimpleEngine): The chess engine for evaluation.
+        engine (chess.engine.SimpleEngine, optional): The chess engine for evaluation. Defaults to the shared engine.
         board (chess.Board): The current board state before the move.
         move (chess.Move): The move to evaluate.
+        cache (EvalCache, optional): Analyses of the game so far, which the new analyses are added to.
 
     Returns:
         int: The centipawn loss of the move, compared to the engine's best move,
              positive for White's loss and negative for Black's loss.
     """
+    if engine is None:
+        engine = get_engine()
+    if cache is None:
+        cache = EvalCache()
 
     # evaluate before the move
-    info_before = engine.analyse(board, chess.engine.Limit(depth=15))
-    score_before = info_before["score"].pov(board.turn).score(mate_score=10000)
+    info_before = cache.analyse(engine, board, ACPL_LIMIT)
 
     # evaluate after the move
     board.push(move)
-    info_after = engine.analyse(board, chess.engine.Limit(depth=15))
+    info_after = cache.analyse(engine, board, ACPL_LIMIT)
+    return centipawn_loss(board, info_before, info_after)
+
+
+def centipawn_loss(board, info_before, info_after):
+    """
+    ACPL of the move just made on board, from the engine's analyses of the positions before and after it.
+    See generate_ACPL.
+    """
+    score_before = info_before["score"].pov(not board.turn).score(mate_score=10000)
     score_after = info_after["score"].pov(board.turn).score(mate_score=10000)
 
     if board.turn == chess.BLACK:
@@ -114,3 +178,69 @@ def generate_ACPL(board, move, engine=None):
 
     cp_loss = cp_loss
     return cp_loss
+
+
+def analyse_game(board, cache=None, limit=ACPL_LIMIT, engines=1, acpl=True):
+    """
+    Analyse a finished game in one replay, for the GAME_END response: best move agreement and ACPL of White's moves,
+    and the blunder count of every move.
+    The best move and the scores come from the same analysis of each position. Positions already in cache, like the
+    ones generate_ACPL analysed during the game, are not searched again, and the rest are searched in parallel by
+    a pool of Stockfish processes.
+
+    Args:
+        board (chess.Board): Board of the game, with every move in its move stack.
+        cache (EvalCache, optional): Analyses of the game so far. Defaults to an empty cache.
+        limit (chess.engine.Limit, optional): Search limit per position. Defaults to ACPL_LIMIT, the in-game limit.
+        engines (int, optional): Number of Stockfish processes. Defaults to 1.
+        acpl (bool, optional): Compute the ACPL too, which needs the positions after White's moves searched as well.
+
+    Returns:
+        dict: bestMoveCount, blunderCount and the ACPL of each of White's moves (acpl, empty if not computed).
+    """
+    if cache is None:
+        cache = EvalCache()
+
+    # one replay: the blunder check of each move, and the positions around White's moves for the engine
+    replay = board.root()
+    blunder_count = 0
+    white_moves = []  # (position before, position after, move)
+    for move in board.move_stack:
+        if is_blunder(replay, move):
+            blunder_count += 1
+        before = replay.copy() if replay.turn == chess.WHITE else None
+        replay.push(move)
+        if before is not None:
+            white_moves.append((before, replay.copy(), move))
+
+    # each position is searched at most once, and only if the game has not already searched it
+    infos, pending = {}, {}
+    for before, after, _ in white_moves:
+        for position in (before, after) if acpl else (before,):
+            key = chess.polyglot.zobrist_hash(position)
+            if key in infos or key in pending:
+                continue
+            info = cache.get(position, limit)
+            if info is None:
+                pending[key] = position
+            else:
+                infos[key] = info
+    searched = get_engine_pool(engines).analyse(list(pending.values()), limit) if pending else []
+    for (key, position), info in zip(pending.items(), searched):
+        cache.put(position, limit, info)
+        infos[key] = info
+
+    best_move_count = 0
+    acpl_values = []
+    for before, after, move in white_moves:
+        info_before = infos[chess.polyglot.zobrist_hash(before)]
+        pv = info_before.get("pv")  # empty for a stored analysis without a best move
+        if pv and move == pv[0]:
+            best_move_count += 1
+        if acpl:
+            acpl_values.append(centipawn_loss(after, info_before, infos[chess.polyglot.zobrist_hash(after)]))
+
+    print("Number of times Stockfish agreed with White's move:", best_move_count)
+    print("Number of blunders:", blunder_count)
+    print(cache)
+    return {"bestMoveCount": best_move_count, "blunderCount": blunder_count, "acpl": acpl_values}
@@ -0,0 +1,159 @@
+import chess
+import numpy as np
+from eval import evaluate_piece, piece_value, middle_game_tables, end_game_tables
+
+# Vectorised versions of eval.evaluate_board and eval.move_value for scoring many positions or moves in one pass.
+# Positions are unpacked from python-chess bitboards into (boards, 12, 64) piece planes, which are multiplied
+# with the piece-square tables of eval.py laid out as arrays.
+
+# plane index of each (color, piece type): white pawn..king are 0-5, black pawn..king are 6-11
+PLANES = [(color, piece_type) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+
+# piece value + piece-square value, signed from White's view, [plane, square]
+MIDDLE_GAME_TABLE = np.array([middle_game_tables[color][piece_type] for color, piece_type in PLANES], dtype=np.int64)
+END_GAME_TABLE = np.array([end_game_tables[color][piece_type] for color, piece_type in PLANES], dtype=np.int64)
+
+# piece-square value only, as used by move_value, [end game, color, piece type, square]
+SQUARE_VALUE = np.zeros((2, 2, 7, 64), dtype=np.float64)
+for _end_game in (False, True):
+    for _color in chess.COLORS:
+        for _piece_type in chess.PIECE_TYPES:
+            SQUARE_VALUE[int(_end_game), int(_color), _piece_type] = [
+                evaluate_piece(chess.Piece(_piece_type, _color), square, _end_game) for square in chess.SQUARES]
+
+PIECE_VALUE = np.zeros(7, dtype=np.float64)  # indexed by piece type, 0 is an empty square
+for _piece_type, _value in piece_value.items():
+    PIECE_VALUE[_piece_type] = _value
+
+_QUEEN_PLANES = [PLANES.index((color, chess.QUEEN)) for color in chess.COLORS]
+_MINOR_PLANES = [PLANES.index((color, piece_type)) for color in chess.COLORS
+                 for piece_type in (chess.KNIGHT, chess.BISHOP)]
+
+
+def board_planes(boards: list[chess.Board]) -> np.ndarray:
+    """
+    Unpack the piece bitboards of each board into 0/1 planes.
+
+    Args:
+        boards (list[chess.Board]): Positions to unpack.
+
+    Returns:
+        np.ndarray: uint8 array of shape (len(boards), 12, 64), indexed [board, plane, square].
+    """
+    bitboards = np.array([[board.pieces_mask(piece_type, color) for color, piece_type in PLANES]
+                          for board in boards], dtype=np.uint64).reshape(len(boards), 12)
+    planes = np.unpackbits(bitboards.astype("<u8").view(np.uint8), bitorder="little")
+    return planes.reshape(len(boards), 12, 64)
+
+
+def end_game_mask(planes: np.ndarray) -> np.ndarray:
+    """Vectorised check_end_game for the planes returned by board_planes."""
+    counts = planes.sum(axis=2, dtype=np.int64)
+    queens = counts[:, _QUEEN_PLANES].sum(axis=1)
+    minor_pieces = counts[:, _MINOR_PLANES].sum(axis=1)
+    return (queens == 0) | ((queens == 2) & (minor_pieces <= 1))
+
+
+def evaluate_boards(boards: list[chess.Board]) -> np.ndarray:
+    """
+    Evaluate many positions at once. Gives the same scores as eval.evaluate_board.
+
+    Args:
+        boards (list[chess.Board]): Positions to evaluate.
+
+    Returns:
+        np.ndarray: int64 centipawn scores, (+) for white and (-) for black.
+    """
+    if len(boards) == 0:
+        return np.zeros(0, dtype=np.int64)
+    planes = board_planes(boards).astype(np.int64)
+    middle_game = np.einsum("bps,ps->b", planes, MIDDLE_GAME_TABLE)
+    end_game = np.einsum("bps,ps->b", planes, END_GAME_TABLE)
+    return np.where(end_game_mask(planes), end_game, middle_game)
+
+
+def evaluate_game(board: chess.Board) -> np.ndarray:
+    """
+    Evaluate every position reached in a game, from the starting position to the current one.
+
+    Args:
+        board (chess.Board): Board whose move stack holds the game.
+
+    Returns:
+        np.ndarray: evaluate_board score of each position, len(board.move_stack) + 1 entries.
+    """
+    replay = board.root()
+    positions = [replay.copy(stack=False)]
+    for move in board.move_stack:
+        replay.push(move)
+        positions.append(replay.copy(stack=False))
+    return evaluate_boards(positions)
+
+
+def move_values(board: chess.Board, moves: list[chess.Move] | None = None, end_game: bool | None = None) -> np.ndarray:
+    """
+    Value many moves of one position at once. Gives the same values as eval.move_value.
+
+    Args:
+        board (chess.Board): Position the moves are made from.
+        moves (list[chess.Move], optional): Moves to value. Defaults to all legal moves.
+        end_game (bool, optional): Whether the game is in an end game state. Computed from the board if None.
+
+    Raises:
+        Exception: If there is no piece at the from square of a move
+
+    Returns:
+        np.ndarray: float64 centipawn values, in the order of moves.
+    """
+    moves = list(board.legal_moves) if moves is None else list(moves)
+    if not moves:
+        return np.zeros(0, dtype=np.float64)
+
+    planes = board_planes([board])
+    if end_game is None:
+        end_game = bool(end_game_mask(planes)[0])
+
+    # piece type on each square, 0 when empty
+    piece_types = np.zeros(64, dtype=np.int64)
+    for plane, (_, piece_type) in enumerate(PLANES):
+        piece_types[planes[0, plane].astype(bool)] = piece_type
+
+    from_squares = np.array([move.from_square for move in moves], dtype=np.int64)
+    to_squares = np.array([move.to_square for move in moves], dtype=np.int64)
+    promotions = np.array([move.promotion is not None for move in moves])
+    en_passant = np.array([board.is_en_passant(move) for move in moves])
+    captures = np.array([board.is_capture(move) for move in moves])
+
+    movers = piece_types[from_squares]
+    if not movers.all():
+        raise Exception(f"A piece was expected at {int(from_squares[np.argmin(movers)])}")
+
+    square_value = SQUARE_VALUE[int(end_game), int(board.turn)]
+    position_change = square_value[movers, to_squares] - square_value[movers, from_squares]
+
+    capture_value = np.where(en_passant, PIECE_VALUE[chess.PAWN],
+                             PIECE_VALUE[piece_types[to_squares]] - PIECE_VALUE[movers])
+    values = position_change + np.where(captures, capture_value, 0.0)
+    if board.turn == chess.BLACK:
+        values = -values
+
+    promotion_value = float("inf") if board.turn == chess.WHITE else -float("inf")
+    return np.where(promotions, promotion_value, values)
+
+
+def ordered_moves(board: chess.Board, end_game: bool | None = None) -> list[chess.Move]:
+    """
+    Legal moves sorted by move_values, in the same order as movegen.get_ordered_moves without a hash move.
+
+    Args:
+        board (chess.Board): The current state of the chess board.
+        end_game (bool, optional): Whether the game is in an end game state. Computed from the board if None.
+
+    Returns:
+        list[chess.Move]: Legal moves sorted by their estimated quality.
+    """
+    moves = list(board.legal_moves)
+    values = move_values(board, moves, end_game)
+    # a stable sort keeps generation order between equal values, like sorted()
+    order = np.argsort(-values if board.turn == chess.WHITE else values, kind="stable")
+    return [moves[i] for i in order]
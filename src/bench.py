@@ -0,0 +1,380 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import chess
+import movegen
+from eval import evaluate_board
+from tt import TranspositionTable, PersistentTranspositionTable
+from position import Position
+
+# Search benchmarks, run with: python bench.py
+# The regression suite, run with: python bench.py --suite --json results.json --baseline baseline.json
+
+BENCH_POSITIONS = [
+    chess.STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",  # "Kiwipete"
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+]
+
+# perft positions with their known leaf counts, https://www.chessprogramming.org/Perft_Results
+PERFT_POSITIONS = [
+    (chess.STARTING_FEN, 3, 8902),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 3, 97862),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 4, 43238),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 3, 9467),
+]
+
+SUITE_VERSION = 1  # results of another version are not compared
+DEFAULT_TOLERANCE = 0.15  # fraction a metric can get worse by before it counts as a regression
+LOWER_IS_BETTER = {"search_time"}  # every other suite metric is a rate
+
+
+class MoveGenCounter:
+    """
+    Counts calls to generate_legal_moves of a board class while used as a context manager.
+
+    Args:
+        board_class (type, optional): chess.Board, or Position for the search. Defaults to chess.Board.
+    """
+
+    def __init__(self, board_class: type = chess.Board):
+        self.board_class = board_class
+        self.calls = 0
+        self._original = None
+
+    def __enter__(self):
+        self._original = self.board_class.generate_legal_moves
+        original = self._original
+
+        def counting_generate_legal_moves(board, *args, **kwargs):
+            self.calls += 1
+            return original(board, *args, **kwargs)
+
+        self.board_class.generate_legal_moves = counting_generate_legal_moves
+        return self
+
+    def __exit__(self, *exc_info):
+        self.board_class.generate_legal_moves = self._original
+
+
+def _previous_node_checks(board: chess.Board):
+    # terminal detection and move list of a minimax node before moves were generated once per node
+    if not board.is_checkmate() and not board.is_game_over():
+        list(board.legal_moves)
+
+
+def _node_checks(board: chess.Board):
+    moves = list(board.generate_legal_moves())
+    if moves:
+        movegen.is_draw_by_rule(board)
+    else:
+        board.is_check()
+
+
+def bench_node_movegen(fens: list[str] = BENCH_POSITIONS) -> dict:
+    """
+    Move generation calls needed to process one interior node, before and after generating moves once per node.
+
+    Returns:
+        dict: Calls per node for the previous and the current node processing.
+    """
+    boards = [chess.Board(fen) for fen in fens]
+    results = {}
+    for name, checks in (("previous", _previous_node_checks), ("current", _node_checks)):
+        with MoveGenCounter() as counter:
+            for board in boards:
+                checks(board)
+        results[name] = counter.calls / len(boards)
+    return results
+
+
+def bench_search_movegen(depth: int = 3, fens: list[str] = BENCH_POSITIONS) -> dict:
+    """
+    Move generation calls per searched node in a fixed depth search of each position.
+
+    Returns:
+        dict: Nodes, Position.generate_legal_moves calls and calls per node, summed over the positions.
+    """
+    nodes = 0
+    with MoveGenCounter(Position) as counter:
+        for fen in fens:
+            ctx = movegen.SearchContext(tt=TranspositionTable(16))
+            movegen.iterative_deepening(chess.Board(fen), depth, ctx)
+            nodes += ctx.nodes
+    return {"nodes": nodes, "calls": counter.calls, "calls_per_node": counter.calls / nodes}
+
+
+def bench_pruning(depth: int = 4, fens: list[str] = BENCH_POSITIONS) -> dict:
+    """
+    Nodes searched to a fixed depth with every selective search technique on, every one off,
+    and each one switched off on its own.
+
+    Returns:
+        dict: Configuration name to nodes and time summed over the positions.
+    """
+    configurations = {"all on": {}, "all off": {name: False for name in movegen.DEFAULT_PRUNING}}
+    for name in movegen.DEFAULT_PRUNING:
+        configurations[f"no {name}"] = {name: False}
+
+    results = {}
+    for configuration, pruning in configurations.items():
+        nodes = 0
+        t0 = time.perf_counter()
+        for fen in fens:
+            ctx = movegen.SearchContext(tt=TranspositionTable(16), pruning=pruning)
+            movegen.iterative_deepening(chess.Board(fen), depth, ctx)
+            nodes += ctx.nodes
+        results[configuration] = {"nodes": nodes, "time": time.perf_counter() - t0}
+    return results
+
+
+def _board_perft(board: chess.Board, depth: int) -> int:
+    if depth <= 1:
+        return board.legal_moves.count() if depth == 1 else 1
+    nodes = 0
+    for move in board.generate_legal_moves():
+        board.push(move)
+        nodes += _board_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def bench_position(depth: int = 3, fens: list[str] = BENCH_POSITIONS) -> dict:
+    """
+    Perft of each position with chess.Board and with the compact Position, which measures move generation
+    and make/unmake on their own.
+
+    Returns:
+        dict: Leaf nodes and time of each board type, summed over the positions.
+    """
+    results = {}
+    for name, make_board, perft in (("chess.Board", chess.Board, _board_perft),
+                                    ("Position", lambda fen: Position(chess.Board(fen)), Position.perft)):
+        nodes = 0
+        t0 = time.perf_counter()
+        for fen in fens:
+            nodes += perft(make_board(fen), depth)
+        results[name] = {"nodes": nodes, "time": time.perf_counter() - t0}
+    return results
+
+
+def bench_hash_file(depth: int = 4, fens: list[str] = BENCH_POSITIONS, size_mb: float = 16) -> dict:
+    """
+    Searches of the positions with a persistent transposition table, first from a new file (a cold start), then
+    again after closing and reopening it (a warm start, as in the next game's process).
+
+    Returns:
+        dict: Load time of the table, nodes, time and TT hit rate of the searches for each start.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tt.bin")
+        for start in ("cold", "warm"):
+            tt = PersistentTranspositionTable(path, size_mb)
+            nodes = 0
+            t0 = time.perf_counter()
+            for fen in fens:
+                ctx = movegen.SearchContext(tt=tt)
+                movegen.iterative_deepening(chess.Board(fen), depth, ctx)
+                nodes += ctx.nodes
+            stats = tt.stats()
+            results[start] = {"load_time": stats["load_time"], "nodes": nodes, "time": time.perf_counter() - t0,
+                              "hit_rate": stats["hit_rate"], "warm": stats["warm"]}
+            tt.close()
+    return results
+
+
+def _best_time(function, repeat: int) -> float:
+    # the fastest of several runs is the least disturbed by other load on the machine
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_perft(positions: list[tuple[str, int, int]] = PERFT_POSITIONS, repeat: int = 1) -> dict:
+    """
+    Perft of the standard positions with chess.Board and with the compact Position, checking the leaf counts.
+
+    Returns:
+        dict: Leaf nodes, time and nodes per second of each board type, summed over the positions.
+
+    Raises:
+        Exception: If a leaf count is wrong, which makes the timing meaningless
+    """
+    results = {}
+    for name, make_board, perft in (("chess.Board", chess.Board, _board_perft),
+                                    ("Position", lambda fen: Position(chess.Board(fen)), Position.perft)):
+        nodes = 0
+        total = 0.0
+        for fen, depth, expected in positions:
+            board = make_board(fen)
+            count = perft(board, depth)
+            if count != expected:
+                raise Exception(f"{name} perft {depth} of {fen} is {count}, expected {expected}")
+            nodes += count
+            total += _best_time(lambda: perft(board, depth), repeat)
+        results[name] = {"nodes": nodes, "time": total, "nps": nodes / total}
+    return results
+
+
+def bench_search(depth: int = 4, fens: list[str] = BENCH_POSITIONS, repeat: int = 1) -> dict:
+    """
+    Fixed depth search_move, the search behind next_move, of each position from an empty shared table.
+
+    Returns:
+        dict: Nodes, time and nodes per second of each position and in total.
+    """
+    positions = []
+    for fen in fens:
+        results = []
+
+        def run():
+            movegen.transposition_table.clear()
+            results.append(movegen.search_move(depth, chess.Board(fen))[1])
+
+        elapsed = _best_time(run, repeat)
+        stats = results[-1]
+        positions.append({"fen": fen, "nodes": stats.nodes, "time": elapsed, "nps": stats.nodes / elapsed})
+    nodes = sum(position["nodes"] for position in positions)
+    elapsed = sum(position["time"] for position in positions)
+    return {"depth": depth, "positions": positions, "nodes": nodes, "time": elapsed, "nps": nodes / elapsed}
+
+
+def bench_evaluation(iterations: int = 1000, fens: list[str] = BENCH_POSITIONS, repeat: int = 3) -> dict:
+    """
+    Throughput of evaluate_board and get_ordered_moves over the positions.
+
+    Returns:
+        dict: Calls and calls per second of each function.
+    """
+    boards = [chess.Board(fen) for fen in fens]
+    results = {}
+    for name, function, calls in (("evaluate_board", evaluate_board, iterations),
+                                  ("get_ordered_moves", movegen.get_ordered_moves, iterations // 10)):
+        def run():
+            for board in boards:
+                for _ in range(calls):
+                    function(board)
+
+        elapsed = _best_time(run, repeat)
+        results[name] = {"calls": calls * len(boards), "per_second": calls * len(boards) / elapsed}
+    return results
+
+
+def run_suite(depth: int = 4, iterations: int = 1000, repeat: int = 3) -> dict:
+    """
+    Run the regression suite: perft, fixed depth search and evaluation throughput.
+
+    Returns:
+        dict: Detailed results, and the metrics compared against a baseline under "metrics".
+    """
+    perft = bench_perft(repeat=repeat)
+    search = bench_search(depth, repeat=repeat)
+    evaluation = bench_evaluation(iterations, repeat=repeat)
+    return {
+        "version": SUITE_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "perft": perft,
+        "search": search,
+        "evaluation": evaluation,
+        "metrics": {
+            "perft_nps": perft["chess.Board"]["nps"],
+            "position_perft_nps": perft["Position"]["nps"],
+            "search_nps": search["nps"],
+            "search_time": search["time"],
+            "evaluate_board_per_second": evaluation["evaluate_board"]["per_second"],
+            "get_ordered_moves_per_second": evaluation["get_ordered_moves"]["per_second"],
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[dict]:
+    """
+    Metrics of results that are worse than the baseline by more than the tolerance.
+
+    Args:
+        results (dict): Output of run_suite.
+        baseline (dict): Output of an earlier run_suite, usually loaded from JSON.
+        tolerance (float, optional): Fraction a metric can get worse by. Defaults to DEFAULT_TOLERANCE.
+
+    Returns:
+        list[dict]: Name, baseline value, current value and relative change of each regression.
+
+    Raises:
+        Exception: If the baseline comes from another version of the suite
+    """
+    if baseline.get("version") != SUITE_VERSION:
+        raise Exception(f"Baseline is not from version {SUITE_VERSION} of the benchmark suite")
+    regressions = []
+    for name, value in results["metrics"].items():
+        reference = baseline["metrics"].get(name)
+        if not reference:
+            continue
+        change = value / reference - 1
+        worse = change > tolerance if name in LOWER_IS_BETTER else change < -tolerance
+        if worse:
+            regressions.append({"name": name, "baseline": reference, "current": value, "change": change})
+    return regressions
+
+
+def _run_suite_cli(args) -> int:
+    results = run_suite(args.depth, args.iterations, args.repeat)
+    for name, value in results["metrics"].items():
+        print(f"{name}: {value:.3f}" if name in LOWER_IS_BETTER else f"{name}: {value:.0f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["search"]["nodes"] != results["search"]["nodes"]:
+            print(f"Search nodes changed from {baseline['search']['nodes']} to {results['search']['nodes']}")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression in {regression['name']}: {regression['baseline']:.3f} -> {regression['current']:.3f} "
+                  f"({regression['change']:+.1%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="cobra search benchmarks")
+    parser.add_argument("--depth", type=int, default=3, help="Search depth for the search benchmarks.")
+    parser.add_argument("--suite", action="store_true",
+                        help="Run the regression suite instead: perft, search and evaluation throughput.")
+    parser.add_argument("--json", type=str, default=None, help="File to write the suite results to.")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="Suite results to compare against. Exits with status 1 on a regression.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Fraction a suite metric can get worse by before it counts as a regression.")
+    parser.add_argument("--iterations", type=int, default=1000, help="Evaluations per position in the suite.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each suite timing, the fastest is kept.")
+    args = parser.parse_args()
+    if args.suite:
+        sys.exit(_run_suite_cli(args))
+
+    node_calls = bench_node_movegen()
+    print(f"Move generation calls per interior node: previous {node_calls['previous']:.2f}, "
+          f"current {node_calls['current']:.2f}")
+    t0 = time.time()
+    search_calls = bench_search_movegen(args.depth)
+    print(f"Depth {args.depth} search: {search_calls['nodes']} nodes, {search_calls['calls']} move generation calls, "
+          f"{search_calls['calls_per_node']:.2f} per node, {time.time() - t0:.2f}s")
+    for configuration, result in bench_pruning(args.depth).items():
+        print(f"Depth {args.depth} search, {configuration}: {result['nodes']} nodes, {result['time']:.2f}s")
+    for name, result in bench_position(args.depth).items():
+        print(f"Perft {args.depth}, {name}: {result['nodes']} nodes, {result['time']:.2f}s")
+    for start, result in bench_hash_file(args.depth).items():
+        print(f"Depth {args.depth} search, {start} hash file: loaded in {result['load_time'] * 1000:.1f}ms, "
+              f"{result['nodes']} nodes, {result['time']:.2f}s, TT hit rate {result['hit_rate']:.1%}")
@@ -0,0 +1,338 @@
+import argparse
+import os
+import random
+import struct
+import zlib
+from array import array
+import chess
+import numpy as np
+
+# Win/draw bitbases of king and one piece against king, built by retrograde analysis:
+# checkmates are marked won, then every position is won for the stronger side once it has a move into a won
+# position (stronger side to move) or every move leads into one (lone king to move). What is left is drawn.
+# https://www.chessprogramming.org/Retrograde_Analysis
+# https://www.chessprogramming.org/KPK
+#
+# Positions are stored with the stronger side as White. KQK and KRK are mirrored so the white king is in the
+# a1-d4 quadrant, KPK so the pawn is on the a-d files. One bit per position: 1 if White wins, 0 if drawn or invalid.
+
+BITBASE_VERSION = 1
+HEADER = struct.Struct("<4sHH")  # magic, version, number of tables
+TABLE_HEADER = struct.Struct("<4sII")  # name, size in bytes, CRC-32 of the data
+MAGIC = b"CBBB"
+
+TABLES = {"KQK": chess.QUEEN, "KRK": chess.ROOK, "KPK": chess.PAWN}
+TABLE_NAMES = {piece_type: name for name, piece_type in TABLES.items()}
+# the quadrant squares of the white king in KQK and KRK, and the pawn squares of KPK
+QUADRANT = [chess.square(file, rank) for rank in range(4) for file in range(4)]
+PAWN_SQUARES = [chess.square(file, rank) for rank in range(1, 7) for file in range(4)]
+QUADRANT_INDEX = {square: i for i, square in enumerate(QUADRANT)}
+PAWN_INDEX = {square: i for i, square in enumerate(PAWN_SQUARES)}
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bitbase.bin")
+
+
+def table_size(piece_type: chess.PieceType) -> int:
+    """Number of positions in the table of piece_type: side to move, white king, black king, piece."""
+    if piece_type == chess.PAWN:
+        return 2 * 64 * 64 * len(PAWN_SQUARES)
+    return 2 * len(QUADRANT) * 64 * 64
+
+
+def table_index(piece_type: chess.PieceType, black_to_move: bool, white_king: chess.Square,
+                black_king: chess.Square, piece: chess.Square) -> int:
+    """Index of a position with the stronger side as White, mirrored into the table's part of the board first."""
+    if piece_type == chess.PAWN:
+        if piece & 7 > 3:
+            white_king, black_king, piece = white_king ^ 7, black_king ^ 7, piece ^ 7
+        return ((black_to_move * 64 + white_king) * 64 + black_king) * len(PAWN_SQUARES) + PAWN_INDEX[piece]
+    if white_king & 7 > 3:
+        white_king, black_king, piece = white_king ^ 7, black_king ^ 7, piece ^ 7
+    if white_king > 31:
+        white_king, black_king, piece = white_king ^ 56, black_king ^ 56, piece ^ 56
+    return ((black_to_move * len(QUADRANT) + QUADRANT_INDEX[white_king]) * 64 + black_king) * 64 + piece
+
+
+def _positions(piece_type: chess.PieceType):
+    """Every (black to move, white king, black king, piece) of a table, in index order."""
+    kings = range(64) if piece_type == chess.PAWN else QUADRANT
+    pieces = PAWN_SQUARES if piece_type == chess.PAWN else range(64)
+    for black_to_move in (False, True):
+        for white_king in kings:
+            for black_king in range(64):
+                for piece in pieces:
+                    yield black_to_move, white_king, black_king, piece
+
+
+def _attacks(piece_type: chess.PieceType, square: chess.Square, occupied: int) -> int:
+    """Squares attacked by a white piece of piece_type on square."""
+    if piece_type == chess.PAWN:
+        return chess.BB_PAWN_ATTACKS[chess.WHITE][square]
+    attacks = (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+               | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    if piece_type == chess.QUEEN:
+        attacks |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    return attacks
+
+
+def _squares(mask: int):
+    while mask:
+        yield (mask & -mask).bit_length() - 1
+        mask &= mask - 1
+
+
+def generate_table(piece_type: chess.PieceType, promotion_tables: dict | None = None) -> np.ndarray:
+    """
+    Solve one table by retrograde analysis.
+
+    Args:
+        piece_type (chess.PieceType): QUEEN, ROOK or PAWN.
+        promotion_tables (dict, optional): Solved tables by piece type, which KPK needs for its promotions:
+            promoting to a queen or a rook wins exactly when the KQK or KRK position reached is won.
+
+    Returns:
+        np.ndarray: Boolean array over the table indexes, True where White wins.
+    """
+    size = table_size(piece_type)
+    won = np.zeros(size, dtype=bool)
+    decided = np.zeros(size, dtype=bool)  # won, drawn or invalid
+    black_to_move = np.zeros(size, dtype=bool)
+    moves_left = np.zeros(size, dtype=np.int32)  # lone king positions: moves not yet known to lose
+    parents, children = array("I"), array("I")
+    bb_squares = chess.BB_SQUARES
+
+    for index, (black, white_king, black_king, piece) in enumerate(_positions(piece_type)):
+        black_to_move[index] = black
+        if len({white_king, black_king, piece}) < 3 or chess.BB_KING_ATTACKS[white_king] & bb_squares[black_king]:
+            decided[index] = True  # invalid
+            continue
+        occupied = bb_squares[white_king] | bb_squares[black_king] | bb_squares[piece]
+        piece_attacks = _attacks(piece_type, piece, occupied)
+
+        if not black:
+            if piece_attacks & bb_squares[black_king]:
+                decided[index] = True  # invalid, the side not to move is in check
+                continue
+            targets = chess.BB_KING_ATTACKS[white_king] & ~chess.BB_KING_ATTACKS[black_king] & ~bb_squares[piece]
+            for to_square in _squares(targets):
+                parents.append(index)
+                children.append(table_index(piece_type, True, to_square, black_king, piece))
+            if piece_type == chess.PAWN:
+                forward = piece + 8
+                if not occupied & bb_squares[forward]:
+                    if forward >= chess.A8:
+                        for promotion in (chess.QUEEN, chess.ROOK):  # a bishop or knight cannot win
+                            table = promotion_tables[promotion]
+                            if table[table_index(promotion, True, white_king, black_king, forward)]:
+                                won[index] = decided[index] = True
+                    else:
+                        parents.append(index)
+                        children.append(table_index(piece_type, True, white_king, black_king, forward))
+                        if piece < chess.A3 and not occupied & bb_squares[forward + 8]:
+                            parents.append(index)
+                            children.append(table_index(piece_type, True, white_king, black_king, forward + 8))
+            else:
+                for to_square in _squares(piece_attacks & ~occupied):
+                    parents.append(index)
+                    children.append(table_index(piece_type, True, white_king, black_king, to_square))
+        else:
+            # the lone king may not step next to the white king or onto an attacked square, with its own square
+            # no longer blocking the piece's lines
+            attacked = chess.BB_KING_ATTACKS[white_king] | _attacks(
+                piece_type, piece, occupied & ~bb_squares[black_king])
+            targets = chess.BB_KING_ATTACKS[black_king] & ~attacked
+            if targets & bb_squares[piece]:
+                decided[index] = True  # drawn, the piece is captured
+                continue
+            if not targets:
+                decided[index] = True
+                won[index] = bool(attacked & bb_squares[black_king])  # checkmate, otherwise stalemate
+                continue
+            for to_square in _squares(targets):
+                parents.append(index)
+                children.append(table_index(piece_type, False, white_king, to_square, piece))
+                moves_left[index] += 1
+
+    parents = np.frombuffer(parents, dtype=np.uint32)
+    children = np.frombuffer(children, dtype=np.uint32)
+    new = won.copy()
+    while new.any():
+        # positions with a move into a newly won position
+        reached = parents[new[children]]
+        white_parents = reached[~black_to_move[reached]]
+        black_counts = np.bincount(reached[black_to_move[reached]], minlength=size)
+        moves_left -= black_counts.astype(np.int32)
+        new = np.zeros(size, dtype=bool)
+        new[white_parents] = True
+        new |= black_to_move & (moves_left == 0) & (black_counts > 0)
+        new &= ~decided
+        won |= new
+        decided |= new
+    return won
+
+
+class Bitbase:
+    """
+    Bit-packed win/draw tables, probed with a bit lookup.
+
+    Args:
+        tables (dict): Table name to the bytes of its packed bits.
+    """
+
+    def __init__(self, tables: dict[str, bytes]):
+        self.tables = {TABLES[name]: data for name, data in tables.items()}
+        self.hits = 0
+
+    @classmethod
+    def generate(cls) -> "Bitbase":
+        """Solve KQK and KRK, then KPK, whose promotions lead into them. The result is always the same."""
+        solved = {}
+        for name in ("KQK", "KRK", "KPK"):
+            solved[TABLES[name]] = generate_table(TABLES[name], solved)
+        return cls({TABLE_NAMES[piece_type]: np.packbits(won, bitorder="little").tobytes()
+                    for piece_type, won in solved.items()})
+
+    @classmethod
+    def load(cls, path: str) -> "Bitbase":
+        """
+        Read a file written by save.
+
+        Raises:
+            Exception: If the file is not a bitbase of this version, or a table is corrupt
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise Exception(f"{path} is not a cobra bitbase")
+        magic, version, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != BITBASE_VERSION:
+            raise Exception(f"{path} is not a version {BITBASE_VERSION} cobra bitbase")
+        tables = {}
+        offset = HEADER.size
+        for _ in range(count):
+            name, size, crc = TABLE_HEADER.unpack_from(data, offset)
+            offset += TABLE_HEADER.size
+            table = data[offset:offset + size]
+            offset += size
+            name = name.rstrip(b"\0").decode()
+            if len(table) != size or zlib.crc32(table) != crc or name not in TABLES:
+                raise Exception(f"Table {name} of {path} is corrupt")
+            tables[name] = table
+        return cls(tables)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, BITBASE_VERSION, len(self.tables)))
+            for piece_type, table in self.tables.items():
+                f.write(TABLE_HEADER.pack(TABLE_NAMES[piece_type].encode(), len(table), zlib.crc32(table)))
+                f.write(table)
+
+    def won(self, piece_type: chess.PieceType, index: int) -> bool:
+        return bool(self.tables[piece_type][index >> 3] >> (index & 7) & 1)
+
+    def probe(self, board: chess.Board) -> int | None:
+        """
+        Exact result of a king and piece against king position.
+
+        Args:
+            board (chess.Board): Position to look up.
+
+        Returns:
+            int | None: 1 if the side to move wins, -1 if it loses, 0 if drawn, None if there is no table for the
+                position. Positions with castling rights are not covered.
+        """
+        occupied = board.occupied
+        if chess.popcount(occupied) != 3 or board.castling_rights:
+            return None
+        piece_mask = occupied & ~board.kings
+        piece = (piece_mask & -piece_mask).bit_length() - 1
+        piece_type = board.piece_type_at(piece)
+        table = self.tables.get(piece_type)
+        if table is None:
+            return None
+        strong = bool(board.occupied_co[chess.WHITE] & piece_mask)
+        white_king, black_king = board.king(strong), board.king(not strong)
+        if strong == chess.BLACK:
+            white_king, black_king, piece = white_king ^ 56, black_king ^ 56, piece ^ 56
+        black_to_move = board.turn != strong
+        index = table_index(piece_type, black_to_move, white_king, black_king, piece)
+        self.hits += 1
+        if not table[index >> 3] >> (index & 7) & 1:
+            return 0
+        return -1 if black_to_move else 1
+
+
+def load_or_generate(path: str = DEFAULT_PATH) -> Bitbase:
+    """Load the bitbase at path, generating and saving it first if there is no file yet."""
+    if not os.path.exists(path):
+        print(f"Generating endgame bitbase {path}...")
+        Bitbase.generate().save(path)
+    return Bitbase.load(path)
+
+
+def _board(piece_type: chess.PieceType, black_to_move: bool, white_king: chess.Square, black_king: chess.Square,
+           piece: chess.Square) -> chess.Board:
+    board = chess.Board(None)
+    board.set_piece_at(white_king, chess.Piece(chess.KING, chess.WHITE))
+    board.set_piece_at(black_king, chess.Piece(chess.KING, chess.BLACK))
+    board.set_piece_at(piece, chess.Piece(piece_type, chess.WHITE))
+    board.turn = not black_to_move
+    return board
+
+
+def verify(bitbase: Bitbase, samples: int | None = None, seed: int = 0) -> int:
+    """
+    Check the tables against python-chess move generation: a valid position must be won exactly when it is
+    checkmate, or the stronger side has a legal move into a won position, or every legal move of the lone king
+    leads into a won position. Captures of the piece lead to a draw, and promotions into the other tables.
+
+    Args:
+        bitbase (Bitbase): Tables to check.
+        samples (int, optional): Positions to check per table, at random. Defaults to every position.
+        seed (int, optional): Seed of the random sample.
+
+    Returns:
+        int: Number of positions checked.
+
+    Raises:
+        Exception: On the first position whose stored result does not match its moves
+    """
+    rng = random.Random(seed)
+    checked = 0
+    for piece_type in bitbase.tables:
+        positions = list(_positions(piece_type))
+        if samples is not None:
+            positions = rng.sample(positions, samples)
+        for position in positions:
+            board = _board(piece_type, *position)
+            if not board.is_valid():
+                continue
+            stored = bitbase.probe(board)
+            child_results = []
+            for move in board.legal_moves:
+                board.push(move)
+                child = bitbase.probe(board)
+                board.pop()
+                child_results.append(-child if child is not None else 0)
+            if not child_results:
+                expected = -1 if board.is_check() else 0
+            elif board.turn == chess.WHITE:
+                expected = 1 if 1 in child_results else 0
+            else:
+                expected = -1 if all(result == -1 for result in child_results) else 0
+            if stored != expected:
+                raise Exception(f"Bitbase result {stored} should be {expected} for {board.fen()}")
+            checked += 1
+    return checked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate cobra's KPK, KRK and KQK bitbase.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH, help="File to write.")
+    parser.add_argument("--verify", action="store_true", help="Check every position against python-chess.")
+    args = parser.parse_args()
+    bitbase = Bitbase.generate()
+    bitbase.save(args.path)
+    print(f"Wrote {os.path.getsize(args.path)} bytes to {args.path}")
+    if args.verify:
+        print(f"{verify(Bitbase.load(args.path))} positions verified")
@@ -0,0 +1,232 @@
+import argparse
+import heapq
+import os
+import random
+import struct
+import tempfile
+import chess
+import chess.pgn
+import chess.polyglot
+
+# Polyglot opening books: 16 byte big-endian entries of (Zobrist key, move, weight, learn), sorted by key.
+# Probing memory-maps the file and binary searches it for the position's key, through chess.polyglot.
+# http://hgm.nubati.net/book_format.html
+# https://www.chessprogramming.org/Opening_Book
+
+ENTRY = struct.Struct(">QHHI")  # key, move, weight, learn
+RUN_ENTRY = struct.Struct(">QHI")  # key, move, count of the sorted runs written while building a book
+
+DEFAULT_MAX_PLY = 12
+DEFAULT_MIN_COUNT = 1
+DEFAULT_MAX_POSITIONS = 1_000_000  # (position, move) pairs held in memory before they are written out as a run
+
+
+class OpeningBook:
+    """
+    Memory-mapped Polyglot book. Only the pages holding the probed entries are read from disk.
+
+    Args:
+        path (str): Path of the .bin book file.
+        seed (int, optional): Seed of the weighted move choice, for repeatable games. Defaults to a random seed.
+
+    Raises:
+        Exception: If the file is not a Polyglot book
+    """
+
+    def __init__(self, path: str, seed: int | None = None):
+        try:
+            self.reader = chess.polyglot.open_reader(path)
+        except OSError as e:
+            raise Exception(f"{path} is not a Polyglot opening book: {e}")
+        self.random = random.Random(seed)
+        self.hits = 0
+        self.misses = 0
+
+    def moves(self, board: chess.Board) -> list[tuple[chess.Move, int]]:
+        """
+        Book moves of the position.
+
+        Args:
+            board (chess.Board): Position to look up.
+
+        Returns:
+            list[tuple[chess.Move, int]]: Legal book moves and their weights, highest weight first.
+        """
+        entries = sorted(self.reader.find_all(board), key=lambda entry: entry.weight, reverse=True)
+        return [(entry.move, entry.weight) for entry in entries]
+
+    def probe(self, board: chess.Board) -> chess.Move | None:
+        """
+        Pick a book move, each with a probability proportional to its weight.
+
+        Args:
+            board (chess.Board): Position to look up.
+
+        Returns:
+            chess.Move | None: The book move, None if the position is not in the book.
+        """
+        try:
+            move = self.reader.weighted_choice(board, random=self.random).move
+        except IndexError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return move
+
+    def close(self):
+        self.reader.close()
+
+    def __len__(self) -> int:
+        return len(self.reader)
+
+
+def encode_book_move(board: chess.Board, move: chess.Move) -> int:
+    """
+    Polyglot encoding of a move: to square, from square and promotion piece (knight 1 to queen 4).
+    Castling is encoded as the king capturing its own rook.
+    """
+    to_square = move.to_square
+    if board.is_castling(move) and not board.chess960:
+        to_square = chess.square(7 if board.is_kingside_castling(move) else 0, chess.square_rank(move.from_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | (move.from_square << 6) | (promotion << 12)
+
+
+class _BookVisitor(chess.pgn.BaseVisitor):
+    """
+    Collects the (position key, move) pairs of the first plies of a game's main line, and skips the rest:
+    variations are not visited, and once max_ply is reached SAN moves are no longer parsed.
+    A game with an illegal move gives no pairs at all, rather than failing the whole corpus.
+    """
+
+    def __init__(self, max_ply: int):
+        self.max_ply = max_ply
+        self.pairs = []
+        self.ply = 0
+        self.error = False
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def begin_parse_san(self, board: chess.Board, san: str):
+        if self.ply >= self.max_ply:
+            return chess.pgn.SKIP  # parsing is the expensive part, and the rest of the game is not used
+        return None
+
+    def handle_error(self, error: Exception):
+        self.error = True
+
+    def visit_move(self, board: chess.Board, move: chess.Move):
+        if self.ply < self.max_ply:
+            self.pairs.append((chess.polyglot.zobrist_hash(board), encode_book_move(board, move)))
+        self.ply += 1
+
+    def result(self) -> list[tuple[int, int]]:
+        return [] if self.error else self.pairs
+
+
+def _write_run(counts: dict, directory: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=".run", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        for (key, move), count in sorted(counts.items()):
+            f.write(RUN_ENTRY.pack(key, move, count))
+    return path
+
+
+def _read_run(path: str):
+    with open(path, "rb") as f:
+        while chunk := f.read(RUN_ENTRY.size * 4096):
+            yield from RUN_ENTRY.iter_unpack(chunk)
+
+
+def _merge_runs(runs: list[str]):
+    """Merge sorted runs, adding up the counts of the same (key, move) pair."""
+    current, total = None, 0
+    for key, move, count in heapq.merge(*(_read_run(path) for path in runs)):
+        if (key, move) != current:
+            if current is not None:
+                yield current[0], current[1], total
+            current, total = (key, move), 0
+        total += count
+    if current is not None:
+        yield current[0], current[1], total
+
+
+def _write_position(f, key: int, moves: list[tuple[int, int]], min_count: int) -> int:
+    moves = [(move, count) for move, count in moves if count >= min_count]
+    if not moves:
+        return 0
+    # weights are 16 bit, so counts of very common positions are scaled down, keeping every move at least 1
+    scale = max(count for _, count in moves) / 0xFFFF
+    for move, count in sorted(moves, key=lambda item: item[1], reverse=True):
+        weight = max(1, int(count / scale)) if scale > 1 else count
+        f.write(ENTRY.pack(key, move, weight, 0))
+    return len(moves)
+
+
+def build_book(pgn_path: str, book_path: str, max_ply: int = DEFAULT_MAX_PLY, min_count: int = DEFAULT_MIN_COUNT,
+               max_positions: int = DEFAULT_MAX_POSITIONS) -> dict:
+    """
+    Build a Polyglot book from the games of a PGN file, weighting each move by how often it was played.
+    Games are streamed one at a time. Counts are aggregated in memory until max_positions pairs are held, then
+    written to disk as a sorted run; the runs are merged into the book at the end (an external merge sort),
+    so memory use does not grow with the size of the corpus.
+
+    Args:
+        pgn_path (str): PGN file to read.
+        book_path (str): Book file to write.
+        max_ply (int, optional): Plies of each game that go into the book. Defaults to DEFAULT_MAX_PLY.
+        min_count (int, optional): Times a move has to be played in a position to be kept. Defaults to 1.
+        max_positions (int, optional): Distinct (position, move) pairs held in memory at once.
+
+    Returns:
+        dict: Number of games read, runs written and book entries.
+    """
+    directory = os.path.dirname(os.path.abspath(book_path))
+    counts = {}
+    runs = []
+    games = 0
+    try:
+        with open(pgn_path, encoding="utf-8", errors="replace") as pgn:
+            while True:
+                pairs = chess.pgn.read_game(pgn, Visitor=lambda: _BookVisitor(max_ply))
+                if pairs is None:
+                    break
+                games += 1
+                for pair in pairs:
+                    counts[pair] = counts.get(pair, 0) + 1
+                if len(counts) >= max_positions:
+                    runs.append(_write_run(counts, directory))
+                    counts = {}
+        if counts or not runs:
+            runs.append(_write_run(counts, directory))
+
+        entries = 0
+        with open(book_path, "wb") as f:
+            key, moves = None, []
+            for entry_key, move, count in _merge_runs(runs):
+                if entry_key != key:
+                    if moves:
+                        entries += _write_position(f, key, moves, min_count)
+                    key, moves = entry_key, []
+                moves.append((move, count))
+            if moves:
+                entries += _write_position(f, key, moves, min_count)
+    finally:
+        for path in runs:
+            os.remove(path)
+    return {"games": games, "runs": len(runs), "entries": entries}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a Polyglot opening book for cobra from a PGN file.")
+    parser.add_argument("pgn", help="PGN file to read.")
+    parser.add_argument("book", help="Book file to write.")
+    parser.add_argument("--max-ply", type=int, default=DEFAULT_MAX_PLY, help="Plies of each game to include.")
+    parser.add_argument("--min-count", type=int, default=DEFAULT_MIN_COUNT,
+                        help="Times a move has to be played in a position to be included.")
+    parser.add_argument("--max-positions", type=int, default=DEFAULT_MAX_POSITIONS,
+                        help="Position and move pairs held in memory before they are written to disk.")
+    args = parser.parse_args()
+    summary = build_book(args.pgn, args.book, args.max_ply, args.min_count, args.max_positions)
+    print(f"{summary['games']} games, {summary['runs']} runs, {summary['entries']} book entries written to {args.book}")
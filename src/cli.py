@@ -1,12 +1,15 @@
+import os
 import time
 import chess
 import analyse
 import chess.engine
 import movegen
+from profiler import profile_call
 
 
 def standalone_use(board: chess.Board, depth: int, use_stockfish: bool, acpl_val: bool,
-                   stockfish_engine: False):
+                   stockfish_engine: False, movetime: float = None, nodes: int = None, workers: int = 1,
+                   profile: str = None, profile_dir: str = "profiles"):
     game_over = False
     acpl_array = []
     render_board_with_icons(board)
@@ -20,8 +23,12 @@ def standalone_use(board: chess.Board, depth: int, use_stockfish: bool, acpl_val
         if use_stockfish:
             result = stockfish_engine.play(board, chess.engine.Limit(depth=depth))  # create move, stockfish
             generated_move = result.move
+        elif profile is not None:
+            generated_move, profiler = profile_call(profile, movegen.next_move, depth, board, movetime, nodes, workers)
+            profiler.write(os.path.join(profile_dir, f"ply_{len(board.move_stack)}"))
+            print(profiler.format_summary(10))
         else:
-            generated_move = movegen.next_move(depth, board)  # create move, cobra
+            generated_move = movegen.next_move(depth, board, movetime, nodes, workers)  # create move, cobra
         end_time = time.time()
         delta_time = round((end_time - start_time), 2)  # time taken to create the move, rounded to 2dp
         print(f"Move execution time: {delta_time} seconds")
@@ -1,6 +1,7 @@
 import zmq
 import chess
 import movegen
+import parallel
 import argparse
 import platform
 import os
@@ -8,7 +9,10 @@ import chess.engine
 import sys
 import chess.pgn
 import json
-from engines import init_stockfish
+from engines import init_stockfish, EvalCache, PersistentEvalCache, DEFAULT_EVAL_STORE_PATH
+from ponder import Ponderer
+from profiler import MODES as PROFILE_MODES, profile_call
+from bitbase import DEFAULT_PATH as DEFAULT_BITBASE_PATH
 import analyse
 import time
 import matplotlib
@@ -106,6 +110,18 @@ def communicate():
         skill_level = args.skill_level if args.skill_level is not None else settings.get("skill_level", 2)
         acpl_val = args.acpl if args.acpl is not None else settings.get("acpl_val", False)
 
+    if args.hash is not None:
+        movegen.set_hash_size(args.hash)
+    hash_file = None
+    if args.hash_file is not None:
+        hash_file = movegen.set_hash_file(args.hash_file)
+        start = "warm" if hash_file.warm else f"cold ({hash_file.load_error or 'new file'})"
+        print(f"Transposition table {args.hash_file}: {start} start, {hash_file.load_time:.3f}s to load")
+    if args.book is not None:
+        movegen.set_book(args.book)
+    if args.bitbase is not None:
+        movegen.set_bitbase(args.bitbase)
+
     # stockfish engine is not initialised by default, but still needs to be passed to standalone_use()
     stockfish_engine = None
 
@@ -122,9 +138,15 @@ def communicate():
 
     if len(sys.argv) > 1:
         print("Welcome to cobra! Running in standalone mode.")
-        standalone_use(board, depth, use_stockfish, acpl_val, stockfish_engine)
+        standalone_use(board, depth, use_stockfish, acpl_val, stockfish_engine, args.movetime, args.nodes,
+                       args.workers, args.profile, args.profile_dir)
 
     acpl_array = []
+    # Stockfish analyses of the game's positions, shared by ACPL and the post-game analysis, and kept on disk for
+    # later games with --eval-cache
+    eval_cache = PersistentEvalCache(args.eval_cache) if args.eval_cache is not None else EvalCache()
+    # cobra searches the expected reply while the opponent thinks
+    ponderer = Ponderer() if args.ponder and not use_stockfish else None
 
     # ZeroMQ socket setup
     context = zmq.Context()
@@ -133,32 +155,43 @@ def communicate():
 
     while True:
         san = socket.recv().decode('utf-8')  # receive move and normalize to utf-8
+        if san in ("SHUTDOWN", "GAME_END") and ponderer is not None:
+            ponderer.stop()
+            print(ponderer)
+        if san in ("SHUTDOWN", "GAME_END") and hash_file is not None:
+            stats = hash_file.stats()
+            hash_file.close()  # the next game's process starts from this table
+            print(f"Saved transposition table {args.hash_file}, hit rate this game: {stats['hit_rate']:.1%}")
         if san == "SHUTDOWN":
             print("Received SHUTDOWN, exiting...")
+            if isinstance(eval_cache, PersistentEvalCache):
+                eval_cache.close()
             socket.close()
             context.term()
             if use_stockfish:
                 stockfish_engine.quit()
+            parallel.shutdown()
             exit()
         if san == "GAME_END":
             if use_stockfish:
                 stockfish_engine.close()  # engine is closed and reopened to avoid memory leak
 
             print("Received GAME_END command")
-            game = chess.pgn.Game.from_board(board)
-            exporter = chess.pgn.StringExporter(headers=True, variations=True, comments=True)  # PGN exporter
-            pgn_string = game.accept(exporter)
-            best_move_count = analyse.analyse_best_move(pgn_string)
-            blunder_count = analyse.analyse_blunders(pgn_string)
+            # one replay of the game, reusing the in-game ACPL analyses
+            analysis = analyse.analyse_game(board, eval_cache, engines=args.analysis_engines, acpl=acpl_val == True)
+            analyse.close_engine_pool()
+            if isinstance(eval_cache, PersistentEvalCache):
+                eval_cache.close()
 
             # both values cannot be sent independently due to REP deadlock, therefore they are sent as a JSON object
             # https://zguide.zeromq.org/docs/chapter4/
 
-            end_state_data = {"bestMoveCount": best_move_count, "blunderCount": blunder_count}
+            end_state_data = {"bestMoveCount": analysis["bestMoveCount"], "blunderCount": analysis["blunderCount"]}
 
             end_state_data_json = json.dumps(end_state_data)  # convert to JSON
             socket.send(end_state_data_json.encode('utf-8'))
             plot_ACPL_graph(acpl_array)  # plot ACPL graph
+            parallel.shutdown()
             socket.close()
             context.term()
             exit()  # potentially macOS specific - terminal does not close without this line
@@ -169,7 +202,7 @@ def communicate():
         if acpl_val == True:
             # copy of the board pre-move for ACPL calculation (W)
             acpl_white_board = board.copy()
-            acpl_value = analyse.generate_ACPL(acpl_white_board, move, stockfish_engine)
+            acpl_value = analyse.generate_ACPL(acpl_white_board, move, stockfish_engine, eval_cache)
             acpl_array.append(acpl_value)
             print(f"ACPL: {acpl_array}")
 
@@ -178,11 +211,25 @@ def communicate():
         print(f"Accuracy of White's move: {acpl_value}", f"Next to move: {board.turn}")
 
         start_time = time.time()
+        search_stats = None
         if use_stockfish:
             result = stockfish_engine.play(board, chess.engine.Limit(depth=depth))  # uses depth from JSON
             generated_move = result.move
         else:
-            generated_move = movegen.next_move(depth, board)  # create move
+            pondered = ponderer.finish(move) if ponderer is not None else None
+            if pondered is not None and pondered[0] is not None:
+                generated_move, search_stats = pondered
+            elif args.profile is not None:
+                (generated_move, search_stats), profiler = profile_call(args.profile, movegen.search_move, depth,
+                                                                        board, args.movetime, args.nodes,
+                                                                        args.workers)
+                profiler.write(os.path.join(args.profile_dir, f"ply_{len(board.move_stack)}"))
+                print(profiler.format_summary(10))
+            else:
+                # create move
+                generated_move, search_stats = movegen.search_move(depth, board, args.movetime, args.nodes,
+                                                                   args.workers)
+            print(search_stats)
 
         end_time = time.time()
         delta_time = end_time - start_time
@@ -196,9 +243,16 @@ def communicate():
             response_data = {"move": san, "acpl": acpl_value}  # send move and ACPL value as JSON object
         else:
             response_data = {"move": san}
+        if args.search_stats and search_stats is not None:
+            response_data["stats"] = search_stats.to_dict()  # per move engine performance
         response_json = json.dumps(response_data)
         socket.send(response_json.encode('utf-8'))
 
+        if ponderer is not None and not board.is_game_over():
+            predicted_move = ponderer.predict(board, search_stats)
+            if predicted_move is not None:
+                ponderer.start(board, predicted_move, depth, args.movetime, args.nodes, args.workers)
+
 
 def plot_ACPL_graph(acpl_array):
     """
@@ -240,6 +294,14 @@ def plot_ACPL_graph(acpl_array):
     plt.show()
 
 
+def positive_int(value: str) -> int:
+    """argparse type of counts that have to be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
 def standalone_cli_args():
     """Command line arguments for standalone use (not being called by the Chess.NET process) cobra engine.
 
@@ -253,6 +315,29 @@ def standalone_cli_args():
                         help='Use Stockfish engine instead of Cobra.')
     parser.add_argument('--acpl', nargs='?', const=True, default=None, help='Enable ACPL calculation.')
     parser.add_argument('--skill-level', type=int, default=None, help='Skill level for Stockfish engine.')
+    parser.add_argument('--movetime', type=float, default=None,
+                        help='Time budget per cobra move in seconds. Depth becomes the maximum depth.')
+    parser.add_argument('--nodes', type=int, default=None, help='Node budget per cobra move.')
+    parser.add_argument('--workers', '--threads', type=int, default=1,
+                        help='Number of processes cobra searches with. 1 gives a deterministic single process search.')
+    parser.add_argument('--search-stats', nargs='?', const=True, default=None,
+                        help='Include cobra search statistics in the JSON response to Chess.NET.')
+    parser.add_argument('--ponder', nargs='?', const=True, default=None,
+                        help='Search the expected reply on the opponent`s time. Ignored with Stockfish.')
+    parser.add_argument('--analysis-engines', type=positive_int, default=1,
+                        help='Number of Stockfish processes the post-game best move analysis is spread over.')
+    parser.add_argument('--eval-cache', nargs='?', const=DEFAULT_EVAL_STORE_PATH, default=None,
+                        help='SQLite file Stockfish analyses are kept in between games, created if it does not exist.')
+    parser.add_argument('--hash', type=int, default=None, help='Transposition table size in MB for cobra.')
+    parser.add_argument('--hash-file', type=str, default=None,
+                        help='File cobra keeps its transposition table in between games, so they start warm.')
+    parser.add_argument('--book', type=str, default=None, help='Polyglot opening book (.bin) for cobra, see book.py.')
+    parser.add_argument('--bitbase', nargs='?', const=DEFAULT_BITBASE_PATH, default=None,
+                        help='KPK/KRK/KQK bitbase file for cobra, generated on first use if it does not exist.')
+    parser.add_argument('--profile', nargs='?', const='sampling', default=None, choices=PROFILE_MODES,
+                        help='Profile each cobra move, sampling by default or deterministic. Writes collapsed stacks '
+                             'for flame graphs and a per-function summary, see profiler.py.')
+    parser.add_argument('--profile-dir', type=str, default='profiles', help='Directory the move profiles go to.')
     parser.add_argument('--use-default-settings', nargs='?', const=True, default=None,
                         help='Use Chess.NET`s settings.json file found in the Unity persistence path')
     args, unknown = parser.parse_known_args()
@@ -1,7 +1,12 @@
 import chess
 import chess.engine
+import chess.polyglot
+import concurrent.futures
+import queue
+import sqlite3
 import sys
 import os
+import time
 
 def init_stockfish():
     if getattr(sys, 'frozen', False):
@@ -21,3 +26,261 @@ def init_stockfish():
     os.chmod(engine_path, 0o755)
 
     return chess.engine.SimpleEngine.popen_uci(engine_path)
+
+
+class EnginePool:
+    """
+    Stockfish processes that analyse positions in parallel, one position per process at a time.
+    Every position is searched after a ucinewgame, so its result does not depend on which process searched it or on
+    what that process searched before: with a depth or node limit, the results are the same for any pool size.
+
+    Args:
+        engines (list[chess.engine.SimpleEngine]): Running engines to use, see start.
+    """
+
+    def __init__(self, engines: list[chess.engine.SimpleEngine]):
+        self.engines = engines
+        self.idle = queue.Queue()
+        for engine in engines:
+            self.idle.put(engine)
+        # the engines run in their own processes, the threads only wait for their replies
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(engines))
+
+    @classmethod
+    def start(cls, size: int, engines: list[chess.engine.SimpleEngine] | None = None) -> "EnginePool":
+        """
+        Start a pool of size engines, reusing already running engines if given.
+
+        Args:
+            size (int): Number of engine processes.
+            engines (list[chess.engine.SimpleEngine], optional): Running engines to include in the pool.
+
+        Raises:
+            Exception: If size is below 1
+        """
+        if size < 1:
+            raise Exception(f"An engine pool needs at least one engine, not {size}")
+        engines = list(engines or [])[:size]
+        while len(engines) < size:
+            engines.append(init_stockfish())
+        return cls(engines)
+
+    def _run(self, method: str, board: chess.Board, limit: chess.engine.Limit):
+        engine = self.idle.get()
+        try:
+            return getattr(engine, method)(board, limit, game=object())  # a new game object sends ucinewgame
+        finally:
+            self.idle.put(engine)
+
+    def map(self, method: str, boards: list[chess.Board], limit: chess.engine.Limit) -> list:
+        """
+        Call engine.play or engine.analyse on every position, spread over the pool.
+
+        Args:
+            method (str): "play" or "analyse".
+            boards (list[chess.Board]): Positions to search.
+            limit (chess.engine.Limit): Search limit of each position.
+
+        Returns:
+            list: The engine's result for each position, in the order of boards.
+        """
+        futures = [self.executor.submit(self._run, method, board, limit) for board in boards]
+        return [future.result() for future in futures]
+
+    def play(self, boards: list[chess.Board], limit: chess.engine.Limit) -> list[chess.engine.PlayResult]:
+        return self.map("play", boards, limit)
+
+    def analyse(self, boards: list[chess.Board], limit: chess.engine.Limit) -> list[chess.engine.InfoDict]:
+        return self.map("analyse", boards, limit)
+
+    def close(self, keep: list[chess.engine.SimpleEngine] | None = None):
+        """Stop the engine processes, apart from the ones in keep."""
+        self.executor.shutdown()
+        for engine in self.engines:
+            if keep is None or engine not in keep:
+                engine.quit()
+
+
+def limit_covers(stored: chess.engine.Limit, requested: chess.engine.Limit) -> bool:
+    """
+    Whether a search under the stored limit went at least as far as one under the requested limit would.
+    Only limits of the same kind compare: depth with depth, nodes with nodes, time with time.
+    """
+    kinds = ("depth", "nodes", "time")
+    stored_kinds = {kind: getattr(stored, kind) for kind in kinds if getattr(stored, kind) is not None}
+    requested_kinds = {kind: getattr(requested, kind) for kind in kinds if getattr(requested, kind) is not None}
+    if not requested_kinds or set(stored_kinds) != set(requested_kinds):
+        return False
+    return all(stored_kinds[kind] >= value for kind, value in requested_kinds.items())
+
+
+class EvalCache:
+    """
+    Engine analyses of the positions of one game, keyed by the position's Zobrist hash, so a position already
+    searched, during the game or by an earlier analysis, is not sent to the engine again at the same or a lower limit.
+    """
+
+    def __init__(self):
+        self.entries = {}  # key -> (limit, info)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, board: chess.Board, limit: chess.engine.Limit) -> chess.engine.InfoDict | None:
+        """The stored analysis of the position if it was searched at least as far as limit, otherwise None."""
+        entry = self.entries.get(chess.polyglot.zobrist_hash(board))
+        if entry is not None and limit_covers(entry[0], limit):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, board: chess.Board, limit: chess.engine.Limit, info: chess.engine.InfoDict):
+        key = chess.polyglot.zobrist_hash(board)
+        entry = self.entries.get(key)
+        if entry is None or not limit_covers(entry[0], limit):  # keep the deeper analysis
+            self.entries[key] = (limit, info)
+
+    def analyse(self, engine: chess.engine.SimpleEngine, board: chess.Board,
+                limit: chess.engine.Limit) -> chess.engine.InfoDict:
+        """engine.analyse through the cache."""
+        info = self.get(board, limit)
+        if info is None:
+            info = engine.analyse(board, limit)
+            self.put(board, limit, info)
+        return info
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __str__(self) -> str:
+        lookups = self.hits + self.misses
+        return (f"Eval cache: {len(self)} positions, {self.hits}/{lookups} hits "
+                f"({self.hits / lookups if lookups else 0:.0%})")
+
+
+# persistent evaluation store, shared by every game and process on the machine
+EVAL_STORE_VERSION = 1  # SQLite user_version of the schema, a store of another version is rebuilt
+DEFAULT_EVAL_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "evals.sqlite")
+DEFAULT_MAX_EVALS = 500_000  # rows kept, about 50 bytes each
+EVICT_FRACTION = 0.1  # share of the rows, least recently used first, deleted once the store is full
+EVICTION_CHECK_INTERVAL = 100  # writes between checks of the store's size
+BUSY_TIMEOUT = 5.0  # seconds a write waits for another process's write to finish
+
+
+def _limit_kind(limit: chess.engine.Limit) -> tuple[str, float] | None:
+    """The kind and value of a limit with exactly one of depth, nodes or time, the limits the store keeps."""
+    kinds = [(kind, getattr(limit, kind)) for kind in ("depth", "nodes", "time") if getattr(limit, kind) is not None]
+    return kinds[0] if len(kinds) == 1 else None
+
+
+class PersistentEvalCache(EvalCache):
+    """
+    EvalCache backed by a SQLite file, so an analysis is reused by later games and after restarts.
+    Each row holds the score, best move and depth of one position and limit kind, at the highest limit searched.
+    The store runs in write-ahead logging mode, so any number of processes can read it while one writes. Once it
+    holds more than max_entries rows, the least recently used ones are deleted.
+    https://www.sqlite.org/wal.html
+
+    Args:
+        path (str, optional): SQLite file, created if it does not exist. Defaults to DEFAULT_EVAL_STORE_PATH.
+        max_entries (int, optional): Rows kept before eviction. Defaults to DEFAULT_MAX_EVALS.
+    """
+
+    def __init__(self, path: str = DEFAULT_EVAL_STORE_PATH, max_entries: int = DEFAULT_MAX_EVALS):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.store_hits = 0  # hits answered from the file rather than from this game's entries
+        self.evictions = 0
+        self._writes = 0
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # a crash can lose the last writes, never corrupt
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != EVAL_STORE_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS evals")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS evals (
+            key INTEGER NOT NULL, kind TEXT NOT NULL, value REAL NOT NULL, cp INTEGER, mate INTEGER, move TEXT,
+            depth INTEGER, last_used REAL NOT NULL, PRIMARY KEY (key, kind))""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS evals_last_used ON evals (last_used)")
+        self.connection.execute(f"PRAGMA user_version={EVAL_STORE_VERSION}")
+
+    @staticmethod
+    def _key(board: chess.Board) -> int:
+        return chess.polyglot.zobrist_hash(board) - (1 << 63)  # SQLite integers are signed 64 bit
+
+    def get(self, board: chess.Board, limit: chess.engine.Limit) -> chess.engine.InfoDict | None:
+        key = chess.polyglot.zobrist_hash(board)
+        entry = self.entries.get(key)
+        if entry is not None and limit_covers(entry[0], limit):
+            self.hits += 1
+            return entry[1]
+        kind = _limit_kind(limit)
+        row = None
+        if kind is not None:
+            row = self.connection.execute("SELECT value, cp, mate, move, depth FROM evals "
+                                          "WHERE key = ? AND kind = ? AND value >= ?",
+                                          (self._key(board), kind[0], kind[1])).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        value, cp, mate, move, depth = row
+        self.connection.execute("UPDATE evals SET last_used = ? WHERE key = ? AND kind = ?",
+                                (time.time(), self._key(board), kind[0]))
+        score = chess.engine.Mate(mate) if mate is not None else chess.engine.Cp(cp)
+        info = {"score": chess.engine.PovScore(score, chess.WHITE), "pv": [chess.Move.from_uci(move)] if move else [],
+                "depth": depth}
+        stored_limit = chess.engine.Limit(**{kind[0]: int(value) if kind[0] != "time" else value})
+        self.entries[key] = (stored_limit, info)
+        self.hits += 1
+        self.store_hits += 1
+        return info
+
+    def put(self, board: chess.Board, limit: chess.engine.Limit, info: chess.engine.InfoDict):
+        super().put(board, limit, info)
+        kind = _limit_kind(limit)
+        if kind is None or "score" not in info:
+            return
+        score = info["score"].white()
+        pv = info.get("pv")
+        self.connection.execute("""INSERT INTO evals (key, kind, value, cp, mate, move, depth, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (key, kind) DO UPDATE SET value = excluded.value, cp = excluded.cp, mate = excluded.mate,
+                move = excluded.move, depth = excluded.depth, last_used = excluded.last_used
+            WHERE excluded.value > evals.value""",
+                                (self._key(board), kind[0], kind[1], score.score(), score.mate(),
+                                 pv[0].uci() if pv else None, info.get("depth"), time.time()))
+        self._writes += 1
+        if self._writes % EVICTION_CHECK_INTERVAL == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Delete the least recently used rows once the store holds more than max_entries, down to
+        (1 - EVICT_FRACTION) of it, so eviction runs rarely.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+        rows = self.connection.execute("SELECT COUNT(*) FROM evals").fetchone()[0]
+        if rows <= self.max_entries:
+            return 0
+        excess = rows - int(self.max_entries * (1 - EVICT_FRACTION))
+        self.connection.execute("DELETE FROM evals WHERE rowid IN "
+                                "(SELECT rowid FROM evals ORDER BY last_used LIMIT ?)", (excess,))
+        self.evictions += excess
+        return excess
+
+    def stored(self) -> int:
+        """Rows in the store."""
+        return self.connection.execute("SELECT COUNT(*) FROM evals").fetchone()[0]
+
+    def close(self):
+        self.evict()
+        self.connection.close()
+
+    def __str__(self) -> str:
+        lookups = self.hits + self.misses
+        return (f"Eval cache: {self.hits}/{lookups} hits ({self.hits / lookups if lookups else 0:.0%}), "
+                f"{self.store_hits} from {self.path}, which holds {self.stored()} positions, "
+                f"{self.evictions} evicted")
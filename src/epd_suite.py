@@ -0,0 +1,228 @@
+import argparse
+import concurrent.futures
+import json
+import math
+import time
+import chess
+import movegen
+from tt import TranspositionTable
+
+# Runs EPD test suites such as WAC or ECM: each position has best moves (bm) to find or moves to avoid (am).
+# Beyond solved or not, the time and nodes to solution show whether a search change finds the moves sooner.
+# https://www.chessprogramming.org/Extended_Position_Description
+# https://www.chessprogramming.org/Test-Positions
+
+DEFAULT_MOVETIME = 1.0  # seconds per position when no budget is given
+
+
+def load_suite(path: str) -> list[dict]:
+    """
+    Read the positions of an EPD file that have a bm or am operation.
+
+    Args:
+        path (str): EPD file, one position per line.
+
+    Returns:
+        list[dict]: Id, FEN, best moves and avoid moves in UCI of each position.
+
+    Raises:
+        Exception: On a line that is not valid EPD
+    """
+    positions = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                board, operations = chess.Board.from_epd(line)
+            except ValueError as e:
+                raise Exception(f"Line {number} of {path} is not valid EPD: {e}")
+            if "bm" not in operations and "am" not in operations:
+                continue
+            positions.append({"id": str(operations.get("id", number)), "fen": board.fen(),
+                              "bm": [move.uci() for move in operations.get("bm", [])],
+                              "am": [move.uci() for move in operations.get("am", [])]})
+    return positions
+
+
+def is_solution(position: dict, move: chess.Move | None) -> bool:
+    """Whether move is one of the best moves of the position and none of the moves to avoid."""
+    if move is None:
+        return False
+    if position["bm"] and move.uci() not in position["bm"]:
+        return False
+    return move.uci() not in position["am"]
+
+
+def solve_position(position: dict, depth: int | None = None, movetime: float | None = None,
+                   nodes: int | None = None, hash_mb: float = 16) -> dict:
+    """
+    Search a suite position with an empty transposition table. It is solved when the move played is a solution,
+    and the solution is found at the first completed iteration from which every iteration played a solution.
+
+    Args:
+        position (dict): Position from load_suite.
+        depth (int, optional): Maximum depth of the search.
+        movetime (float, optional): Time budget in seconds.
+        nodes (int, optional): Node budget.
+        hash_mb (float, optional): Size of the transposition table in MB.
+
+    Returns:
+        dict: The position, the move played, whether it solved it, the time and nodes of the search, and the
+            time and nodes to solution (None if unsolved).
+    """
+    board = chess.Board(position["fen"])
+    ctx = movegen.SearchContext(tt=TranspositionTable(hash_mb), movetime=movetime, node_limit=nodes)
+    move = movegen.iterative_deepening(board, depth, ctx)
+    elapsed = ctx.elapsed()
+    solved = is_solution(position, move)
+
+    time_to_solution = nodes_to_solution = None
+    if solved:
+        # the move is that of the last completed iteration, so the solution is found at the latest there
+        spent_time, spent_nodes = 0.0, 0
+        found = None
+        for iteration in ctx.iterations:
+            spent_time += iteration["time"]
+            spent_nodes += iteration["nodes"]
+            if not is_solution(position, iteration["move"]):
+                found = None
+            elif found is None:
+                found = (spent_time, spent_nodes)
+        time_to_solution, nodes_to_solution = found
+
+    return {"id": position["id"], "fen": position["fen"], "bm": position["bm"], "am": position["am"],
+            "move": move.uci() if move else None, "solved": solved, "depth": ctx.completed_depth,
+            "time": elapsed, "nodes": ctx.nodes, "time_to_solution": time_to_solution,
+            "nodes_to_solution": nodes_to_solution}
+
+
+def run_suite(positions: list[dict], depth: int | None = None, movetime: float | None = None,
+              nodes: int | None = None, workers: int = 1, hash_mb: float = 16) -> dict:
+    """
+    Solve every position of a suite, split across worker processes. Each position gets the same budget.
+
+    Args:
+        positions (list[dict]): Positions from load_suite.
+        depth (int, optional): Maximum depth of each search.
+        movetime (float, optional): Time budget of each search. Defaults to DEFAULT_MOVETIME when no budget is set.
+        nodes (int, optional): Node budget of each search.
+        workers (int, optional): Number of processes. Defaults to 1, in this process.
+        hash_mb (float, optional): Size of each transposition table in MB.
+
+    Returns:
+        dict: The budget, the result of each position in suite order, and the totals.
+    """
+    if depth is None and movetime is None and nodes is None:
+        movetime = DEFAULT_MOVETIME
+    arguments = [(position, depth, movetime, nodes, hash_mb) for position in positions]
+    t0 = time.perf_counter()
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(solve_position, *zip(*arguments)))
+    else:
+        results = [solve_position(*position_arguments) for position_arguments in arguments]
+    solved = [result for result in results if result["solved"]]
+    return {
+        "budget": {"depth": depth, "movetime": movetime, "nodes": nodes},
+        "positions": results,
+        "solved": len(solved),
+        "total": len(results),
+        "time": time.perf_counter() - t0,
+        "search_time": sum(result["time"] for result in results),
+        "nodes": sum(result["nodes"] for result in results),
+        "time_to_solution": sum(result["time_to_solution"] for result in solved),
+        "nodes_to_solution": sum(result["nodes_to_solution"] for result in solved),
+    }
+
+
+def compare_runs(first: dict, second: dict) -> dict:
+    """
+    Compare two runs of the same suite, position by position.
+
+    Args:
+        first (dict): Run from run_suite, usually the baseline.
+        second (dict): Run to compare with it.
+
+    Returns:
+        dict: Each position's result in both runs, the positions only one run solved, and over the positions both
+            solved, the ratio of the second run's time and nodes to solution to the first's (geometric mean).
+    """
+    second_results = {result["id"]: result for result in second["positions"]}
+    rows = []
+    time_ratios, node_ratios = [], []
+    for a in first["positions"]:
+        b = second_results.get(a["id"])
+        if b is None:
+            continue
+        rows.append({"id": a["id"], "first": a, "second": b})
+        if a["solved"] and b["solved"]:
+            if a["time_to_solution"] > 0 and b["time_to_solution"] > 0:
+                time_ratios.append(b["time_to_solution"] / a["time_to_solution"])
+            if a["nodes_to_solution"] > 0 and b["nodes_to_solution"] > 0:
+                node_ratios.append(b["nodes_to_solution"] / a["nodes_to_solution"])
+
+    def geometric_mean(ratios):
+        return math.exp(sum(math.log(ratio) for ratio in ratios) / len(ratios)) if ratios else None
+
+    return {
+        "rows": rows,
+        "solved": (first["solved"], second["solved"]),
+        "only_first": [row["id"] for row in rows if row["first"]["solved"] and not row["second"]["solved"]],
+        "only_second": [row["id"] for row in rows if row["second"]["solved"] and not row["first"]["solved"]],
+        "both": sum(1 for row in rows if row["first"]["solved"] and row["second"]["solved"]),
+        "time_ratio": geometric_mean(time_ratios),
+        "nodes_ratio": geometric_mean(node_ratios),
+    }
+
+
+def _solution(result: dict) -> str:
+    if not result["solved"]:
+        return f"{result['move'] or '-':>7} unsolved"
+    return f"{result['move']:>7} {result['time_to_solution']:7.2f}s {result['nodes_to_solution']:>9}"
+
+
+def print_comparison(comparison: dict, first_name: str, second_name: str):
+    print(f"{'id':<12} {first_name:>28} {second_name:>28}")
+    for row in comparison["rows"]:
+        print(f"{row['id']:<12} {_solution(row['first']):>28} {_solution(row['second']):>28}")
+    print(f"Solved: {comparison['solved'][0]} vs {comparison['solved'][1]}, "
+          f"only {first_name}: {comparison['only_first']}, only {second_name}: {comparison['only_second']}")
+    if comparison["both"]:
+        print(f"Over the {comparison['both']} positions both solved, {second_name} needs "
+              f"{comparison['time_ratio']:.2f}x the time and {comparison['nodes_ratio']:.2f}x the nodes to solution")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run cobra on an EPD test suite, or compare two runs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Run a suite.")
+    run_parser.add_argument("epd", help="EPD file with bm or am operations.")
+    run_parser.add_argument("--movetime", type=float, default=None,
+                            help=f"Seconds per position. Defaults to {DEFAULT_MOVETIME} when no budget is given.")
+    run_parser.add_argument("--nodes", type=int, default=None, help="Node budget per position.")
+    run_parser.add_argument("--depth", type=int, default=None, help="Maximum depth per position.")
+    run_parser.add_argument("--workers", type=int, default=1, help="Number of processes.")
+    run_parser.add_argument("--hash", type=int, default=16, help="Transposition table size in MB per position.")
+    run_parser.add_argument("--json", type=str, default=None, help="File to write the results to.")
+    compare_parser = subparsers.add_parser("compare", help="Compare two runs side by side.")
+    compare_parser.add_argument("first", help="Results JSON of the first run, usually the baseline.")
+    compare_parser.add_argument("second", help="Results JSON of the second run.")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run = run_suite(load_suite(args.epd), args.depth, args.movetime, args.nodes, args.workers, args.hash)
+        for result in run["positions"]:
+            print(f"{result['id']:<12} {_solution(result)}")
+        print(f"Solved {run['solved']}/{run['total']} in {run['time']:.1f}s, "
+              f"time to solution {run['time_to_solution']:.2f}s, nodes to solution {run['nodes_to_solution']}")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(run, f, indent=2)
+    else:
+        runs = []
+        for path in (args.first, args.second):
+            with open(path) as f:
+                runs.append(json.load(f))
+        print_comparison(compare_runs(*runs), args.first, args.second)
@@ -1,4 +1,5 @@
 import chess
+from position import Position
 
 # centipawn values for each piece from Tomasz Michniewski's Simplified Evaluation Function
 # https://www.chessprogramming.org/Simplified_Evaluation_Function
@@ -157,6 +158,113 @@ def evaluate_capture(board: chess.Board, move: chess.Move) -> int:
     return piece_value[_to.piece_type] - piece_value[_from.piece_type]
 
 
+def evaluate_capture_see(board: chess.Board, move: chess.Move) -> int:
+    """Given a capturing move, generate a centipawn value of the whole exchange it starts on the captured square,
+    as found by static_exchange_evaluation. Unlike evaluate_capture, a capture of a defended piece is charged
+    for the recapture, and a capture of an undefended piece is not charged at all.
+
+    Args:
+        board (chess.Board):
+        move (chess.Move):
+
+    Raises:
+        Exception: If there is no piece at the to or from square
+
+    Returns:
+        int: Centipawn material gain of the exchange for the side making the capture
+    """
+    if not board.is_en_passant(move) and (board.piece_type_at(move.to_square) is None
+                                          or board.piece_type_at(move.from_square) is None):
+        raise Exception(
+            f"Pieces were expected at _both_ {move.to_square} and {move.from_square}"
+        )
+    return static_exchange_evaluation(board, move)
+
+
+def _attackers(board: chess.Board, square: chess.Square, occupied: int) -> int:
+    """Pieces of either color attacking square when only the pieces in occupied are on the board."""
+    queens_and_rooks = board.queens | board.rooks
+    queens_and_bishops = board.queens | board.bishops
+    attackers = ((chess.BB_KING_ATTACKS[square] & board.kings)
+                 | (chess.BB_KNIGHT_ATTACKS[square] & board.knights)
+                 | (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] & queens_and_rooks)
+                 | (chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied] & queens_and_rooks)
+                 | (chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied] & queens_and_bishops)
+                 | (chess.BB_PAWN_ATTACKS[chess.WHITE][square] & board.pawns & board.occupied_co[chess.BLACK])
+                 | (chess.BB_PAWN_ATTACKS[chess.BLACK][square] & board.pawns & board.occupied_co[chess.WHITE]))
+    return attackers & occupied
+
+
+def static_exchange_evaluation(board: chess.Board, move: chess.Move) -> int:
+    """
+    Material won or lost by the side to move if move starts a sequence of captures on its to square, where both
+    sides always recapture with their least valuable piece and may stop whenever continuing would lose material.
+    Sliding pieces behind a capturing piece join in once it has moved (x-rays). Pins are not considered.
+    Swap algorithm from https://www.chessprogramming.org/SEE_-_The_Swap_Algorithm
+
+    Args:
+        board (chess.Board): Position before the move.
+        move (chess.Move): A legal move, usually a capture.
+
+    Returns:
+        int: Centipawn gain for the side to move, 0 or more for an even or winning exchange
+    """
+    return exchange_value(board, move.from_square, move.to_square, move.promotion, board.is_en_passant(move))
+
+
+def exchange_value(board: chess.Board | Position, from_square: chess.Square, to_square: chess.Square,
+                   promotion: chess.PieceType | None, en_passant: bool) -> int:
+    """
+    static_exchange_evaluation of the move from_square to to_square, for a chess.Board or a Position,
+    whose moves are ints.
+
+    Args:
+        board (chess.Board | Position): Position before the move.
+        from_square (chess.Square): Square the move starts from.
+        to_square (chess.Square): Square the move goes to.
+        promotion (chess.PieceType | None): Piece type the pawn promotes to, if any.
+        en_passant (bool): Whether the move is an en passant capture.
+
+    Returns:
+        int: Centipawn gain for the side to move, 0 or more for an even or winning exchange
+    """
+    occupied = board.occupied ^ chess.BB_SQUARES[from_square]
+    if en_passant:
+        captured = piece_value[chess.PAWN]
+        occupied ^= chess.BB_SQUARES[to_square + (-8 if board.turn == chess.WHITE else 8)]
+    else:
+        captured_type = board.piece_type_at(to_square)
+        captured = piece_value[captured_type] if captured_type else 0
+    on_square = piece_value[board.piece_type_at(from_square)]
+    if promotion:
+        captured += piece_value[promotion] - piece_value[chess.PAWN]
+        on_square = piece_value[promotion]
+
+    # gains[i] is the material balance for the side making capture i, if the exchange stopped after it
+    gains = [captured]
+    color = not board.turn
+    attackers = _attackers(board, to_square, occupied)
+    while True:
+        side_attackers = attackers & board.occupied_co[color]
+        if not side_attackers:
+            break
+        for piece_type in chess.PIECE_TYPES:  # least valuable attacker first
+            piece_attackers = side_attackers & board.pieces_mask(piece_type, color)
+            if piece_attackers:
+                break
+        gains.append(on_square - gains[-1])
+        on_square = piece_value[piece_type]
+        occupied ^= piece_attackers & -piece_attackers
+        attackers = _attackers(board, to_square, occupied)
+        color = not color
+
+    # each side only makes its capture if that is better for it than stopping the exchange before it
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
+
+
 def evaluate_piece(piece: chess.Piece, square: chess.Square, end_game: bool) -> int:
     """
     Evaluates the value of a piece at a given square.
@@ -226,3 +334,131 @@ def check_end_game(board: chess.Board) -> bool:
 
     return queens == 0 or (queens == 2 and minor_pieces <= 1)
 
+
+def _square_tables(end_game: bool) -> list[list[list[int]]]:
+    """Piece value plus piece-square value for every [color][piece type][square], signed from White's view."""
+    tables = [[[] for _ in range(7)] for _ in range(2)]
+    for color in chess.COLORS:
+        sign = 1 if color == chess.WHITE else -1
+        for piece_type in chess.PIECE_TYPES:
+            piece = chess.Piece(piece_type, color)
+            tables[color][piece_type] = [sign * (piece_value[piece_type] + evaluate_piece(piece, square, end_game))
+                                         for square in chess.SQUARES]
+    return tables
+
+
+# evaluate_board is the sum of these entries over all pieces; the tables only differ for kings
+middle_game_tables = _square_tables(False)
+end_game_tables = _square_tables(True)
+
+
+class IncrementalEvaluator:
+    """
+    Keeps the evaluate_board score and the check_end_game counters up to date as moves are made and unmade,
+    so evaluating a position in the search does not have to scan the board.
+    Incremental evaluation from https://www.chessprogramming.org/Incremental_Updates
+
+    Args:
+        board (Position): Position to start from. Moves must then be made with push() and pop().
+        debug (bool, optional): Cross-check every evaluation against evaluate_board. Defaults to False.
+    """
+
+    def __init__(self, board: Position, debug: bool = False):
+        self.debug = debug
+        self.middle_game = 0  # score using the middle game king table
+        self.end_game = 0  # score using the end game king table
+        self.queens = 0
+        self.minor_pieces = 0
+        self.stack = []
+
+        for square, piece in board.piece_map().items():
+            self.middle_game += middle_game_tables[piece.color][piece.piece_type][square]
+            self.end_game += end_game_tables[piece.color][piece.piece_type][square]
+            if piece.piece_type == chess.QUEEN:
+                self.queens += 1
+            elif piece.piece_type in (chess.BISHOP, chess.KNIGHT):
+                self.minor_pieces += 1
+
+    def is_end_game(self) -> bool:
+        """Same result as check_end_game, from the maintained counters."""
+        return self.queens == 0 or (self.queens == 2 and self.minor_pieces <= 1)
+
+    def evaluate(self, board: Position | None = None) -> int:
+        """
+        Same result as evaluate_board for the current position.
+
+        Args:
+            board (Position, optional): Current position, only needed for the debug cross-check.
+
+        Raises:
+            Exception: In debug mode, if the incremental score differs from evaluate_board
+
+        Returns:
+            int: Centipawn score, positive when White is better
+        """
+        score = self.end_game if self.is_end_game() else self.middle_game
+        if self.debug and board is not None:
+            full_score = evaluate_board(board)
+            if score != full_score:
+                raise Exception(f"Incremental score {score} does not match evaluate_board {full_score} "
+                                f"for {board.fen()}")
+        return score
+
+    def push(self, board: Position, move: int):
+        """Update the score for the int move, then make it on the Position."""
+        self.stack.append((self.middle_game, self.end_game, self.queens, self.minor_pieces))
+        if move:  # a null move changes nothing
+            self._apply(board, move)
+        board.push(move)
+
+    def pop(self, board: Position):
+        """Unmake the last move on the Position and restore the score from before it."""
+        board.pop()
+        self.middle_game, self.end_game, self.queens, self.minor_pieces = self.stack.pop()
+
+    def _apply(self, board: Position, move: int):
+        color = board.turn
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        piece_type = board.mailbox[from_square] & 7
+        if not piece_type:
+            raise Exception(f"A piece was expected at {from_square}")
+        middle, end = middle_game_tables[color], end_game_tables[color]
+        delta_middle = -middle[piece_type][from_square]
+        delta_end = -end[piece_type][from_square]
+
+        if board.is_castling(move):
+            # the king moves two squares and the rook jumps over it
+            rook_from, rook_to = (to_square + 1, to_square - 1) if to_square > from_square \
+                else (to_square - 2, to_square + 1)
+            self.middle_game += (delta_middle + middle[chess.KING][to_square]
+                                 - middle[chess.ROOK][rook_from] + middle[chess.ROOK][rook_to])
+            self.end_game += (delta_end + end[chess.KING][to_square]
+                              - end[chess.ROOK][rook_from] + end[chess.ROOK][rook_to])
+            return
+
+        if board.is_en_passant(move):
+            captured_square = to_square + (-8 if color == chess.WHITE else 8)
+            captured_type = chess.PAWN
+        else:
+            captured_square = to_square
+            captured_type = board.mailbox[to_square] & 7
+
+        if captured_type:
+            delta_middle -= middle_game_tables[not color][captured_type][captured_square]
+            delta_end -= end_game_tables[not color][captured_type][captured_square]
+            if captured_type == chess.QUEEN:
+                self.queens -= 1
+            elif captured_type in (chess.BISHOP, chess.KNIGHT):
+                self.minor_pieces -= 1
+
+        promotion = move >> 12
+        if promotion:
+            piece_type = promotion
+            if piece_type == chess.QUEEN:
+                self.queens += 1
+            elif piece_type in (chess.BISHOP, chess.KNIGHT):
+                self.minor_pieces += 1
+
+        self.middle_game += delta_middle + middle[piece_type][to_square]
+        self.end_game += delta_end + end[piece_type][to_square]
@@ -1,14 +1,18 @@
 from communication import communicate
+import multiprocessing
 import sys
 import signal
 from communication import signal_handler
 
-# Register the signal handler for graceful shutdown
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+if __name__ == "__main__":  # worker processes of the parallel search import this module
+    multiprocessing.freeze_support()  # needed for the worker processes in a frozen (PyInstaller) build
 
-try:
-    communicate()
-except Exception as e:
-    print("Error: " + str(e))
-    exit()
+    # Register the signal handler for graceful shutdown
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    try:
+        communicate()
+    except Exception as e:
+        print("Error: " + str(e))
+        exit()
@@ -1,31 +1,448 @@
 import chess
 import time
-from eval import evaluate_board, move_value, check_end_game
+from eval import move_value, check_end_game, IncrementalEvaluator, piece_value, exchange_value
+from tt import TranspositionTable, PersistentTranspositionTable, EXACT, LOWER, UPPER, zobrist_key
+from ordering import MoveOrderer, HeuristicOrderer, mvv_lva
+from position import Position, move_to_chess, move_from_chess, NULL_MOVE
+from book import OpeningBook
+from bitbase import load_or_generate
 
 MATE_SCORE = 9999  # arbitrary score for checkmate - checkmate condition is the best quantifiable outcome
-MATE_THRESHOLD = 9990  # threshold for checkmate - if the score is above this, the game is over
+# mates are scored MATE_SCORE less the ply they happen at, so a shorter mate scores higher
+MATE_THRESHOLD = MATE_SCORE - 128  # threshold for checkmate - if the score is above this, the game is over
 
+# shared between moves of a game, so positions searched for the previous move are reused
+transposition_table = TranspositionTable()
 
-def next_move(depth: int, board: chess.Board) -> chess.Move:
+
+def set_hash_size(size_mb: float):
+    """Replace the shared transposition table with an empty one of the given size in megabytes."""
+    global transposition_table
+    transposition_table = TranspositionTable(size_mb)
+
+
+def set_hash_file(path: str) -> PersistentTranspositionTable:
     """
-    Determine the next best move.
+    Back the shared transposition table with the file at path, keeping its size, so later games start from the
+    entries of this one. The table has to be flushed or closed at the end of the game to be reused.
 
     Args:
-        depth (int): The depth to which the minimax algorithm should run.
+        path (str): Table file, created if it does not exist.
+
+    Returns:
+        PersistentTranspositionTable: The new shared table.
+    """
+    global transposition_table
+    if isinstance(transposition_table, PersistentTranspositionTable):
+        transposition_table.close()
+    transposition_table = PersistentTranspositionTable(path, transposition_table.size_mb)
+    return transposition_table
+
+
+# book moves are played without a search while the game is in the book
+opening_book = None
+
+
+def set_book(path: str | None, seed: int | None = None):
+    """
+    Use the Polyglot book at path for the opening, or no book if path is None.
+
+    Args:
+        path (str | None): Path of the book file.
+        seed (int, optional): Seed of the weighted choice between book moves. Defaults to a random seed.
+    """
+    global opening_book
+    if opening_book is not None:
+        opening_book.close()
+    opening_book = OpeningBook(path, seed) if path is not None else None
+
+
+# exact win/draw results of king and piece against king, probed instead of searching such positions
+endgame_bitbase = None
+bitbase_path = None  # file endgame_bitbase was loaded from, for worker processes to load it too
+KNOWN_WIN = 5000  # base score of a bitbase win, below every mate score
+PAWN_PROGRESS = 50  # bonus per rank the pawn has advanced in a won KPK position
+EDGE_BONUS = 50  # bonus per step the lone king is from the centre
+PROXIMITY_BONUS = 20  # bonus per step the kings are closer than the width of the board
+# distance of each square from the four centre squares, for driving the lone king to the edge
+CENTER_DISTANCE = [max(3 - chess.square_file(square), chess.square_file(square) - 4, 0)
+                   + max(3 - chess.square_rank(square), chess.square_rank(square) - 4, 0) for square in chess.SQUARES]
+
+
+def set_bitbase(path: str | None):
+    """
+    Probe the endgame bitbase at path in the search, generating it first if the file does not exist yet,
+    or stop probing if path is None.
+    """
+    global endgame_bitbase, bitbase_path
+    endgame_bitbase = load_or_generate(path) if path is not None else None
+    bitbase_path = path
+
+
+MAX_DEPTH = 64  # iterative deepening limit when only a time or node budget is given
+
+# selective search techniques, each can be switched off through SearchContext
+DEFAULT_PRUNING = {"null_move": True, "lmr": True, "futility": True, "mate_distance": True, "delta": True, "see": True}
+NULL_MOVE_REDUCTION = 2  # depth reduction R of the null move search
+NULL_MOVE_MIN_DEPTH = 3
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVE_INDEX = 3  # moves searched before late move reductions start
+FUTILITY_MARGIN = 200  # more than a quiet move can change the evaluation by
+ASPIRATION_MIN_DEPTH = 3  # first iteration searched with an aspiration window
+ASPIRATION_WINDOW = 50  # initial distance of the window bounds from the previous score
+ASPIRATION_MAX_WINDOW = 400  # once the window has been widened this far, it is opened fully
+DELTA_MARGIN = 200  # quiescence search: captures that cannot bring the score this close to alpha are skipped
+
+
+def score_to_tt(score: float, ply: int) -> float:
+    """Mate scores are stored as the distance to mate from the stored position rather than from the root."""
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_tt(score: float, ply: int) -> float:
+    """Inverse of score_to_tt for a position ply plies from the root."""
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when the time or node budget has run out."""
+
+
+class SearchContext:
+    """
+    State shared by every node of one search: the transposition table, budgets, the searched Position,
+    the principal variation and the Zobrist keys of the positions leading to the current node.
+    The search runs on a Position with int moves (see position.py); chess.Move objects only appear at its entry
+    points, next_move, search_move, iterative_deepening, find_best_move_minimax and minimax.
+
+    Args:
+        tt (TranspositionTable, optional): Table to consult and fill. Defaults to the shared table.
+        movetime (float, optional): Time budget in seconds.
+        node_limit (int, optional): Maximum number of nodes to search.
+        debug_eval (bool, optional): Cross-check the incremental evaluation against evaluate_board, and the
+            incremental Zobrist keys against zobrist_key. Defaults to False.
+        orderer (MoveOrderer, optional): Move ordering used by the search. Defaults to a HeuristicOrderer.
+        pruning (dict, optional): Selective search techniques to switch on or off, by their DEFAULT_PRUNING name.
+            Defaults to DEFAULT_PRUNING, everything on.
+        quiescence (bool, optional): Search captures beyond the nominal depth, rather than evaluating
+            positions in the middle of an exchange. Defaults to True.
+    """
+
+    def __init__(self, tt: TranspositionTable | None = None, movetime: float | None = None,
+                 node_limit: int | None = None, debug_eval: bool = False, orderer: MoveOrderer | None = None,
+                 pruning: dict | None = None, quiescence: bool = True):
+        self.tt = tt if tt is not None else transposition_table
+        self.orderer = orderer if orderer is not None else HeuristicOrderer()
+        self.pruning = dict(DEFAULT_PRUNING)
+        if pruning is not None:
+            unknown = set(pruning) - set(DEFAULT_PRUNING)
+            if unknown:
+                raise Exception(f"Unknown pruning techniques {sorted(unknown)}")
+            self.pruning.update(pruning)
+        self.null_move_disabled = 0  # above 0 while a null move cutoff is being verified
+        self.quiescence = quiescence
+        self.start_time = time.perf_counter()
+        self.deadline = self.start_time + movetime if movetime is not None else None
+        self.node_limit = node_limit
+        self.stopped = False  # set from another thread to abort the search, see stop()
+        self.nodes = 0
+        self.completed_depth = 0
+        self.book_move = False  # whether the move was taken from the opening book, without a search
+        self.bitbase_hits = 0
+        self.bitbase_cutoffs = False  # set at the root, see root_moves
+        self.pv = []  # principal variation of the last completed iteration, as int moves
+        self.follow_pv = False  # True while the search is walking down the previous principal variation
+        self.debug_eval = debug_eval
+        self.position = None  # Position searched, set up at the root
+        self.evaluator = None  # IncrementalEvaluator following the position, set up at the root
+        self.keys = []  # Zobrist keys of the game history and the search path, the current position last
+        self.root_index = 0  # index of the root position in keys
+        self.null_indexes = []  # indexes in keys of the positions after the null moves on the search path
+        self.score = 0  # score of the last root search, from White's point of view
+        self.seldepth = 0  # deepest ply reached
+        self.iterations = []  # time, nodes and best move of each completed iteration
+        self.iteration_start = (self.start_time, 0)
+
+    def count_node(self):
+        """
+        Count a node and abort the search once a budget is spent or the search has been stopped.
+        Apart from a stop, the first iteration always completes.
+        """
+        self.nodes += 1
+        if self.stopped:
+            raise SearchAborted
+        if self.completed_depth == 0:
+            return
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted
+
+    def set_root(self, board: chess.Board) -> Position:
+        """
+        Start a search from board: convert it to the Position the search makes its moves on, and set up the
+        evaluator and the key stack. Only positions since the last irreversible move can repeat, so the game
+        history is read back that far.
+
+        Returns:
+            Position: The root position, which the search then follows with push and pop.
+        """
+        self.position = Position(board)
+        self.evaluator = IncrementalEvaluator(self.position, self.debug_eval)
+        history = board.copy(stack=min(board.halfmove_clock, len(board.move_stack)))
+        keys = [zobrist_key(history)]
+        while history.move_stack:
+            history.pop()
+            keys.append(zobrist_key(history))
+        keys.reverse()
+        self.keys = keys
+        self.root_index = len(keys) - 1
+        self.null_indexes = []
+        return self.position
+
+    def push(self, board: Position, move: int):
+        """Make move on board, updating the evaluator and the key stack."""
+        self.evaluator.push(board, move)
+        key = board.key
+        self.keys.append(key)
+        if move == NULL_MOVE:
+            self.null_indexes.append(len(self.keys) - 1)
+        if self.debug_eval and key != zobrist_key(board.to_board()):
+            raise Exception(f"Incremental Zobrist key {key:#x} != {zobrist_key(board.to_board()):#x} "
+                            f"for {board.fen()}")
+
+    def pop(self, board: Position):
+        """Take back the last move made with push."""
+        if self.null_indexes and self.null_indexes[-1] == len(self.keys) - 1:
+            self.null_indexes.pop()
+        self.evaluator.pop(board)
+        self.keys.pop()
+
+    def is_repetition(self, board: Position) -> bool:
+        """
+        Whether the current position repeats one on the key stack, scanning back two plies at a time and
+        only as far as the last irreversible move or null move. A repetition inside the search counts as a draw straight
+        away, as the side that repeated could not do better; a position from the game history has to have
+        occurred twice before, so the game could be claimed drawn by threefold repetition.
+        https://www.chessprogramming.org/Repetitions
+
+        Args:
+            board (Position): The searched position, on top of the key stack.
+
+        Returns:
+            bool: Whether the position is a draw by repetition.
+        """
+        keys = self.keys
+        key = keys[-1]
+        last = len(keys) - 1
+        stop = max(last - board.halfmove_clock, self.null_indexes[-1] if self.null_indexes else 0)
+        repeats = 0
+        # a position can repeat 4 plies later at the earliest, with the same side to move
+        for index in range(last - 4, stop - 1, -2):
+            if keys[index] == key:
+                if index >= self.root_index:
+                    return True
+                repeats += 1
+                if repeats == 2:
+                    return True
+        return False
+
+    def stop(self):
+        """Abort the search at its next node, even during the first iteration. Safe to call from another thread."""
+        self.stopped = True
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def complete_iteration(self, depth: int, pv: list[int]):
+        """Record a completed iteration of iterative deepening."""
+        now = time.perf_counter()
+        start, start_nodes = self.iteration_start
+        self.iterations.append({"depth": depth, "time": now - start, "nodes": self.nodes - start_nodes,
+                                "move": move_to_chess(pv[0]) if pv else None})
+        self.iteration_start = (now, self.nodes)
+        self.completed_depth = depth
+        self.pv = pv
+
+
+class SearchStats:
+    """
+    Performance figures of one search, returned with the move by search_move.
+
+    Args:
+        ctx (SearchContext): Context of the finished search.
+    """
+
+    def __init__(self, ctx: SearchContext):
+        self.time = ctx.elapsed()
+        self.nodes = ctx.nodes
+        self.nps = int(ctx.nodes / self.time) if self.time > 0 else 0
+        self.depth = ctx.completed_depth
+        self.seldepth = ctx.seldepth
+        self.score = ctx.score
+        self.book_move = ctx.book_move
+        self.bitbase_hits = ctx.bitbase_hits
+        self.beta_cutoffs = ctx.orderer.cutoffs
+        self.first_move_cutoff_rate = ctx.orderer.first_move_cutoff_rate()
+        self.iterations = list(ctx.iterations)
+        self.pv = [move_to_chess(move).uci() for move in ctx.pv]
+        self.tt = ctx.tt.stats()
+
+    @property
+    def effective_branching_factor(self) -> float:
+        """Nodes of the last iteration divided by nodes of the one before."""
+        if len(self.iterations) < 2 or self.iterations[-2]["nodes"] == 0:
+            return 0.0
+        return self.iterations[-1]["nodes"] / self.iterations[-2]["nodes"]
+
+    def to_dict(self) -> dict:
+        """JSON serialisable form, as sent to Chess.NET."""
+        return {
+            "nodes": self.nodes,
+            "nps": self.nps,
+            "time": round(self.time, 4),
+            "depth": self.depth,
+            "seldepth": self.seldepth,
+            "score": self.score,
+            "bookMove": self.book_move,
+            "bitbaseHits": self.bitbase_hits,
+            "betaCutoffs": self.beta_cutoffs,
+            "firstMoveCutoffRate": round(self.first_move_cutoff_rate, 2),
+            "effectiveBranchingFactor": round(self.effective_branching_factor, 2),
+            "iterations": [{"depth": iteration["depth"], "time": round(iteration["time"], 4),
+                            "nodes": iteration["nodes"]} for iteration in self.iterations],
+            "pv": self.pv,
+            "ttHitRate": round(self.tt["hit_rate"], 4),
+            "hashfull": self.tt["hashfull"],
+        }
+
+    def __str__(self) -> str:
+        if self.book_move:
+            return f"Book move: {self.pv[0]}"
+        return (f"Depth: {self.depth}/{self.seldepth}, Time: {self.time:.2f}, Nodes: {self.nodes}, NPS: {self.nps}, "
+                f"EBF: {self.effective_branching_factor:.2f}, Cutoffs: {self.beta_cutoffs} "
+                f"({self.first_move_cutoff_rate:.1f}% first move), TT hits: {self.tt['hits']}, "
+                f"misses: {self.tt['misses']}, collisions: {self.tt['collisions']}, hashfull: {self.tt['hashfull']}, "
+                f"bitbase hits: {self.bitbase_hits}, "
+                f"PV: {' '.join(self.pv)}")
+
+
+def next_move(depth: int | None, board: chess.Board, movetime: float | None = None,
+              nodes: int | None = None, workers: int = 1) -> chess.Move:
+    """
+    Determine the next best move, from the opening book if one is set, see set_book.
+
+    Args:
+        depth (int | None): The maximum depth to which the minimax algorithm should run.
         board (chess.Board): The current state of the chess board.
-        debug (bool, optional): Whether to print debug information. Defaults to True.
+        movetime (float, optional): Time budget in seconds. Defaults to no limit.
+        nodes (int, optional): Node budget. Defaults to no limit.
+        workers (int, optional): Number of processes to search with. Defaults to 1, a single process search.
 
     Returns:
         chess.Move: The best move determined by the algorithm.
     """
-    t0 = time.time()
-    move = find_best_move_minimax(depth, board)  # minimax call
-    elapsed_time = time.time() - t0
-
-    print(f"Depth: {depth}, Time: {elapsed_time:.2f}")
+    move, stats = search_move(depth, board, movetime, nodes, workers)
+    print(stats)
     return move
 
 
+def search_move(depth: int | None, board: chess.Board, movetime: float | None = None, nodes: int | None = None,
+                workers: int = 1, ctx: SearchContext | None = None) -> tuple[chess.Move, SearchStats]:
+    """
+    Same as next_move, but also returns the statistics of the search.
+    While the position is in the opening book, a book move is returned without searching.
+
+    Args:
+        ctx (SearchContext, optional): Search state to use instead of a new one with movetime and nodes,
+            for a search that is stopped or given its deadline from another thread, see ponder.py.
+
+    Returns:
+        tuple[chess.Move, SearchStats]: The best move and how the search went.
+    """
+    ctx = ctx if ctx is not None else SearchContext(movetime=movetime, node_limit=nodes)
+    book_move = opening_book.probe(board) if opening_book is not None else None
+    if book_move is not None:
+        ctx.book_move = True
+        ctx.pv = [move_from_chess(book_move)]
+        return book_move, SearchStats(ctx)
+    if workers > 1:
+        from parallel import parallel_iterative_deepening  # parallel imports this module
+        move = parallel_iterative_deepening(board, depth, ctx, workers)
+    else:
+        move = iterative_deepening(board, depth, ctx)
+    return move, SearchStats(ctx)
+
+
+def iterative_deepening(board: chess.Board, max_depth: int | None, ctx: SearchContext) -> chess.Move | None:
+    """
+    Search depth 1, 2, ... until max_depth or a budget in ctx runs out.
+    Each iteration searches the previous principal variation first, which makes alpha-beta cutoffs come earlier.
+
+    Args:
+        board (chess.Board): The current state of the chess board.
+        max_depth (int | None): Deepest iteration to run. Defaults to MAX_DEPTH when None.
+        ctx (SearchContext): Budgets and shared search state.
+
+    Returns:
+        chess.Move | None: Best move of the last completed iteration, None if there are no legal moves.
+    """
+    max_depth = MAX_DEPTH if max_depth is None else max(1, max_depth)
+    ctx.tt.new_search()
+    ctx.orderer.new_search()
+    best_move = None
+
+    for depth in range(1, max_depth + 1):
+        ctx.follow_pv = bool(ctx.pv)
+        try:
+            move = find_best_move_minimax(depth, board, ctx)
+        except SearchAborted:  # board is untouched, the interrupted iteration made its moves on ctx.position
+            break
+
+        if move is None:
+            break
+        best_move = move
+        ctx.complete_iteration(depth, principal_variation(ctx.position, ctx.tt, depth))
+
+        # an iteration takes longer than all previous ones together, so stop if it would not finish in time
+        if ctx.deadline is not None and time.perf_counter() + ctx.elapsed() >= ctx.deadline:
+            break
+
+    return best_move
+
+
+def principal_variation(board: Position, tt: TranspositionTable, depth: int) -> list[int]:
+    """
+    Read the principal variation out of the transposition table by following the stored best moves.
+
+    Args:
+        board (Position): Root position.
+        tt (TranspositionTable): Table the search has filled.
+        depth (int): Maximum length of the line.
+
+    Returns:
+        list[int]: The expected line of play from the root.
+    """
+    pv = []
+    for _ in range(depth):
+        entry = tt.probe(board.key)
+        if entry is None or entry[3] is None or not board.is_legal(entry[3]):
+            break
+        pv.append(entry[3])
+        board.push(entry[3])
+    for _ in pv:
+        board.pop()
+    return pv
+
+
 def get_move_quality(move, board, end_game):
     """
     Calculate the quality of a move based on the board and end game status.
@@ -41,57 +458,251 @@ def get_move_quality(move, board, end_game):
     return move_value(board, move, end_game)
 
 
-def get_ordered_moves(board: chess.Board) -> list[chess.Move]:
+def get_ordered_moves(board: chess.Board, hash_move: chess.Move | None = None,
+                      end_game: bool | None = None) -> list[chess.Move]:
     """
     Get legal moves sorted by estimated quality.
 
     Args:
         board (chess.Board): The current state of the chess board.
+        hash_move (chess.Move, optional): Best move from the transposition table, searched first if legal.
+        end_game (bool, optional): Whether the game is in an end game state. Computed from the board if None.
 
     Returns:
         list[chess.Move]: A list of legal moves sorted by their estimated quality.
     """
-    end_game = check_end_game(board)
+    if end_game is None:
+        end_game = check_end_game(board)
     sorted_moves = sorted(board.legal_moves, key=lambda move: get_move_quality(move, board, end_game),
                           reverse=board.turn == chess.WHITE)
+    if hash_move is not None and hash_move in sorted_moves:
+        sorted_moves.remove(hash_move)
+        sorted_moves.insert(0, hash_move)
     return sorted_moves
 
 
-def find_best_move_minimax(depth: int, board: chess.Board) -> chess.Move:
+def find_best_move_minimax(depth: int, board: chess.Board, ctx: SearchContext | None = None) -> chess.Move:
     """
     Determine the highest value move using the evaluation function.
+    After the first iterations of iterative deepening, the root is searched with an aspiration window around the
+    previous iteration's score, which is widened and searched again whenever the score falls outside of it.
+    https://www.chessprogramming.org/Aspiration_Windows
 
     Args:
         depth (int): The depth to which the minimax algorithm should run.
         board (chess.Board): The current state of the chess board.
+        ctx (SearchContext, optional): Shared search state. Defaults to a new context using the shared table.
 
     Returns:
         chess.Move: The best move determined by the algorithm.
     """
-    maximize = board.turn == chess.WHITE
-    best_move = float("-inf") if maximize else float("inf")
-    best_move_found = None
+    ctx = ctx if ctx is not None else SearchContext()
+    follow_pv = ctx.follow_pv
+    moves = root_moves(board, ctx)
+    if not moves:
+        return None
+    position = ctx.position
+    color = 1 if board.turn == chess.WHITE else -1
+
+    delta = ASPIRATION_WINDOW
+    if ctx.completed_depth and depth >= ASPIRATION_MIN_DEPTH and abs(ctx.score) < MATE_THRESHOLD:
+        alpha, beta = color * ctx.score - delta, color * ctx.score + delta
+    else:
+        alpha, beta = -float("inf"), float("inf")
+
+    while True:
+        ctx.follow_pv = follow_pv
+        best_move_found, best_move = search_root(depth, position, moves, alpha, beta, ctx)
+        if best_move <= alpha:
+            alpha = alpha - delta if delta < ASPIRATION_MAX_WINDOW else -float("inf")
+        elif best_move >= beta:
+            beta = beta + delta if delta < ASPIRATION_MAX_WINDOW else float("inf")
+        else:
+            break
+        delta *= 2
+
+    ctx.score = color * best_move
+    ctx.tt.store(ctx.keys[ctx.root_index], depth, best_move, EXACT, best_move_found)
+    return move_to_chess(best_move_found)
 
-    moves = get_ordered_moves(board)
+
+def search_root(depth: int, board: Position, moves: list[int], alpha: float, beta: float,
+                ctx: SearchContext) -> tuple[int, float]:
+    """
+    Principal variation search of the root moves: the first move is searched with the full window, the others
+    with a null window that only shows whether they beat the best move, and are searched again if they do.
+
+    Args:
+        depth (int): Depth of the root search.
+        board (Position): Root position. ctx must follow it, see root_moves.
+        moves (list[int]): Root moves in search order.
+        alpha (float): Lower bound of the search window.
+        beta (float): Upper bound of the search window.
+        ctx (SearchContext): Shared search state.
+
+    Returns:
+        tuple[int, float]: The best move and its score, from the side to move's point of view.
+            A score at or outside the window is only a bound.
+    """
+    best_move_found, best_move = None, -float("inf")
+    for move_index, move in enumerate(moves):
+        if move_index == 0:
+            value = search_root_move(depth, board, move, alpha, beta, ctx)
+        else:
+            value = search_root_move(depth, board, move, alpha, alpha + 1, ctx)
+            if alpha < value < beta:
+                value = search_root_move(depth, board, move, alpha, beta, ctx)
+        if value > best_move:
+            best_move_found, best_move = move, value
+            if value > alpha:
+                alpha = value
+                if alpha >= beta:
+                    break
+    return best_move_found, best_move
+
+
+def root_moves(board: chess.Board, ctx: SearchContext) -> list[int]:
+    """
+    Set up ctx for a search from board and get its legal moves in search order.
+
+    Args:
+        board (chess.Board): Root position, searched as ctx.position.
+        ctx (SearchContext): Shared search state.
+
+    Returns:
+        list[int]: Legal moves of ctx.position, previous best move first.
+    """
+    position = ctx.set_root(board)
+    entry = ctx.tt.probe(ctx.keys[-1])
+    hash_move = entry[3] if entry else None
+    if ctx.follow_pv:
+        hash_move = ctx.pv[0]
+    moves = ctx.orderer.order(position, hash_move, 0, ctx.evaluator.is_end_game())
+    # from a root in the bitbase, cutting off every node would leave nothing to search but the next move,
+    # so only the moves that keep the root's result are searched, and the bitbase is probed at the leaves only
+    ctx.bitbase_cutoffs = chess.popcount(position.occupied) > 3
+    if endgame_bitbase is not None and not ctx.bitbase_cutoffs:
+        moves = bitbase_root_moves(position, moves, ctx)
+    return moves
+
+
+def bitbase_root_moves(board: Position, moves: list[int], ctx: SearchContext) -> list[int]:
+    """
+    The moves that keep the bitbase result of the root: winning moves in a won position, drawing moves in a drawn one.
+    A winning promotion is always played straight away.
+
+    Args:
+        board (Position): Root position.
+        moves (list[int]): Its legal moves, in search order.
+        ctx (SearchContext): Shared search state.
+
+    Returns:
+        list[int]: The moves to search, in the same order. All moves if the root is not in the bitbase.
+    """
+    result = endgame_bitbase.probe(board)
+    if result is None:
+        return moves
+    ctx.bitbase_hits += 1
+    kept = []
     for move in moves:
         board.push(move)
-        if board.can_claim_draw():
-            value = 0.0
-        else:
-            value = minimax(depth - 1, board, -float("inf"), float("inf"), not maximize)
+        child = endgame_bitbase.probe(board)  # None once the piece is captured or underpromoted, all draws
         board.pop()
-        if (maximize and value > best_move) or (not maximize and value < best_move):
-            best_move = value
-            best_move_found = move
+        if (-child if child is not None else 0) == result:
+            kept.append(move)
+    # promoting now or later reaches the same won leaves, so the search would keep putting it off
+    promotions = [move for move in kept if move >> 12]
+    if result == 1 and promotions:
+        return promotions
+    return kept or moves
+
+
+def search_root_move(depth: int, board: Position, move: int, alpha: float, beta: float,
+                     ctx: SearchContext) -> float:
+    """
+    Score one root move. A move that lets either side claim a draw scores 0, see negamax.
+
+    Args:
+        depth (int): Depth of the root search.
+        board (Position): Root position. ctx.evaluator must follow it, see root_moves.
+        move (int): Root move to search.
+        alpha (float): Lower bound of the search window, for the side to move at the root.
+        beta (float): Upper bound of the search window, for the side to move at the root.
+        ctx (SearchContext): Shared search state.
+
+    Returns:
+        float: Score of the move, from the point of view of the side to move at the root.
+    """
+    ctx.push(board, move)
+    value = -negamax(depth - 1, board, -beta, -alpha, ctx)
+    ctx.pop(board)
+    ctx.follow_pv = False
+    return value
+
+
+def is_draw_by_rule(board: chess.Board | Position) -> bool:
+    """
+    Cheap draw checks for a position that has legal moves: insufficient material and the fifty-move rule.
+    Material is read from the piece bitboards, without generating any moves.
+    Repetitions are detected by the search from its key stack, see SearchContext.is_repetition.
 
-    return best_move_found
+    Args:
+        board (chess.Board | Position): The current state of the chess board.
+
+    Returns:
+        bool: Whether the position is a draw.
+    """
+    if board.halfmove_clock >= 100:
+        return True
+    if not (board.pawns | board.rooks | board.queens):
+        minor_pieces = board.knights | board.bishops
+        # a lone minor piece, or bishops that all stand on squares of one color, cannot mate
+        if chess.popcount(minor_pieces) <= 1 or (not board.knights and (
+                not board.bishops & chess.BB_LIGHT_SQUARES or not board.bishops & chess.BB_DARK_SQUARES)):
+            return True
+    return False
+
+
+def probe_bitbase(board: Position, ctx: SearchContext, leaf: bool) -> float | None:
+    """
+    Exact score of a king and piece against king position from the endgame bitbase, if one is set.
+    Interior nodes are only probed below a root with more pieces, see root_moves.
+    A win scores KNOWN_WIN plus the evaluation and a mop-up bonus for cornering the lone king, bringing the
+    kings together and advancing the pawn, so that the search makes progress towards mate inside the won positions.
+    https://www.chessprogramming.org/Mop-up_Evaluation
+
+    Args:
+        board (Position): Position with legal moves, not drawn by rule.
+        ctx (SearchContext): Shared search state.
+        leaf (bool): Whether the node is at the nominal depth of the search.
+
+    Returns:
+        float | None: Score for the side to move, None if the position is not probed.
+    """
+    if endgame_bitbase is None or not (leaf or ctx.bitbase_cutoffs) or chess.popcount(board.occupied) != 3:
+        return None
+    result = endgame_bitbase.probe(board)
+    if result is None:
+        return None
+    ctx.bitbase_hits += 1
+    if result == 0:
+        return 0
+    strong = board.turn if result == 1 else not board.turn
+    strong_king, weak_king = board.king(strong), board.king(not strong)
+    score = ctx.evaluator.evaluate(board)
+    value = (KNOWN_WIN + (score if strong == chess.WHITE else -score) + EDGE_BONUS * CENTER_DISTANCE[weak_king]
+             + PROXIMITY_BONUS * (14 - chess.square_manhattan_distance(strong_king, weak_king)))
+    if board.pawns:  # a won pawn ending is won by promoting
+        pawn = chess.lsb(board.pawns)
+        value += PAWN_PROGRESS * chess.square_rank(pawn if strong == chess.WHITE else chess.square_mirror(pawn))
+    return value if result == 1 else -value
 
 
-def minimax(depth: int, board: chess.Board, alpha: float, beta: float, is_maximising_player: bool) -> float:
+def minimax(depth: int, board: chess.Board, alpha: float, beta: float, is_maximising_player: bool,
+            ctx: SearchContext | None = None) -> float:
     """
-    Minimax algorithm with alpha-beta pruning.
-    Minimax pseudocode from https://en.wikipedia.org/wiki/Minimax 
-    AB pruning pseudocode from https://en.wikipedia.org/wiki/Alpha%E2%80%93beta_pruning
+    Minimax score of the position from White's point of view, computed with negamax on a Position of board.
+    Minimax pseudocode from https://en.wikipedia.org/wiki/Minimax
 
     Args:
         depth (int): The maximum depth of the game tree that the algorithm should explore.
@@ -99,38 +710,270 @@ def minimax(depth: int, board: chess.Board, alpha: float, beta: float, is_maximi
         alpha (float): The best (highest) score that the maximizing player has found so far.
         beta (float): The best (lowest) score that the minimizing player has found so far.
         is_maximising_player (bool): True if the current player is the maximizing player, False if they are the minimizing player.
+        ctx (SearchContext, optional): Shared search state. Defaults to a new context using the shared table.
 
     Returns:
         float: The score of the best move that the current player can make. A high score is good for the maximizing player and bad for the minimizing player.
     """
+    ctx = ctx if ctx is not None else SearchContext()
+    position = ctx.set_root(board)
+    if is_maximising_player:
+        return negamax(depth, position, alpha, beta, ctx)
+    return -negamax(depth, position, -beta, -alpha, ctx)
 
-    if board.is_checkmate():
-        return -MATE_SCORE if is_maximising_player else MATE_SCORE
-    elif board.is_game_over():
+
+def negamax(depth: int, board: Position, alpha: float, beta: float, ctx: SearchContext) -> float:
+    """
+    Negamax with alpha-beta pruning, principal variation search, a transposition table and the selective
+    pruning enabled in ctx. Every score is from the point of view of the side to move.
+    Negamax with a transposition table from https://en.wikipedia.org/wiki/Negamax#Negamax_with_alpha_beta_pruning_and_transposition_tables
+    PVS from https://www.chessprogramming.org/Principal_Variation_Search
+
+    Args:
+        depth (int): The maximum depth of the game tree that the algorithm should explore.
+        board (Position): The current state of the chess board, ctx.position.
+        alpha (float): Score the side to move is already sure of.
+        beta (float): Score the opponent is already sure of, negated.
+        ctx (SearchContext): Shared search state, following board since SearchContext.set_root.
+
+    Returns:
+        float: The score of the best move for the side to move. A score at or outside the window is only a bound.
+    """
+    evaluator = ctx.evaluator
+    ctx.count_node()
+    ply = len(board.stack)
+    if ply > ctx.seldepth:
+        ctx.seldepth = ply
+    if ctx.is_repetition(board):
         return 0
 
-    if depth == 0:
-        return evaluate_board(board)
+    # the legal moves are generated once per node, and only up to the first one at a leaf
+    if depth <= 0:
+        if not board.has_legal_moves():
+            return -(MATE_SCORE - ply) if board.is_check() else 0
+        if is_draw_by_rule(board):
+            return 0
+        bitbase_score = probe_bitbase(board, ctx, True)
+        if bitbase_score is not None:
+            return bitbase_score
+        if ctx.quiescence:
+            return quiescence(board, alpha, beta, ctx, ply)
+        score = evaluator.evaluate(board)
+        return score if board.turn == chess.WHITE else -score
 
-    if is_maximising_player:
-        best_move = float("-inf")
-        for move in get_ordered_moves(board):
-            board.push(move)
-            curr_move = minimax(depth - 1, board, alpha, beta, False)
-            board.pop()
-            best_move = max(best_move, curr_move)
-            alpha = max(alpha, best_move)
+    moves = board.generate_legal_moves()
+    in_check = board.is_check()
+    if not moves:  # checkmate or stalemate
+        return -(MATE_SCORE - ply) if in_check else 0
+    if is_draw_by_rule(board):
+        return 0
+    bitbase_score = probe_bitbase(board, ctx, False)
+    if bitbase_score is not None:
+        return bitbase_score
+
+    pruning = ctx.pruning
+    if pruning["mate_distance"] and ply:
+        # no line from here can be better than mating next move, or worse than being mated now
+        alpha = max(alpha, -(MATE_SCORE - ply))
+        beta = min(beta, MATE_SCORE - ply - 1)
+        if alpha >= beta:
+            return alpha
+
+    tt = ctx.tt
+    key = ctx.keys[-1]
+    entry = tt.probe(key)
+    hash_move = None
+    if entry:
+        entry_depth, entry_score, entry_bound, hash_move = entry
+        entry_score = score_from_tt(entry_score, ply)
+        if entry_depth >= depth:
+            if entry_bound == EXACT:
+                return entry_score
+            elif entry_bound == LOWER:
+                alpha = max(alpha, entry_score)
+            else:
+                beta = min(beta, entry_score)
             if beta <= alpha:
-                break
-        return best_move
+                return entry_score
+    alpha_orig = alpha
+
+    # on the previous principal variation, its move is searched first
+    if ctx.follow_pv:
+        if ply < len(ctx.pv):
+            hash_move = ctx.pv[ply]
+        else:
+            ctx.follow_pv = False
+
+    # neither null move nor futility pruning is tried against a mate score bound
+    static_eval = None
+    if (pruning["null_move"] and depth >= NULL_MOVE_MIN_DEPTH and not in_check and not ctx.follow_pv
+            and not ctx.null_move_disabled and board.stack and board.stack[-1][0] != NULL_MOVE
+            and board.occupied_co[board.turn] & ~(board.pawns | board.kings) and abs(beta) < MATE_THRESHOLD):
+        static_eval = evaluator.evaluate(board) if board.turn == chess.WHITE else -evaluator.evaluate(board)
+        if null_move_cutoff(depth, board, beta, static_eval, ctx):
+            return beta
+
+    # futility pruning: at a frontier node whose static score is too far below alpha for a quiet move to
+    # reach it, only captures, promotions and checks are searched
+    # https://www.chessprogramming.org/Futility_Pruning
+    futility_value = None
+    if pruning["futility"] and depth == 1 and not in_check and abs(alpha) < MATE_THRESHOLD:
+        if static_eval is None:
+            static_eval = evaluator.evaluate(board) if board.turn == chess.WHITE else -evaluator.evaluate(board)
+        if static_eval + FUTILITY_MARGIN <= alpha:
+            futility_value = static_eval + FUTILITY_MARGIN
+    reduce_late_moves = pruning["lmr"] and depth >= LMR_MIN_DEPTH and not in_check
+
+    best_move_found = None
+    best_move = -float("inf")
+    searched = 0
+    for move_index, move in enumerate(ctx.orderer.pick_moves(board, hash_move, ply, evaluator.is_end_game(), moves)):
+        quiet = not move >> 12 and not board.is_capture(move)
+        if futility_value is not None and quiet and not board.gives_check(move):
+            best_move = max(best_move, futility_value)
+            continue
+
+        ctx.push(board, move)
+        if searched == 0:
+            value = -negamax(depth - 1, board, -beta, -alpha, ctx)
+        else:
+            # a null window search only shows whether the move beats alpha, and is followed by a full search if so
+            # late quiet moves rarely turn out best, so they are first searched one ply shallower
+            reduced = reduce_late_moves and quiet and move_index >= LMR_MIN_MOVE_INDEX and not board.is_check()
+            if reduced:
+                value = -negamax(depth - 2, board, -alpha - 1, -alpha, ctx)
+            if not reduced or value > alpha:
+                value = -negamax(depth - 1, board, -alpha - 1, -alpha, ctx)
+            if alpha < value < beta:
+                value = -negamax(depth - 1, board, -beta, -alpha, ctx)
+        ctx.pop(board)
+        ctx.follow_pv = False
+        searched += 1
+
+        if value > best_move:
+            best_move = value
+            best_move_found = move
+            if value > alpha:
+                alpha = value
+                if alpha >= beta:
+                    ctx.orderer.record_cutoff(board, move, depth, ply, move_index)
+                    break
+
+    if best_move >= beta:
+        bound = LOWER
+    elif best_move <= alpha_orig:
+        bound = UPPER
     else:
-        best_move = float("inf")
-        for move in get_ordered_moves(board):
-            board.push(move)
-            curr_move = minimax(depth - 1, board, alpha, beta, True)
-            board.pop()
-            best_move = min(best_move, curr_move)
-            beta = min(beta, best_move)
-            if beta <= alpha:
-                break
-        return best_move
+        bound = EXACT
+    tt.store(key, depth, score_to_tt(best_move, ply), bound, best_move_found)
+    return best_move
+
+
+def null_move_cutoff(depth: int, board: Position, beta: float, static_eval: int, ctx: SearchContext) -> bool:
+    """
+    Null move pruning: if the side to move is still at or above beta after passing, a real move would be too.
+    In the end game, where passing can be the better move (zugzwang), a cutoff is only taken after a
+    verification search of the node without null moves.
+    https://www.chessprogramming.org/Null_Move_Pruning
+    https://www.chessprogramming.org/Verified_Null-Move_Pruning
+
+    Args:
+        depth (int): Remaining depth of the node.
+        board (Position): Position of the node, not in check.
+        beta (float): Upper bound of the node's window.
+        static_eval (int): evaluate_board score of the position, for the side to move.
+        ctx (SearchContext): Shared search state.
+
+    Returns:
+        bool: Whether the node fails high without being searched.
+    """
+    if static_eval < beta:
+        return False
+    ctx.push(board, NULL_MOVE)
+    value = -negamax(depth - 1 - NULL_MOVE_REDUCTION, board, -beta, -beta + 1, ctx)
+    ctx.pop(board)
+    if value < beta:
+        return False
+
+    if not ctx.evaluator.is_end_game():
+        return True
+    ctx.null_move_disabled += 1
+    value = negamax(depth - NULL_MOVE_REDUCTION, board, beta - 1, beta, ctx)
+    ctx.null_move_disabled -= 1
+    return value >= beta
+
+
+def quiescence(board: Position, alpha: float, beta: float, ctx: SearchContext, ply: int) -> float:
+    """
+    Search only captures and queen promotions until the position is quiet, so the evaluation is never taken in the
+    middle of an exchange. The side to move may stand pat on the static score instead of capturing; in check,
+    every evasion is searched. Captures that lose material by static exchange evaluation, and captures that
+    cannot bring the score up to alpha (delta pruning), are not searched.
+    The caller has counted the node and checked it for checkmate, stalemate and draws.
+    https://www.chessprogramming.org/Quiescence_Search
+    https://www.chessprogramming.org/Delta_Pruning
+
+    Args:
+        board (Position): The current state of the chess board.
+        alpha (float): Score the side to move is already sure of.
+        beta (float): Score the opponent is already sure of, negated.
+        ctx (SearchContext): Shared search state.
+        ply (int): Distance from the root.
+
+    Returns:
+        float: Score for the side to move. A score at or outside the window is only a bound.
+    """
+    evaluator = ctx.evaluator
+    if board.is_check():
+        # a capture can give check, and the checked side may not stand pat
+        best_score = -(MATE_SCORE - ply)
+        moves = board.generate_legal_moves()
+        stand_pat = None
+    else:
+        score = evaluator.evaluate(board)
+        stand_pat = best_score = score if board.turn == chess.WHITE else -score
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        moves = board.generate_legal_captures()
+        if board.pawns & board.occupied_co[board.turn] & (
+                chess.BB_RANK_7 if board.turn == chess.WHITE else chess.BB_RANK_2):
+            mailbox = board.mailbox
+            moves += [move for move in board.generate_legal_moves()
+                      if move >> 12 == chess.QUEEN and not mailbox[(move >> 6) & 63]]
+        moves.sort(key=lambda move: mvv_lva(board, move), reverse=True)
+
+    pruning = ctx.pruning
+    delta_pruning = pruning["delta"] and stand_pat is not None and not evaluator.is_end_game()
+    see_pruning = pruning["see"] and stand_pat is not None
+    for move in moves:
+        if delta_pruning and not move >> 12:
+            captured = chess.PAWN if board.is_en_passant(move) else board.mailbox[(move >> 6) & 63] & 7
+            if stand_pat + piece_value[captured] + DELTA_MARGIN <= alpha:
+                continue
+        if see_pruning and exchange_value(board, move & 63, (move >> 6) & 63, move >> 12,
+                                          board.is_en_passant(move)) < 0:
+            continue
+
+        ctx.push(board, move)
+        ctx.count_node()
+        child_ply = ply + 1
+        if child_ply > ctx.seldepth:
+            ctx.seldepth = child_ply
+        if not board.has_legal_moves():
+            score = MATE_SCORE - child_ply if board.is_check() else 0
+        elif is_draw_by_rule(board):
+            score = 0
+        elif (bitbase_score := probe_bitbase(board, ctx, True)) is not None:
+            score = -bitbase_score
+        else:
+            score = -quiescence(board, -beta, -alpha, ctx, child_ply)
+        ctx.pop(board)
+
+        if score > best_score:
+            best_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return best_score
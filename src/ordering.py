@@ -0,0 +1,217 @@
+from typing import Iterator
+import chess
+from eval import move_value, middle_game_tables
+from position import Position, move_to_chess
+
+# Move ordering for the alpha-beta search. The earlier the best move is searched, the earlier the cutoff.
+# Moves are position.py int moves on the searched Position.
+# https://www.chessprogramming.org/Move_Ordering
+
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28  # captures and queen promotions
+KILLER_SCORES = (1 << 27, (1 << 27) - 1)  # first and second killer slot
+HISTORY_MAX = 1 << 16  # keeps quiet moves below the killers
+
+MAX_PLY = 128
+
+# Most Valuable Victim - Least Valuable Attacker, indexed [victim piece type][attacker piece type]
+# https://www.chessprogramming.org/MVV-LVA
+MVV_LVA = [[0] * 7 for _ in range(7)]
+for _victim in chess.PIECE_TYPES:
+    for _attacker in chess.PIECE_TYPES:
+        MVV_LVA[_victim][_attacker] = 10 * _victim + (7 - _attacker)
+
+
+def mvv_lva(board: Position, move: int) -> int:
+    """MVV-LVA score of a capture or queen promotion."""
+    mailbox = board.mailbox
+    attacker = mailbox[move & 63] & 7
+    victim = chess.PAWN if board.is_en_passant(move) else mailbox[(move >> 6) & 63] & 7
+    score = MVV_LVA[victim][attacker]
+    if move >> 12 == chess.QUEEN:
+        score += MVV_LVA[chess.QUEEN][chess.PAWN]
+    return score
+
+
+class MoveOrderer:
+    """
+    Orders moves by eval.move_value, the same ordering as movegen.get_ordered_moves.
+    Also counts beta cutoffs, so different orderers can be compared at a fixed depth.
+    """
+
+    def __init__(self):
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """Called once before every search."""
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def order(self, board: Position, hash_move: int | None, ply: int, end_game: bool,
+              moves: list[int] | None = None) -> list[int]:
+        """
+        Get the legal moves of board, best first.
+
+        Args:
+            board (Position): The current state of the chess board.
+            hash_move (int | None): Move searched first if legal, from the transposition table or PV.
+            ply (int): Distance from the root of the search.
+            end_game (bool): Whether the game is in an end game state.
+            moves (list[int], optional): Legal moves of board, if already generated.
+
+        Returns:
+            list[int]: Legal moves, in the order they should be searched.
+        """
+        chess_board = board.to_board()  # move_value reads a chess.Board and chess.Move
+        moves = sorted(board.generate_legal_moves() if moves is None else moves,
+                       key=lambda move: move_value(chess_board, move_to_chess(move), end_game),
+                       reverse=board.turn == chess.WHITE)
+        if hash_move is not None and hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
+        return moves
+
+    def pick_moves(self, board: Position, hash_move: int | None, ply: int, end_game: bool,
+                   moves: list[int] | None = None) -> Iterator[int]:
+        """
+        Yield the legal moves of board, best first. The search stops iterating once a move causes a cutoff,
+        so orderers can score moves lazily.
+
+        Args:
+            board (Position): The current state of the chess board. Must be unchanged whenever a move is taken.
+            hash_move (int | None): Move searched first if legal, from the transposition table or PV.
+            ply (int): Distance from the root of the search.
+            end_game (bool): Whether the game is in an end game state.
+            moves (list[int], optional): Legal moves of board, if already generated.
+
+        Returns:
+            Iterator[int]: Legal moves, in the order they should be searched.
+        """
+        return iter(self.order(board, hash_move, ply, end_game, moves))
+
+    def record_cutoff(self, board: Position, move: int, depth: int, ply: int, move_index: int):
+        """
+        Called when move caused a beta cutoff.
+
+        Args:
+            board (Position): Position the move was made from.
+            move (int): The move that refuted the position.
+            depth (int): Remaining depth of the node.
+            ply (int): Distance from the root of the search.
+            move_index (int): Position of the move in the searched order, 0 for the first move.
+        """
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+
+    def first_move_cutoff_rate(self) -> float:
+        """Percentage of beta cutoffs caused by the first move searched."""
+        return 100.0 * self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+
+class HeuristicOrderer(MoveOrderer):
+    """
+    Orders moves with the hash move first, then captures by MVV-LVA, then the two killer moves of the ply,
+    then quiet moves by their history score.
+    Killer heuristic: https://www.chessprogramming.org/Killer_Heuristic
+    History heuristic: https://www.chessprogramming.org/History_Heuristic
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # butterfly board, indexed [color][from square + to square * 64], the int move without its promotion
+        self.history = [[0] * 4096 for _ in chess.COLORS]
+
+    def new_search(self):
+        super().new_search()
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        for table in self.history:  # keep what was learnt, but let the new search outweigh it
+            for index, value in enumerate(table):
+                if value:
+                    table[index] = value >> 1
+
+    def capture_score(self, board: Position, move: int) -> int:
+        """MVV-LVA score of a capture or queen promotion."""
+        return mvv_lva(board, move)
+
+    def quiet_score(self, board: Position, move: int) -> int:
+        """History score, with the piece-square gain breaking ties between moves without history."""
+        color = board.turn
+        from_square = move & 63
+        table = middle_game_tables[color][board.mailbox[from_square] & 7]
+        gain = table[(move >> 6) & 63] - table[from_square]
+        return self.history[color][move & 4095] * 64 + (gain if color else -gain)
+
+    def score(self, board: Position, move: int, killers: list, hash_move: int | None) -> int:
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+        if board.is_capture(move) or move >> 12 == chess.QUEEN:
+            return CAPTURE_SCORE + self.capture_score(board, move)
+        if move == killers[0]:
+            return KILLER_SCORES[0]
+        if move == killers[1]:
+            return KILLER_SCORES[1]
+        return self.quiet_score(board, move)
+
+    def order(self, board: Position, hash_move: int | None, ply: int, end_game: bool,
+              moves: list[int] | None = None) -> list[int]:
+        killers = self.killers[min(ply, MAX_PLY - 1)]
+        return sorted(board.generate_legal_moves() if moves is None else moves,
+                      key=lambda move: self.score(board, move, killers, hash_move), reverse=True)
+
+    def pick_moves(self, board: Position, hash_move: int | None, ply: int, end_game: bool,
+                   moves: list[int] | None = None) -> Iterator[int]:
+        """
+        Staged move picker: the hash move, then captures, then killers, then quiet moves.
+        Each stage is only split off and scored once the previous one is exhausted, so a cutoff on the hash move
+        or a capture never scores the quiet moves. Quiet moves are selection sorted one at a time.
+        https://www.chessprogramming.org/Move_Generation#Staged_Move_Generation
+        """
+        if moves is None:
+            moves = board.generate_legal_moves()
+        if hash_move is not None and hash_move in moves:
+            yield hash_move
+        else:
+            hash_move = None
+
+        # captures and queen promotions, best MVV-LVA first
+        captures = []
+        quiets = []
+        for move in moves:
+            if move == hash_move:
+                continue
+            if board.is_capture(move) or move >> 12 == chess.QUEEN:
+                captures.append((self.capture_score(board, move), move))
+            else:
+                quiets.append(move)
+        captures.sort(key=lambda scored: scored[0], reverse=True)
+        for _, move in captures:
+            yield move
+
+        killers = [killer for killer in self.killers[min(ply, MAX_PLY - 1)] if killer in quiets]
+        for killer in killers:
+            yield killer
+
+        quiets = [(self.quiet_score(board, move), move) for move in quiets if move not in killers]
+        while quiets:
+            best = 0
+            for index in range(1, len(quiets)):
+                if quiets[index][0] > quiets[best][0]:
+                    best = index
+            quiets[best], quiets[-1] = quiets[-1], quiets[best]
+            yield quiets.pop()[1]
+
+    def record_cutoff(self, board: Position, move: int, depth: int, ply: int, move_index: int):
+        super().record_cutoff(board, move, depth, ply, move_index)
+        if board.is_capture(move):
+            return  # captures are already ordered by MVV-LVA
+
+        killers = self.killers[min(ply, MAX_PLY - 1)]
+        if move != killers[0]:
+            killers[1] = killers[0]
+            killers[0] = move
+        table = self.history[board.turn]
+        index = move & 4095
+        table[index] = min(table[index] + depth * depth, HISTORY_MAX)
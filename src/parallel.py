@@ -0,0 +1,209 @@
+import concurrent.futures
+import multiprocessing
+import time
+import chess
+import movegen
+from movegen import SearchContext, SearchAborted, MAX_DEPTH, find_best_move_minimax, root_moves, search_root_move, \
+    principal_variation
+from tt import EXACT
+from position import move_to_chess
+
+# Parallel root splitting: the first root move is searched in this process to establish a bound, then the
+# remaining root moves are searched by a pool of worker processes, which share the best score found so far.
+# https://www.chessprogramming.org/Parallel_Search#Root_Splitting
+
+_pool = None
+_pool_key = None  # worker count and search settings the pool was started with
+_pool_context = None
+_shared_bound = None  # best root score found so far, from the root player's point of view
+
+
+def search_settings() -> tuple[float, str | None, str | None]:
+    """Transposition table size, transposition table file and bitbase file of this process, for its workers."""
+    return movegen.transposition_table.size_mb, getattr(movegen.transposition_table, "path", None), \
+        movegen.bitbase_path
+
+
+def _init_worker(shared_bound, hash_size: float, hash_file: str | None, bitbase: str | None):
+    """
+    Apply the search settings of the main process, which a spawned worker does not inherit.
+    A worker gets its own table, started from the entries of the main process's table file if it has one:
+    several processes writing to one mapped file would break its checksum.
+    """
+    global _shared_bound
+    _shared_bound = shared_bound
+    movegen.set_hash_size(hash_size)
+    if hash_file is not None:
+        movegen.transposition_table.load_file(hash_file)
+    if bitbase != movegen.bitbase_path:
+        movegen.set_bitbase(bitbase)
+
+
+def get_pool(workers: int, context=None) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Get the worker pool, starting it on first use, or again when the number of workers or the search settings
+    changed. Workers keep their transposition table between moves.
+
+    Args:
+        workers (int): Number of worker processes.
+        context (optional): multiprocessing context to start the workers with. Defaults to the platform's.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: The pool.
+    """
+    global _pool, _pool_key, _pool_context, _shared_bound
+    key = (workers, search_settings())
+    if _pool is not None and (_pool_key != key or context is not None and context is not _pool_context):
+        shutdown()
+    if _pool is None:
+        _shared_bound = (context or multiprocessing).Value("d", -float("inf"))
+        _pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                       initializer=_init_worker, initargs=(_shared_bound, *key[1]))
+        _pool_key, _pool_context = key, context
+    return _pool
+
+
+def shutdown():
+    """Stop the worker processes."""
+    global _pool, _pool_key
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+        _pool_key = None
+
+
+def _search_root_move_task(board: chess.Board, move: int, depth: int, deadline: float | None,
+                           node_limit: int | None) -> tuple[float | None, float, int, int, list[int]]:
+    """
+    Worker task: search one root move, an int move of position.py, with a null window at the best root score
+    found so far, and with a full window above it if the move turns out better.
+
+    Returns:
+        tuple: (score from the root player's point of view, or None if a budget ran out; the bound the move was
+                searched with; nodes searched; deepest ply reached; principal variation after the move)
+    """
+    movetime = max(deadline - time.time(), 0.0) if deadline is not None else None
+    ctx = SearchContext(movetime=movetime, node_limit=node_limit)
+    ctx.completed_depth = depth - 1  # budgets apply straight away, the main process always has a move
+    ctx.tt.new_search()
+    ctx.orderer.new_search()
+    root_moves(board, ctx)
+    position = ctx.position
+
+    bound = _shared_bound.value
+    try:
+        value = search_root_move(depth, position, move, bound, bound + 1, ctx)
+        if value > bound:
+            value = search_root_move(depth, position, move, bound, float("inf"), ctx)
+    except SearchAborted:
+        return None, bound, ctx.nodes, ctx.seldepth, []
+
+    with _shared_bound.get_lock():
+        if value > _shared_bound.value:
+            _shared_bound.value = value
+
+    position.push(move)
+    return value, bound, ctx.nodes, ctx.seldepth, principal_variation(position, ctx.tt, depth - 1)
+
+
+def find_best_move_parallel(depth: int, board: chess.Board, ctx: SearchContext, workers: int) -> chess.Move | None:
+    """
+    Search the root moves of board to depth across a pool of worker processes.
+    The first move is searched with a full window in this process, the others in the pool with a window
+    that only accepts moves better than the best found so far. Between moves that score the same,
+    the choice can differ from find_best_move_minimax.
+
+    Args:
+        depth (int): The depth to which the minimax algorithm should run.
+        board (chess.Board): The current state of the chess board.
+        ctx (SearchContext): Shared search state of the main process.
+        workers (int): Number of worker processes.
+
+    Raises:
+        SearchAborted: If a budget runs out before every root move is searched
+
+    Returns:
+        chess.Move | None: The best move, None if there are no legal moves.
+    """
+    moves = root_moves(board, ctx)
+    if not moves:
+        return None
+    position = ctx.position
+    first_value = search_root_move(depth, position, moves[0], -float("inf"), float("inf"), ctx)
+    best_index, best_value = 0, first_value
+    position.push(moves[0])
+    best_pv = principal_variation(position, ctx.tt, depth - 1)
+    position.pop()
+
+    pool = get_pool(workers)
+    _shared_bound.value = best_value
+    deadline = None if ctx.deadline is None else time.time() + (ctx.deadline - time.perf_counter())
+    node_limit = None if ctx.node_limit is None else max(ctx.node_limit - ctx.nodes, 1)
+    futures = {pool.submit(_search_root_move_task, board, move, depth, deadline, node_limit): index
+               for index, move in enumerate(moves[1:], start=1)}
+
+    aborted = False
+    for future in concurrent.futures.as_completed(futures):
+        value, bound, nodes, seldepth, pv = future.result()
+        ctx.nodes += nodes
+        ctx.seldepth = max(ctx.seldepth, seldepth)
+        if value is None:
+            aborted = True
+            continue
+        index = futures[future]
+        # a value at or below the bound the move was searched with is only an upper bound, never a candidate
+        if value <= bound:
+            continue
+        if value > best_value or (value == best_value and index < best_index):
+            best_index, best_value, best_pv = index, value, pv
+
+    if aborted or (ctx.node_limit is not None and ctx.nodes >= ctx.node_limit):
+        raise SearchAborted
+
+    best_move = moves[best_index]
+    ctx.score = best_value if board.turn == chess.WHITE else -best_value
+    ctx.tt.store(ctx.keys[ctx.root_index], depth, best_value, EXACT, best_move)
+    ctx.pv = [best_move] + best_pv
+    return move_to_chess(best_move)
+
+
+def parallel_iterative_deepening(board: chess.Board, max_depth: int | None, ctx: SearchContext,
+                                 workers: int) -> chess.Move | None:
+    """
+    Iterative deepening with every iteration after the first split across worker processes.
+    The node budget is shared out per iteration, so it is less exact than in the single process search.
+
+    Args:
+        board (chess.Board): The current state of the chess board.
+        max_depth (int | None): Deepest iteration to run. Defaults to MAX_DEPTH when None.
+        ctx (SearchContext): Budgets and shared search state.
+        workers (int): Number of worker processes.
+
+    Returns:
+        chess.Move | None: Best move of the last completed iteration, None if there are no legal moves.
+    """
+    max_depth = MAX_DEPTH if max_depth is None else max(1, max_depth)
+    ctx.tt.new_search()
+    ctx.orderer.new_search()
+    best_move = None
+
+    for depth in range(1, max_depth + 1):
+        ctx.follow_pv = bool(ctx.pv)
+        try:
+            if depth == 1:
+                move = find_best_move_minimax(depth, board, ctx)
+            else:
+                move = find_best_move_parallel(depth, board, ctx, workers)
+        except SearchAborted:
+            break
+
+        if move is None:
+            break
+        best_move = move
+        # later iterations set the principal variation themselves
+        ctx.complete_iteration(depth, principal_variation(ctx.position, ctx.tt, depth) if depth == 1 else ctx.pv)
+
+        if ctx.deadline is not None and time.perf_counter() + ctx.elapsed() >= ctx.deadline:
+            break
+
+    return best_move
@@ -0,0 +1,132 @@
+import threading
+import time
+import chess
+from movegen import SearchContext, SearchStats, search_move
+
+# Pondering: while the opponent thinks, search the position after the reply cobra expects, so that on a ponder hit
+# the search is already under way, or done, when the reply arrives.
+# The search runs on a thread, which gets the CPU while the main thread is blocked waiting for the opponent.
+# It goes through search_move like any other move, so a pondered position plays the same book move or search.
+# https://www.chessprogramming.org/Pondering
+
+
+class Ponderer:
+    """
+    Runs one ponder search at a time and keeps the hit counters of the game.
+    The ponder search uses the shared transposition table, so even a miss leaves useful entries behind.
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.ctx = None
+        self.board = None
+        self.predicted_move = None
+        self.start_time = 0.0
+        self.movetime = None
+        self.best_move = None
+        self.stats = None  # statistics of the ponder search, taken when it returns
+        self.hits = 0
+        self.misses = 0
+        self.saved_time = 0.0  # search time already spent on hits when the opponent's move arrived
+
+    @staticmethod
+    def predict(board: chess.Board, stats: SearchStats) -> chess.Move | None:
+        """
+        Expected reply to the move just played, the second move of the principal variation of the search
+        that chose it.
+
+        Args:
+            board (chess.Board): Position after cobra's move.
+            stats (SearchStats): Statistics of that search.
+
+        Returns:
+            chess.Move | None: The expected reply, None if the principal variation ends at cobra's move.
+        """
+        if len(stats.pv) < 2:
+            return None
+        move = chess.Move.from_uci(stats.pv[1])
+        return move if board.is_legal(move) else None
+
+    def start(self, board: chess.Board, predicted_move: chess.Move, depth: int | None, movetime: float | None = None,
+              nodes: int | None = None, workers: int = 1) -> bool:
+        """
+        Start searching the position after predicted_move in the background. The time budget only starts to count on
+        a ponder hit, until then the search runs up to depth or until it is stopped.
+        A parallel search is not pondered: a stop or the deadline set on a hit does not reach the worker processes
+        until their iteration completes, so the move is searched once the opponent's move arrives instead.
+
+        Args:
+            board (chess.Board): Position with the opponent to move.
+            predicted_move (chess.Move): Expected reply of the opponent.
+            depth (int | None): Maximum depth of the search, as for search_move.
+            movetime (float, optional): Time budget of the search on a hit.
+            nodes (int, optional): Node budget of the search.
+            workers (int, optional): Number of processes the moves are searched with. Defaults to 1.
+
+        Returns:
+            bool: Whether the ponder search was started.
+        """
+        self.stop()
+        if workers > 1:
+            return False
+        self.board = board.copy()
+        self.board.push(predicted_move)
+        self.predicted_move = predicted_move
+        self.movetime = movetime
+        self.best_move = None
+        self.stats = None
+        self.ctx = SearchContext(node_limit=nodes)
+        self.start_time = time.perf_counter()
+        self.thread = threading.Thread(target=self._search, args=(self.board, depth, self.ctx), daemon=True)
+        self.thread.start()
+        return True
+
+    def _search(self, board: chess.Board, depth: int | None, ctx: SearchContext):
+        self.best_move, self.stats = search_move(depth, board, ctx=ctx)
+
+    def stop(self):
+        """Abort the ponder search, if any, and wait for it to return."""
+        if self.thread is not None:
+            self.ctx.stop()
+            self.thread.join()
+            self.thread = None
+
+    def finish(self, move: chess.Move) -> tuple[chess.Move, SearchStats] | None:
+        """
+        Handle the opponent's actual move. On a hit the ponder search is given the normal time budget, counted from
+        when it started, and its result is returned once it completes. On a miss it is stopped. Either way the
+        outcome and the running hit rate are logged.
+
+        Args:
+            move (chess.Move): The move the opponent played.
+
+        Returns:
+            tuple[chess.Move, SearchStats] | None: Best reply and statistics of the ponder search on a hit,
+                None on a miss or when nothing was being pondered.
+        """
+        if self.thread is None:
+            return None
+        if move != self.predicted_move:
+            self.stop()
+            self.misses += 1
+            print(f"Ponder miss: expected {self.predicted_move.uci()}, got {move.uci()}. {self}")
+            return None
+
+        self.hits += 1
+        pondered = time.perf_counter() - self.start_time
+        if self.movetime is not None:
+            self.ctx.deadline = self.ctx.start_time + self.movetime
+        self.thread.join()
+        self.thread = None
+        self.saved_time += min(pondered, self.stats.time)
+        print(f"Ponder hit after {pondered:.2f}s of pondering. {self}")
+        return self.best_move, self.stats
+
+    @property
+    def hit_rate(self) -> float:
+        ponders = self.hits + self.misses
+        return self.hits / ponders if ponders else 0.0
+
+    def __str__(self) -> str:
+        return (f"Ponder hits: {self.hits}/{self.hits + self.misses} ({self.hit_rate:.0%}), "
+                f"latency saved: {self.saved_time:.2f}s")
@@ -0,0 +1,507 @@
+import chess
+import chess.polyglot
+from tt import PIECE_KEYS, TURN_KEY
+
+# Compact position for the search: piece bitboards, a mailbox of piece codes and an undo stack of plain tuples.
+# Moves are ints in the transposition table encoding: from square | to square << 6 | promotion piece type << 12,
+# with castling written as the king's two square move and 0 as the null move.
+# https://www.chessprogramming.org/Bitboards
+# https://www.chessprogramming.org/Make_Move
+
+NULL_MOVE = 0
+
+# Polyglot random numbers of the castling rights, by rook square, and of the en passant file
+CASTLING_KEYS = {
+    chess.H1: chess.polyglot.POLYGLOT_RANDOM_ARRAY[768],
+    chess.A1: chess.polyglot.POLYGLOT_RANDOM_ARRAY[769],
+    chess.H8: chess.polyglot.POLYGLOT_RANDOM_ARRAY[770],
+    chess.A8: chess.polyglot.POLYGLOT_RANDOM_ARRAY[771],
+}
+EP_KEYS = chess.polyglot.POLYGLOT_RANDOM_ARRAY[772:780]
+
+BETWEEN = [[chess.between(a, b) for b in chess.SQUARES] for a in chess.SQUARES]
+LINE = chess.BB_RAYS  # full line through two squares, 0 if they are not on one
+PROMOTION_PIECES = (chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT)
+BB_SQUARES = chess.BB_SQUARES
+
+
+def make_move(from_square: chess.Square, to_square: chess.Square, promotion: chess.PieceType | None = None) -> int:
+    return from_square | (to_square << 6) | ((promotion or 0) << 12)
+
+
+def move_to_chess(move: int) -> chess.Move:
+    """Convert an int move to a chess.Move."""
+    if move == NULL_MOVE:
+        return chess.Move.null()
+    promotion = move >> 12
+    return chess.Move(move & 63, (move >> 6) & 63, promotion if promotion else None)
+
+
+def move_from_chess(move: chess.Move) -> int:
+    """Convert a chess.Move to an int move."""
+    if not move:
+        return NULL_MOVE
+    return make_move(move.from_square, move.to_square, move.promotion)
+
+
+def _castling_key(castling_rights: int) -> int:
+    key = 0
+    for square, castling_key in CASTLING_KEYS.items():
+        if castling_rights & BB_SQUARES[square]:
+            key ^= castling_key
+    return key
+
+
+_castling_keys = {rights: _castling_key(rights) for rights in
+                  [a | b | c | d for a in (0, chess.BB_A1) for b in (0, chess.BB_H1)
+                   for c in (0, chess.BB_A8) for d in (0, chess.BB_H8)]}
+
+
+class Position:
+    """
+    Search-only chess position with make/unmake, built for speed rather than generality: no move stack of
+    Move objects and no board state snapshots, standard chess only.
+    The search in movegen.py converts the root board to a Position and searches it with int moves.
+    Offers the parts of the chess.Board interface that eval.py and the bitbase read (piece_at, piece_map, the piece
+    bitboards, turn, is_check, ...), so evaluate_board, check_end_game and Bitbase.probe run on it unchanged.
+
+    Args:
+        board (chess.Board, optional): Position to copy. Defaults to the starting position.
+
+    Raises:
+        Exception: If board is a Chess960 position
+    """
+
+    __slots__ = ("pieces", "occupied_co", "mailbox", "turn", "castling_rights", "ep_square", "halfmove_clock",
+                 "fullmove_number", "key", "stack")
+
+    def __init__(self, board: chess.Board | None = None):
+        board = board if board is not None else chess.Board()
+        if board.chess960:
+            raise Exception("Position only supports standard chess")
+        self.pieces = [0, board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings]
+        self.occupied_co = [board.occupied_co[chess.BLACK], board.occupied_co[chess.WHITE]]
+        self.mailbox = [0] * 64  # piece type | color << 3, 0 for an empty square
+        for square, piece in board.piece_map().items():
+            self.mailbox[square] = piece.piece_type | (piece.color << 3)
+        self.turn = board.turn
+        self.castling_rights = board.clean_castling_rights()
+        self.ep_square = board.ep_square
+        self.halfmove_clock = board.halfmove_clock
+        self.fullmove_number = board.fullmove_number
+        self.key = chess.polyglot.zobrist_hash(board)
+        self.stack = []  # undo records: (move, captured piece code, castling rights, ep square, halfmove clock, key)
+
+    # chess.Board compatible accessors
+
+    @property
+    def pawns(self) -> int:
+        return self.pieces[chess.PAWN]
+
+    @property
+    def knights(self) -> int:
+        return self.pieces[chess.KNIGHT]
+
+    @property
+    def bishops(self) -> int:
+        return self.pieces[chess.BISHOP]
+
+    @property
+    def rooks(self) -> int:
+        return self.pieces[chess.ROOK]
+
+    @property
+    def queens(self) -> int:
+        return self.pieces[chess.QUEEN]
+
+    @property
+    def kings(self) -> int:
+        return self.pieces[chess.KING]
+
+    @property
+    def occupied(self) -> int:
+        return self.occupied_co[0] | self.occupied_co[1]
+
+    def pieces_mask(self, piece_type: chess.PieceType, color: chess.Color) -> int:
+        return self.pieces[piece_type] & self.occupied_co[color]
+
+    def piece_type_at(self, square: chess.Square) -> chess.PieceType | None:
+        return (self.mailbox[square] & 7) or None
+
+    def piece_at(self, square: chess.Square) -> chess.Piece | None:
+        code = self.mailbox[square]
+        return chess.Piece(code & 7, bool(code >> 3)) if code else None
+
+    def piece_map(self) -> dict[chess.Square, chess.Piece]:
+        return {square: chess.Piece(code & 7, bool(code >> 3)) for square, code in enumerate(self.mailbox) if code}
+
+    def ply(self) -> int:
+        return 2 * (self.fullmove_number - 1) + (self.turn == chess.BLACK)
+
+    def to_board(self) -> chess.Board:
+        """Convert to a chess.Board, without the move history."""
+        board = chess.Board(None)
+        for square, code in enumerate(self.mailbox):
+            if code:
+                board.set_piece_at(square, chess.Piece(code & 7, bool(code >> 3)))
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        return board
+
+    def fen(self) -> str:
+        return self.to_board().fen()
+
+    # attacks
+
+    def attackers_mask(self, color: chess.Color, square: chess.Square, occupied: int | None = None) -> int:
+        """Pieces of color attacking square, with sliding attacks blocked by occupied."""
+        if occupied is None:
+            occupied = self.occupied_co[0] | self.occupied_co[1]
+        pieces = self.pieces
+        queens_and_rooks = pieces[chess.QUEEN] | pieces[chess.ROOK]
+        queens_and_bishops = pieces[chess.QUEEN] | pieces[chess.BISHOP]
+        attackers = ((chess.BB_KING_ATTACKS[square] & pieces[chess.KING])
+                     | (chess.BB_KNIGHT_ATTACKS[square] & pieces[chess.KNIGHT])
+                     | (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] & queens_and_rooks)
+                     | (chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied] & queens_and_rooks)
+                     | (chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied] & queens_and_bishops)
+                     | (chess.BB_PAWN_ATTACKS[not color][square] & pieces[chess.PAWN]))
+        return attackers & self.occupied_co[color]
+
+    def king(self, color: chess.Color) -> chess.Square:
+        king_mask = self.pieces[chess.KING] & self.occupied_co[color]
+        return (king_mask & -king_mask).bit_length() - 1
+
+    def is_check(self) -> bool:
+        return bool(self.attackers_mask(not self.turn, self.king(self.turn)))
+
+    def is_capture(self, move: int) -> bool:
+        to_square = (move >> 6) & 63
+        return bool(self.mailbox[to_square]) or (
+            to_square == self.ep_square and self.mailbox[move & 63] & 7 == chess.PAWN)
+
+    def is_en_passant(self, move: int) -> bool:
+        # a pawn can only reach the en passant square by capturing onto it
+        return (move >> 6) & 63 == self.ep_square and self.mailbox[move & 63] & 7 == chess.PAWN
+
+    def is_castling(self, move: int) -> bool:
+        return self.mailbox[move & 63] & 7 == chess.KING and abs((move & 63) - ((move >> 6) & 63)) == 2
+
+    def gives_check(self, move: int) -> bool:
+        self.push(move)
+        check = self.is_check()
+        self.pop()
+        return check
+
+    def _ep_key(self) -> int:
+        # Polyglot only hashes the en passant file if a pawn of the side to move could capture there
+        ep_square = self.ep_square
+        if ep_square is None:
+            return 0
+        if chess.BB_PAWN_ATTACKS[not self.turn][ep_square] & self.pieces[chess.PAWN] & self.occupied_co[self.turn]:
+            return EP_KEYS[ep_square & 7]
+        return 0
+
+    # make / unmake
+
+    def push(self, move: int):
+        """Make a pseudo-legal move, or the null move."""
+        pieces, occupied_co, mailbox = self.pieces, self.occupied_co, self.mailbox
+        color = self.turn
+        ep_square = self.ep_square
+        key = self.key ^ self._ep_key() ^ TURN_KEY
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        captured = mailbox[to_square] if move else 0
+        self.stack.append((move, captured, self.castling_rights, ep_square, self.halfmove_clock, self.key))
+        self.ep_square = None
+        if color == chess.BLACK:
+            self.fullmove_number += 1
+        self.turn = not color
+
+        if move == NULL_MOVE:
+            self.halfmove_clock += 1
+            self.key = key
+            return
+
+        promotion = move >> 12
+        from_bb = BB_SQUARES[from_square]
+        to_bb = BB_SQUARES[to_square]
+        piece_type = mailbox[from_square] & 7
+        own_keys = PIECE_KEYS[color]
+
+        if captured:
+            captured_type = captured & 7
+            pieces[captured_type] ^= to_bb
+            occupied_co[not color] ^= to_bb
+            key ^= PIECE_KEYS[not color][captured_type][to_square]
+
+        # move the piece, promoting it if needed
+        pieces[piece_type] ^= from_bb
+        occupied_co[color] ^= from_bb | to_bb
+        mailbox[from_square] = 0
+        new_type = promotion or piece_type
+        pieces[new_type] |= to_bb
+        mailbox[to_square] = new_type | (color << 3)
+        key ^= own_keys[piece_type][from_square] ^ own_keys[new_type][to_square]
+
+        if piece_type == chess.PAWN:
+            self.halfmove_clock = 0
+            diff = to_square - from_square
+            if diff == 16 or diff == -16:
+                self.ep_square = from_square + diff // 2
+            elif to_square == ep_square:  # en passant
+                captured_square = to_square - 8 if color == chess.WHITE else to_square + 8
+                captured_bb = BB_SQUARES[captured_square]
+                pieces[chess.PAWN] ^= captured_bb
+                occupied_co[not color] ^= captured_bb
+                mailbox[captured_square] = 0
+                key ^= PIECE_KEYS[not color][chess.PAWN][captured_square]
+        else:
+            self.halfmove_clock = 0 if captured else self.halfmove_clock + 1
+            if piece_type == chess.KING and (to_square - from_square == 2 or from_square - to_square == 2):
+                rook_from, rook_to = (to_square + 1, to_square - 1) if to_square > from_square \
+                    else (to_square - 2, to_square + 1)
+                rook_bb = BB_SQUARES[rook_from] | BB_SQUARES[rook_to]
+                pieces[chess.ROOK] ^= rook_bb
+                occupied_co[color] ^= rook_bb
+                mailbox[rook_from] = 0
+                mailbox[rook_to] = chess.ROOK | (color << 3)
+                key ^= own_keys[chess.ROOK][rook_from] ^ own_keys[chess.ROOK][rook_to]
+
+        castling_rights = self.castling_rights
+        if castling_rights:
+            new_rights = castling_rights & ~(from_bb | to_bb)
+            if piece_type == chess.KING:
+                new_rights &= ~(chess.BB_RANK_1 if color == chess.WHITE else chess.BB_RANK_8)
+            if new_rights != castling_rights:
+                key ^= _castling_keys[castling_rights] ^ _castling_keys[new_rights]
+                self.castling_rights = new_rights
+
+        self.key = key ^ self._ep_key()
+
+    def pop(self):
+        """Unmake the last move."""
+        move, captured, self.castling_rights, self.ep_square, self.halfmove_clock, self.key = self.stack.pop()
+        color = not self.turn
+        self.turn = color
+        if color == chess.BLACK:
+            self.fullmove_number -= 1
+        if move == NULL_MOVE:
+            return
+
+        pieces, occupied_co, mailbox = self.pieces, self.occupied_co, self.mailbox
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        from_bb = BB_SQUARES[from_square]
+        to_bb = BB_SQUARES[to_square]
+        moved_type = mailbox[to_square] & 7
+        piece_type = chess.PAWN if move >> 12 else moved_type
+
+        pieces[moved_type] ^= to_bb
+        pieces[piece_type] |= from_bb
+        occupied_co[color] ^= from_bb | to_bb
+        mailbox[from_square] = piece_type | (color << 3)
+        mailbox[to_square] = captured
+        if captured:
+            pieces[captured & 7] |= to_bb
+            occupied_co[not color] |= to_bb
+        elif piece_type == chess.PAWN and to_square == self.ep_square:
+            captured_square = to_square - 8 if color == chess.WHITE else to_square + 8
+            captured_bb = BB_SQUARES[captured_square]
+            pieces[chess.PAWN] |= captured_bb
+            occupied_co[not color] |= captured_bb
+            mailbox[captured_square] = chess.PAWN | ((not color) << 3)
+        elif piece_type == chess.KING and (to_square - from_square == 2 or from_square - to_square == 2):
+            rook_from, rook_to = (to_square + 1, to_square - 1) if to_square > from_square \
+                else (to_square - 2, to_square + 1)
+            rook_bb = BB_SQUARES[rook_from] | BB_SQUARES[rook_to]
+            pieces[chess.ROOK] ^= rook_bb
+            occupied_co[color] ^= rook_bb
+            mailbox[rook_to] = 0
+            mailbox[rook_from] = chess.ROOK | (color << 3)
+
+    # move generation
+
+    def _pinned(self, color: chess.Color, king: chess.Square, occupied: int) -> int:
+        """Pieces of color pinned to their king."""
+        pieces = self.pieces
+        them = self.occupied_co[not color]
+        snipers = them & (
+            ((chess.BB_RANK_ATTACKS[king][0] | chess.BB_FILE_ATTACKS[king][0]) & (pieces[chess.ROOK] | pieces[chess.QUEEN]))
+            | (chess.BB_DIAG_ATTACKS[king][0] & (pieces[chess.BISHOP] | pieces[chess.QUEEN])))
+        pinned = 0
+        while snipers:
+            sniper = (snipers & -snipers).bit_length() - 1
+            snipers &= snipers - 1
+            blockers = BETWEEN[king][sniper] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & self.occupied_co[color]:
+                pinned |= blockers
+        return pinned
+
+    def generate_pseudo_legal_moves(self) -> list[int]:
+        """Moves that follow the piece movement rules, but may leave the own king in check."""
+        return self._generate(legal=False)
+
+    def generate_legal_moves(self) -> list[int]:
+        """
+        Legal moves. Pseudo-legal moves are filtered with the checkers and pinned pieces of the position,
+        so only king moves and en passant captures need an attack test.
+        """
+        return self._generate(legal=True)
+
+    def has_legal_moves(self) -> bool:
+        """Whether the side to move has a legal move. The king moves are tried before generating every move."""
+        color = self.turn
+        king = self.king(color)
+        them = self.occupied_co[not color]
+        targets = chess.BB_KING_ATTACKS[king] & ~(self.occupied_co[color] | (self.pieces[chess.KING] & them))
+        without_king = (self.occupied_co[color] | them) ^ BB_SQUARES[king]
+        while targets:
+            to_square = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            if not self.attackers_mask(not color, to_square, without_king):
+                return True
+        return bool(self._generate(legal=True))
+
+    def generate_legal_captures(self) -> list[int]:
+        """Legal captures, including en passant and capturing promotions, for the quiescence search."""
+        return self._generate(legal=True, captures=True)
+
+    def _generate(self, legal: bool, captures: bool = False) -> list[int]:
+        pieces, occupied_co, mailbox = self.pieces, self.occupied_co, self.mailbox
+        color = self.turn
+        us = occupied_co[color]
+        them = occupied_co[not color]
+        occupied = us | them
+        king = self.king(color)
+        # the opponent king is never captured, it can only be in check in an invalid position
+        blocked = us | (pieces[chess.KING] & them)
+        moves = []
+        append = moves.append
+
+        # king moves, to squares the opponent does not attack once the king has left its square
+        targets = chess.BB_KING_ATTACKS[king] & ~blocked & (them if captures else chess.BB_ALL)
+        without_king = occupied ^ BB_SQUARES[king]
+        while targets:
+            to_square = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            if not legal or not self.attackers_mask(not color, to_square, without_king):
+                append(king | (to_square << 6))
+
+        checkers = self.attackers_mask(not color, king, occupied) if legal else 0
+        if checkers & (checkers - 1):  # double check, only the king can move
+            return moves
+        if checkers:
+            checker = (checkers & -checkers).bit_length() - 1
+            target_mask = BETWEEN[king][checker] | checkers
+        else:
+            target_mask = ~blocked & chess.BB_ALL
+            if not captures:
+                self._generate_castling(color, king, occupied, legal, append)
+        if captures:
+            target_mask &= them
+        pinned = self._pinned(color, king, occupied) if legal else 0
+
+        # knights, bishops, rooks and queens
+        queens = pieces[chess.QUEEN]
+        for piece_mask, piece_type in ((pieces[chess.KNIGHT], chess.KNIGHT), (pieces[chess.BISHOP] | queens, chess.BISHOP),
+                                      (pieces[chess.ROOK] | queens, chess.ROOK)):
+            movers = piece_mask & us
+            while movers:
+                from_square = (movers & -movers).bit_length() - 1
+                movers &= movers - 1
+                if piece_type == chess.KNIGHT:
+                    if pinned & BB_SQUARES[from_square]:
+                        continue  # a pinned knight can never move along the pin
+                    targets = chess.BB_KNIGHT_ATTACKS[from_square] & target_mask
+                elif piece_type == chess.BISHOP:
+                    targets = chess.BB_DIAG_ATTACKS[from_square][chess.BB_DIAG_MASKS[from_square] & occupied] & target_mask
+                else:
+                    targets = (chess.BB_RANK_ATTACKS[from_square][chess.BB_RANK_MASKS[from_square] & occupied]
+                               | chess.BB_FILE_ATTACKS[from_square][chess.BB_FILE_MASKS[from_square] & occupied]) & target_mask
+                if pinned & BB_SQUARES[from_square]:
+                    targets &= LINE[king][from_square]
+                while targets:
+                    to_square = (targets & -targets).bit_length() - 1
+                    targets &= targets - 1
+                    append(from_square | (to_square << 6))
+
+        # pawns
+        if color == chess.WHITE:
+            forward, start_rank, last_rank = 8, chess.BB_RANK_2, chess.BB_RANK_8
+        else:
+            forward, start_rank, last_rank = -8, chess.BB_RANK_7, chess.BB_RANK_1
+        pawn_attacks = chess.BB_PAWN_ATTACKS[color]
+        pawns = pieces[chess.PAWN] & us
+        while pawns:
+            from_square = (pawns & -pawns).bit_length() - 1
+            from_bb = pawns & -pawns
+            pawns &= pawns - 1
+            targets = pawn_attacks[from_square] & them
+            single = from_square + forward
+            if not captures and not occupied & BB_SQUARES[single]:
+                targets |= BB_SQUARES[single]
+                if from_bb & start_rank and not occupied & BB_SQUARES[single + forward]:
+                    targets |= BB_SQUARES[single + forward]
+            targets &= target_mask
+            if pinned & from_bb:
+                targets &= LINE[king][from_square]
+            while targets:
+                to_square = (targets & -targets).bit_length() - 1
+                targets &= targets - 1
+                if BB_SQUARES[to_square] & last_rank:
+                    for promotion in PROMOTION_PIECES:
+                        append(from_square | (to_square << 6) | (promotion << 12))
+                else:
+                    append(from_square | (to_square << 6))
+
+        # en passant, tested by making the move as it can uncover a check along the rank
+        ep_square = self.ep_square
+        if ep_square is not None and not occupied & BB_SQUARES[ep_square]:
+            capturers = chess.BB_PAWN_ATTACKS[not color][ep_square] & pieces[chess.PAWN] & us
+            while capturers:
+                from_square = (capturers & -capturers).bit_length() - 1
+                capturers &= capturers - 1
+                move = from_square | (ep_square << 6)
+                if legal:
+                    self.push(move)
+                    in_check = self.attackers_mask(not color, king)
+                    self.pop()
+                    if in_check:
+                        continue
+                append(move)
+        return moves
+
+    def _generate_castling(self, color: chess.Color, king: chess.Square, occupied: int, legal: bool, append):
+        rights = self.castling_rights & self.pieces[chess.ROOK] & self.occupied_co[color]
+        if not rights:
+            return
+        for rook_square, king_to, empty, safe in (
+                (king + 3, king + 2, (1, 2), (1, 2)),  # kingside
+                (king - 4, king - 2, (-1, -2, -3), (-1, -2))):  # queenside
+            if not 0 <= rook_square < 64 or not rights & BB_SQUARES[rook_square]:
+                continue
+            if any(occupied & BB_SQUARES[king + offset] for offset in empty):
+                continue
+            if legal and any(self.attackers_mask(not color, king + offset, occupied) for offset in safe):
+                continue
+            append(king | (king_to << 6))
+
+    def is_legal(self, move: int) -> bool:
+        return move in self.generate_legal_moves()
+
+    def perft(self, depth: int) -> int:
+        """Number of leaf nodes of the legal move tree to depth, for comparison with known counts."""
+        moves = self.generate_legal_moves()
+        if depth <= 1:
+            return len(moves) if depth == 1 else 1
+        nodes = 0
+        for move in moves:
+            self.push(move)
+            nodes += self.perft(depth - 1)
+            self.pop()
+        return nodes
@@ -0,0 +1,202 @@
+import os
+import sys
+import threading
+import time
+
+# CPU profiles of cobra's search, as collapsed stacks ("root;caller;function microseconds" per line, the input of
+# flamegraph.pl and speedscope) and a per-function summary of self and total time.
+# Two ways to capture them:
+#   sampling: a thread records the stack of the profiled thread every interval, cheap enough for real games
+#   deterministic: every Python and C call is traced through sys.setprofile, exact but several times slower
+# Nothing is installed unless a Profiler is started, so the search runs at full speed otherwise.
+# https://www.brendangregg.com/flamegraphs.html
+
+MODES = ("sampling", "deterministic")
+DEFAULT_INTERVAL = 0.001  # seconds between samples
+_OWN_PREFIX = f"{os.path.basename(__file__)}:"
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"  # 3.11+
+
+
+def _builtin_name(function) -> str:
+    module = getattr(function, "__module__", None) or "builtins"
+    return f"{module}:{getattr(function, '__qualname__', repr(function))}"
+
+
+def _caller_stack() -> list[str]:
+    """Names of the frames from the outermost down to the first caller outside this module."""
+    frame = sys._getframe()
+    while frame is not None and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return names[::-1]
+
+
+class Profiler:
+    """
+    Profile of the code run on the current thread between start and stop, or inside a with block:
+
+        with Profiler("sampling") as profiler:
+            movegen.search_move(4, board)
+        profiler.write("profiles/move")
+
+    Stacks start at the function the profiler was started from. Profiles of several runs add up.
+
+    Args:
+        mode (str, optional): "sampling" or "deterministic". Defaults to "sampling".
+        interval (float, optional): Seconds between samples in sampling mode. Defaults to DEFAULT_INTERVAL.
+
+    Raises:
+        Exception: On an unknown mode
+    """
+
+    def __init__(self, mode: str = "sampling", interval: float = DEFAULT_INTERVAL):
+        if mode not in MODES:
+            raise Exception(f"Unknown profiling mode {mode}, expected one of {MODES}")
+        self.mode = mode
+        self.interval = interval
+        self.stacks = {}  # stack of frame names, outermost first, to seconds spent in it
+        self.elapsed = 0.0
+        self._prefix = 0  # frames above the function the profiler was started from
+        self._start_time = 0.0
+        self._stack = []
+        self._last = 0.0
+        self._thread = None
+        self._running = False
+        self._switch_interval = None
+
+    def start(self):
+        caller = _caller_stack()
+        self._prefix = len(caller) - 1
+        self._start_time = time.perf_counter()
+        if self.mode == "sampling":
+            # the sampler only runs when the profiled thread releases the GIL, every switch interval (5ms by default)
+            self._switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(self.interval, self._switch_interval))
+            self._running = True
+            self._thread = threading.Thread(target=self._sample, args=(threading.get_ident(),), daemon=True)
+            self._thread.start()
+        else:
+            # the frames of this module above the caller are popped by their return events
+            frame, own = sys._getframe(), []
+            while frame is not None and frame.f_code.co_filename == __file__:
+                own.append(_frame_name(frame))
+                frame = frame.f_back
+            self._stack = caller + own[::-1]
+            self._last = time.perf_counter()
+            sys.setprofile(self._trace)
+
+    def stop(self):
+        if self.mode == "sampling":
+            self._running = False
+            self._thread.join()
+            self._thread = None
+            sys.setswitchinterval(self._switch_interval)
+        else:
+            sys.setprofile(None)
+            self._stack = []
+        self.elapsed += time.perf_counter() - self._start_time
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _add(self, stack: tuple[str, ...], seconds: float):
+        stack = stack[self._prefix:]
+        if stack and not stack[-1].startswith(_OWN_PREFIX):  # starting and stopping the profiler
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + seconds
+
+    def _sample(self, thread_id: int):
+        last = time.perf_counter()
+        while self._running:
+            time.sleep(self.interval)
+            if not self._running:
+                break  # the profiled thread is in stop, waiting for this thread
+            frame = sys._current_frames().get(thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                names = []
+                while frame is not None:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                self._add(tuple(names[::-1]), now - last)  # the GIL can delay a sample, so weigh it by the gap
+            last = now
+
+    def _trace(self, frame, event: str, arg):
+        now = time.perf_counter()
+        if self._stack:
+            self._add(tuple(self._stack), now - self._last)
+        if event == "call":
+            self._stack.append(_frame_name(frame))
+        elif event == "c_call":
+            self._stack.append(_builtin_name(arg))
+        elif self._stack:  # return, c_return or c_exception
+            self._stack.pop()
+        self._last = time.perf_counter()  # the time spent in here is not counted
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, one "frame;frame;frame microseconds" line per stack, for flame graph tools."""
+        lines = []
+        for stack, seconds in sorted(self.stacks.items()):
+            microseconds = round(seconds * 1e6)
+            if microseconds:
+                lines.append(f"{';'.join(stack)} {microseconds}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def summary(self) -> list[dict]:
+        """
+        Time of each function, most self time first.
+
+        Returns:
+            list[dict]: Function name, self time (in the function itself) and total time (including its callees)
+                in seconds and as a fraction of the profiled time.
+        """
+        self_time, total_time = {}, {}
+        for stack, seconds in self.stacks.items():
+            self_time[stack[-1]] = self_time.get(stack[-1], 0.0) + seconds
+            for name in set(stack):  # recursive functions count once per stack
+                total_time[name] = total_time.get(name, 0.0) + seconds
+        profiled = sum(self.stacks.values()) or 1.0
+        rows = [{"function": name, "self": self_time.get(name, 0.0), "total": total,
+                 "self_fraction": self_time.get(name, 0.0) / profiled, "total_fraction": total / profiled}
+                for name, total in total_time.items()]
+        return sorted(rows, key=lambda row: (row["self"], row["total"]), reverse=True)
+
+    def format_summary(self, limit: int | None = 20) -> str:
+        lines = [f"{self.mode} profile of {self.elapsed:.3f}s",
+                 f"{'self':>9} {'self%':>6} {'total':>9} {'total%':>6}  function"]
+        for row in self.summary()[:limit]:
+            lines.append(f"{row['self']:9.4f} {row['self_fraction']:6.1%} {row['total']:9.4f} "
+                         f"{row['total_fraction']:6.1%}  {row['function']}")
+        return "\n".join(lines)
+
+    def write(self, path: str):
+        """Write the collapsed stacks to path.folded and the full summary to path.txt."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{path}.folded", "w") as f:
+            f.write(self.collapsed())
+        with open(f"{path}.txt", "w") as f:
+            f.write(self.format_summary(None) + "\n")
+
+
+def profile_call(mode: str, function, *args, **kwargs):
+    """
+    Run function(*args, **kwargs) under a new profiler.
+
+    Returns:
+        tuple: The function's return value and the Profiler.
+    """
+    with Profiler(mode) as profiler:
+        result = function(*args, **kwargs)
+    return result, profiler
@@ -0,0 +1,312 @@
+import argparse
+import concurrent.futures
+import json
+import math
+import time
+import chess
+import chess.pgn
+import movegen
+from tt import TranspositionTable
+
+# Self-play tournaments between two cobra configurations, to test whether a search change gains strength.
+# Each opening is played twice with colours reversed, and the games are split across worker processes.
+# Elo and its error bars follow https://www.chessprogramming.org/Match_Statistics
+# The SPRT is the normal approximation of the generalised SPRT used by Fishtest:
+# https://www.chessprogramming.org/Sequential_Probability_Ratio_Test
+
+# short book lines that leave a balanced position, each played with both colours
+DEFAULT_OPENINGS = [
+    "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2",
+    "rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2",
+    "rnbqkbnr/ppp1pppp/8/3p4/2PP4/8/PP2PPPP/RNBQKBNR b KQkq - 0 2",
+    "rnbqkb1r/pppppp1p/5np1/8/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 0 3",
+    "rnbqkbnr/pppp1ppp/4p3/8/3PP3/8/PPP2PPP/RNBQKBNR b KQkq - 0 2",
+    "rnbqkbnr/pp1ppppp/2p5/8/3PP3/8/PPP2PPP/RNBQKBNR b KQkq - 0 2",
+    "rnbqkbnr/pppppppp/8/8/2P5/8/PP1PPPPP/RNBQKBNR b KQkq - 0 1",
+    "r1bqkbnr/pppp1ppp/2n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",
+]
+
+DEFAULT_CONFIG = {"depth": 3, "movetime": None, "nodes": None, "hash": 16, "quiescence": True, "pruning": {}}
+
+# adjudication, from White's point of view of the searches' scores
+DRAW_MOVE_NUMBER = 40  # draws are adjudicated from this move on,
+DRAW_SCORE = 10  # once both sides score the position within this many centipawns of 0
+DRAW_PLIES = 8  # for this many plies in a row
+RESIGN_SCORE = 1000  # a side loses once both sides agree it is this far behind
+RESIGN_PLIES = 4  # for this many plies in a row
+MAX_PLIES = 400  # games still going after this many plies are drawn
+
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+
+
+def parse_config(spec: str, name: str) -> dict:
+    """
+    Read a configuration from comma separated key=value pairs, e.g. "depth=4,movetime=0.5,null_move=0".
+    The keys are depth, movetime, nodes, hash and quiescence, plus the DEFAULT_PRUNING technique names,
+    which switch a technique on (1) or off (0). Unset keys take their DEFAULT_CONFIG value.
+
+    Args:
+        spec (str): Configuration to read, may be empty.
+        name (str): Name of the configuration in the results.
+
+    Returns:
+        dict: The configuration.
+
+    Raises:
+        Exception: On an unknown key
+    """
+    config = dict(DEFAULT_CONFIG, name=name, pruning={})
+    for pair in filter(None, spec.split(",")):
+        key, _, value = pair.partition("=")
+        key = key.strip()
+        if key in movegen.DEFAULT_PRUNING:
+            config["pruning"][key] = value.strip() not in ("0", "false", "off")
+        elif key == "quiescence":
+            config[key] = value.strip() not in ("0", "false", "off")
+        elif key in ("depth", "nodes", "hash"):
+            config[key] = int(value)
+        elif key == "movetime":
+            config[key] = float(value)
+        else:
+            raise Exception(f"Unknown configuration key {key}")
+    return config
+
+
+def load_openings(path: str) -> list[str]:
+    """Opening positions from a file of FEN or EPD lines. Blank lines and lines starting with # are skipped."""
+    openings = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                openings.append(" ".join(line.split()[:4]) + " 0 1")
+    return openings
+
+
+def play_game(opening: str, white: dict, black: dict) -> dict:
+    """
+    Play one game from opening, each side with its own empty transposition table.
+
+    Args:
+        opening (str): FEN of the starting position.
+        white (dict): Configuration playing White, see parse_config.
+        black (dict): Configuration playing Black.
+
+    Returns:
+        dict: Result, termination, UCI moves, and the moves, search time and nodes of each colour.
+    """
+    board = chess.Board(opening)
+    configs = {chess.WHITE: white, chess.BLACK: black}
+    tables = {color: TranspositionTable(config["hash"]) for color, config in configs.items()}
+    usage = {color: {"moves": 0, "time": 0.0, "nodes": 0} for color in configs}
+    scores = []  # White's point of view, one per ply
+    result, termination = None, None
+
+    while result is None:
+        outcome = board.outcome(claim_draw=True)
+        if outcome is not None:
+            result, termination = outcome.result(), outcome.termination.name.lower()
+            break
+        if len(board.move_stack) >= MAX_PLIES:
+            result, termination = "1/2-1/2", "max plies"
+            break
+
+        config = configs[board.turn]
+        ctx = movegen.SearchContext(tt=tables[board.turn], movetime=config["movetime"], node_limit=config["nodes"],
+                                    pruning=config["pruning"], quiescence=config["quiescence"])
+        t0 = time.perf_counter()
+        move = movegen.iterative_deepening(board, config["depth"], ctx)
+        usage[board.turn]["time"] += time.perf_counter() - t0
+        usage[board.turn]["nodes"] += ctx.nodes
+        usage[board.turn]["moves"] += 1
+        board.push(move)
+        scores.append(ctx.score)
+        result, termination = adjudicate(board, scores)
+
+    return {"opening": opening, "white": white["name"], "black": black["name"], "result": result,
+            "termination": termination, "moves": [move.uci() for move in board.move_stack],
+            "usage": {white["name"]: usage[chess.WHITE], black["name"]: usage[chess.BLACK]}}
+
+
+def adjudicate(board: chess.Board, scores: list[float]) -> tuple[str | None, str | None]:
+    """
+    Decide a game the searches agree on: drawn when the score stays near 0 late in the game,
+    lost for a side that is far behind for several plies in a row.
+
+    Args:
+        board (chess.Board): Position after the last move.
+        scores (list[float]): Scores of every search of the game, from White's point of view.
+
+    Returns:
+        tuple[str | None, str | None]: Result and termination, or (None, None) to play on.
+    """
+    if len(scores) >= RESIGN_PLIES:
+        recent = scores[-RESIGN_PLIES:]
+        if all(score >= RESIGN_SCORE for score in recent):
+            return "1-0", "adjudication"
+        if all(score <= -RESIGN_SCORE for score in recent):
+            return "0-1", "adjudication"
+    if board.fullmove_number >= DRAW_MOVE_NUMBER and len(scores) >= DRAW_PLIES:
+        if all(abs(score) <= DRAW_SCORE for score in scores[-DRAW_PLIES:]):
+            return "1/2-1/2", "adjudication"
+    return None, None
+
+
+def elo(score: float) -> float:
+    """Elo difference that gives the expected score, infinite at a score of 0 or 1."""
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def expected_score(elo_difference: float) -> float:
+    """Inverse of elo."""
+    return 1 / (1 + 10 ** (-elo_difference / 400))
+
+
+def match_statistics(wins: int, draws: int, losses: int) -> dict:
+    """
+    Score, Elo difference and its 95% confidence interval of a match.
+
+    Returns:
+        dict: Games, score, Elo, and the lower and upper Elo bounds.
+    """
+    games = wins + draws + losses
+    if not games:
+        return {"games": 0, "score": 0.5, "elo": 0.0, "elo_lower": -math.inf, "elo_upper": math.inf}
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    return {"games": games, "score": score, "elo": elo(score), "elo_lower": elo(score - margin),
+            "elo_upper": elo(score + margin)}
+
+
+def sprt(wins: int, draws: int, losses: int, elo0: float, elo1: float, alpha: float = SPRT_ALPHA,
+         beta: float = SPRT_BETA) -> dict:
+    """
+    Sequential probability ratio test of H0: the Elo difference is elo0, against H1: it is elo1.
+
+    Returns:
+        dict: Log likelihood ratio, its lower and upper bounds, and the verdict: "H1" (the change gains elo1),
+            "H0" (it does not) or "continue" (play more games).
+    """
+    lower = math.log(beta / (1 - alpha))
+    upper = math.log((1 - beta) / alpha)
+    games = wins + draws + losses
+    llr = 0.0
+    if games:
+        score = (wins + draws / 2) / games
+        variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+        if variance > 0:
+            score0, score1 = expected_score(elo0), expected_score(elo1)
+            llr = games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+    verdict = "H1" if llr >= upper else "H0" if llr <= lower else "continue"
+    return {"llr": llr, "lower": lower, "upper": upper, "elo0": elo0, "elo1": elo1, "verdict": verdict}
+
+
+def run_tournament(first: dict, second: dict, games: int, openings: list[str] = DEFAULT_OPENINGS,
+                   workers: int = 1, elo0: float = 0.0, elo1: float = 5.0) -> tuple[list[dict], dict]:
+    """
+    Play games between two configurations, cycling through the openings, each played with both colours.
+
+    Args:
+        first (dict): Configuration under test, the results are from its point of view.
+        second (dict): Configuration it is tested against.
+        games (int): Number of games.
+        openings (list[str], optional): Starting positions. Defaults to DEFAULT_OPENINGS.
+        workers (int, optional): Number of processes the games are played in. Defaults to 1, in this process.
+        elo0 (float, optional): Elo difference of the SPRT null hypothesis.
+        elo1 (float, optional): Elo difference of the SPRT alternative hypothesis.
+
+    Returns:
+        tuple[list[dict], dict]: The games in order, see play_game, and the summary of the match.
+    """
+    pairings = []
+    for number in range(games):
+        opening = openings[(number // 2) % len(openings)]
+        pairings.append((opening, first, second) if number % 2 == 0 else (opening, second, first))
+
+    t0 = time.perf_counter()
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(play_game, *zip(*pairings)))
+    else:
+        results = [play_game(*pairing) for pairing in pairings]
+    return results, summarise(results, first, second, elo0, elo1, time.perf_counter() - t0)
+
+
+def summarise(results: list[dict], first: dict, second: dict, elo0: float, elo1: float, elapsed: float) -> dict:
+    wins = draws = losses = 0
+    terminations = {}
+    for game in results:
+        if game["result"] == "1/2-1/2":
+            draws += 1
+        elif (game["result"] == "1-0") == (game["white"] == first["name"]):
+            wins += 1
+        else:
+            losses += 1
+        terminations[game["termination"]] = terminations.get(game["termination"], 0) + 1
+
+    engines = {}
+    for config in (first, second):
+        moves = sum(game["usage"][config["name"]]["moves"] for game in results)
+        engines[config["name"]] = {
+            "config": config,
+            "moves": moves,
+            "time_per_move": sum(game["usage"][config["name"]]["time"] for game in results) / moves if moves else 0,
+            "nodes_per_move": sum(game["usage"][config["name"]]["nodes"] for game in results) / moves if moves else 0,
+        }
+    return {"wins": wins, "draws": draws, "losses": losses, **match_statistics(wins, draws, losses),
+            "sprt": sprt(wins, draws, losses, elo0, elo1), "terminations": terminations, "engines": engines,
+            "time": elapsed}
+
+
+def write_pgn(results: list[dict], path: str):
+    """Write the games, with their opening position and how they ended, to a PGN file."""
+    with open(path, "w") as f:
+        for number, result in enumerate(results, 1):
+            board = chess.Board(result["opening"])
+            game = chess.pgn.Game.from_board(board)
+            node = game
+            for uci in result["moves"]:
+                node = node.add_variation(chess.Move.from_uci(uci))
+            game.headers.update({"Event": "cobra self-play", "Site": "-", "Round": str(number),
+                                 "White": result["white"], "Black": result["black"], "Result": result["result"],
+                                 "Termination": result["termination"]})
+            print(game, file=f, end="\n\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play cobra against itself with two configurations.")
+    parser.add_argument("--first", type=str, default="",
+                        help="Configuration under test, e.g. depth=4,movetime=0.5,null_move=0. See parse_config.")
+    parser.add_argument("--second", type=str, default="", help="Configuration it is tested against.")
+    parser.add_argument("--games", type=int, default=20, help="Number of games, best even.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes the games are played in.")
+    parser.add_argument("--openings", type=str, default=None, help="File of FEN or EPD opening positions.")
+    parser.add_argument("--elo0", type=float, default=0.0, help="Elo difference of the SPRT null hypothesis.")
+    parser.add_argument("--elo1", type=float, default=5.0, help="Elo difference of the SPRT alternative hypothesis.")
+    parser.add_argument("--pgn", type=str, default="selfplay.pgn", help="PGN file to write the games to.")
+    parser.add_argument("--json", type=str, default="selfplay.json", help="JSON file to write the summary to.")
+    args = parser.parse_args()
+
+    first, second = parse_config(args.first, "first"), parse_config(args.second, "second")
+    openings = load_openings(args.openings) if args.openings else DEFAULT_OPENINGS
+    results, summary = run_tournament(first, second, args.games, openings, args.workers, args.elo0, args.elo1)
+    write_pgn(results, args.pgn)
+    with open(args.json, "w") as f:
+        # an Elo bound is infinite while one side has scored every point, which JSON has no number for
+        json.dump({key: value if not isinstance(value, float) or math.isfinite(value) else None
+                   for key, value in summary.items()}, f, indent=2)
+
+    print(f"first vs second: +{summary['wins']} ={summary['draws']} -{summary['losses']}, "
+          f"score {summary['score']:.1%}, Elo {summary['elo']:.1f} "
+          f"[{summary['elo_lower']:.1f}, {summary['elo_upper']:.1f}]")
+    print(f"SPRT elo0={args.elo0} elo1={args.elo1}: LLR {summary['sprt']['llr']:.2f} "
+          f"[{summary['sprt']['lower']:.2f}, {summary['sprt']['upper']:.2f}], {summary['sprt']['verdict']}")
+    for name, engine in summary["engines"].items():
+        print(f"{name}: {engine['time_per_move']:.3f}s and {engine['nodes_per_move']:.0f} nodes per move")
+    print(f"{args.games} games in {summary['time']:.1f}s, PGN written to {args.pgn}, summary to {args.json}")
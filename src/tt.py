@@ -0,0 +1,253 @@
+import mmap
+import os
+import struct
+import time
+import zlib
+import chess
+import chess.polyglot
+
+# Transposition table keyed by Zobrist hashes, as described at
+# https://www.chessprogramming.org/Transposition_Table
+# Entries are packed into a flat buffer so the table has a fixed memory footprint.
+
+EXACT = 0  # score is the true minimax value of the position
+LOWER = 1  # search failed high, the true value is at least the score
+UPPER = 2  # search failed low, the true value is at most the score
+
+# key (u64), score (i32), depth (u8), bound + generation (u8), move (u16) -> 16 bytes
+ENTRY = struct.Struct("<QiBBH")
+ENTRY_SIZE = ENTRY.size
+# each bucket holds a depth-preferred slot followed by an always-replace slot
+BUCKET_SIZE = 2 * ENTRY_SIZE
+
+DEFAULT_SIZE_MB = 16
+
+# persistent table files: a header page, then the entries exactly as they are laid out in memory
+TT_FILE_VERSION = 1  # bump when the entry layout or the meaning of stored scores changes
+FILE_MAGIC = b"CBTT"
+FILE_HEADER = struct.Struct("<4sHBxQI")  # magic, version, generation, number of buckets, CRC-32 of the entries
+FILE_HEADER_SIZE = mmap.ALLOCATIONGRANULARITY  # the entries are mapped from an offset the OS can map at
+
+
+# Polyglot random number of each [color][piece type][square]
+PIECE_KEYS = [[[0] * 64] + [[chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + square]
+                             for square in chess.SQUARES] for piece_type in chess.PIECE_TYPES]
+              for color in (chess.BLACK, chess.WHITE)]
+TURN_KEY = chess.polyglot.POLYGLOT_RANDOM_ARRAY[780]
+
+
+def zobrist_key(board: chess.Board) -> int:
+    """Zobrist hash of the position, compatible with Polyglot opening books."""
+    return chess.polyglot.zobrist_hash(board)
+
+
+class TranspositionTable:
+    """
+    Bounded hash table of search results.
+
+    Every bucket has two slots. The first slot is depth-preferred: it is only replaced by a search of equal
+    or greater depth, or by any search once the stored entry is from an older search.
+    The second slot is always replaced, so recent shallow results are kept too.
+
+    Args:
+        size_mb (float): Size of the table in megabytes.
+    """
+
+    def __init__(self, size_mb: float = DEFAULT_SIZE_MB):
+        self.size_mb = size_mb
+        self.num_buckets = max(1, int(size_mb * 1024 * 1024) // BUCKET_SIZE)
+        self.generation = 0
+        self.data = self._allocate(self.num_buckets * BUCKET_SIZE)
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def _allocate(self, size: int):
+        return bytearray(size)
+
+    def new_search(self):
+        """Age the table, so entries from previous searches become replaceable."""
+        self.generation = (self.generation + 1) & 63
+
+    def clear(self):
+        """Empty the table and reset its counters."""
+        self.data[:] = bytes(len(self.data))
+        self.generation = 0
+        self.reset_stats()
+
+    def load_file(self, path: str) -> bool:
+        """
+        Copy the entries of a PersistentTranspositionTable file of the same size into this table. The file is only
+        read, and its checksum is not checked: the process that owns it keeps writing to it between flushes.
+        A torn entry can only give a wrong score or a move that is checked for legality before it is searched.
+
+        Args:
+            path (str): Table file.
+
+        Returns:
+            bool: Whether the entries were copied.
+        """
+        size = self.num_buckets * BUCKET_SIZE
+        with open(path, "rb") as f:
+            header = f.read(FILE_HEADER.size)
+            if len(header) != FILE_HEADER.size:
+                return False
+            magic, version, generation, num_buckets, _ = FILE_HEADER.unpack(header)
+            if magic != FILE_MAGIC or version != TT_FILE_VERSION or num_buckets != self.num_buckets:
+                return False
+            f.seek(FILE_HEADER_SIZE)
+            entries = f.read(size)
+        if len(entries) != size:
+            return False
+        self.data[:] = entries
+        self.generation = generation
+        return True
+
+    def reset_stats(self):
+        self.hits = self.misses = self.collisions = self.stores = 0
+
+    def probe(self, key: int) -> tuple[int, int, int, int | None] | None:
+        """
+        Look up a position.
+
+        Args:
+            key (int): Zobrist key of the position.
+
+        Returns:
+            tuple | None: (depth, score, bound, best move as a position.py int move) if the position is stored,
+                otherwise None.
+        """
+        offset = (key % self.num_buckets) * BUCKET_SIZE
+        occupied = False
+        for slot in (offset, offset + ENTRY_SIZE):
+            stored_key, score, depth, flags, move = ENTRY.unpack_from(self.data, slot)
+            if stored_key == key:
+                self.hits += 1
+                return depth, score, flags & 3, move or None
+            if stored_key:
+                occupied = True
+
+        self.misses += 1
+        if occupied:
+            self.collisions += 1  # the bucket is in use by other positions
+        return None
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int | None):
+        """
+        Store a search result, following the depth-preferred / always-replace policy.
+
+        Args:
+            key (int): Zobrist key of the position.
+            depth (int): Remaining depth the position was searched to.
+            score (int): Score of the position.
+            bound (int): EXACT, LOWER or UPPER.
+            move (int | None): Best move found as a position.py int move, if any. The encoding fits in 16 bits.
+        """
+        offset = (key % self.num_buckets) * BUCKET_SIZE
+        stored_key, _, stored_depth, flags, stored_move = ENTRY.unpack_from(self.data, offset)
+
+        if stored_key == 0 or stored_key == key or depth >= stored_depth or (flags >> 2) != self.generation:
+            slot = offset
+            if stored_key == key and move is None:
+                move = stored_move  # keep the known best move of the position
+        else:
+            slot = offset + ENTRY_SIZE
+
+        depth = min(max(depth, 0), 255)
+        ENTRY.pack_into(self.data, slot, key, int(score), depth, bound | (self.generation << 2), move or 0)
+        self.stores += 1
+
+    def hashfull(self) -> int:
+        """Permille of sampled slots written during the current search, as reported by UCI engines."""
+        sample = min(self.num_buckets, 500)
+        used = 0
+        for bucket in range(sample):
+            for slot in (bucket * BUCKET_SIZE, bucket * BUCKET_SIZE + ENTRY_SIZE):
+                stored_key, _, _, flags, _ = ENTRY.unpack_from(self.data, slot)
+                if stored_key and (flags >> 2) == self.generation:
+                    used += 1
+        return used * 1000 // (sample * 2)
+
+    def stats(self) -> dict:
+        """Hit, miss and collision counters, used for sizing the table."""
+        probes = self.hits + self.misses
+        return {
+            "size_mb": self.size_mb,
+            "entries": self.num_buckets * 2,
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "hit_rate": self.hits / probes if probes else 0.0,
+            "hashfull": self.hashfull(),
+        }
+
+
+class PersistentTranspositionTable(TranspositionTable):
+    """
+    Transposition table kept in a memory-mapped file, so a new process starts from the entries of the previous
+    games instead of an empty table. The file has a version header and a CRC-32 of the entries, written by flush.
+    A file of another version or size, or whose entries changed after the last flush (the process was killed
+    mid-search), is not trusted: the table starts empty and the file is overwritten.
+
+    Args:
+        path (str): File backing the table, created if it does not exist.
+        size_mb (float): Size of the table in megabytes.
+    """
+
+    def __init__(self, path: str, size_mb: float = DEFAULT_SIZE_MB):
+        self.path = path
+        self.warm = False  # whether the entries of the file were loaded
+        self.load_error = None  # why the file was not loaded, None if it was or did not exist
+        self.load_time = 0.0
+        super().__init__(size_mb)
+
+    def _allocate(self, size: int) -> mmap.mmap:
+        t0 = time.perf_counter()
+        self.file = open(self.path, "r+b" if os.path.exists(self.path) else "w+b")
+        header = self.file.read(FILE_HEADER.size)
+        crc = None
+        if len(header) == FILE_HEADER.size:
+            magic, version, generation, num_buckets, crc = FILE_HEADER.unpack(header)
+            if magic != FILE_MAGIC or version != TT_FILE_VERSION:
+                self.load_error = f"not a version {TT_FILE_VERSION} table file"
+            elif num_buckets != self.num_buckets or os.path.getsize(self.path) != FILE_HEADER_SIZE + size:
+                self.load_error = f"table size is {num_buckets * BUCKET_SIZE / (1024 * 1024):g} MB"
+        elif header:
+            self.load_error = "not a table file"
+
+        if header and self.load_error is None:
+            data = mmap.mmap(self.file.fileno(), size, offset=FILE_HEADER_SIZE)
+            if zlib.crc32(data) == crc:
+                self.warm = True
+                self.generation = generation
+            else:
+                self.load_error = "entries do not match the checksum"
+                data.close()
+        if not self.warm:
+            self.file.truncate(0)
+            self.file.truncate(FILE_HEADER_SIZE + size)  # zero filled, so every slot is empty
+            data = mmap.mmap(self.file.fileno(), size, offset=FILE_HEADER_SIZE)
+        self.load_time = time.perf_counter() - t0
+        return data
+
+    def flush(self):
+        """Write the checksum of the current entries and flush the table to disk."""
+        self.data.flush()
+        self.file.seek(0)
+        self.file.write(FILE_HEADER.pack(FILE_MAGIC, TT_FILE_VERSION, self.generation, self.num_buckets,
+                                         zlib.crc32(self.data)))
+        self.file.flush()
+
+    def close(self):
+        """Flush and unmap the table. It cannot be used afterwards."""
+        self.flush()
+        self.data.close()
+        self.file.close()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["warm"] = self.warm
+        stats["load_time"] = self.load_time
+        return stats
@@ -0,0 +1,85 @@
+import unittest
+import chess
+import chess.engine
+import chess.pgn
+import chess.polyglot
+# the module instances analyse uses, so its engine pool can be set to fake engines
+import analyse
+from engines import EnginePool, EvalCache
+from tests.engines_unittest import FakeEngine
+
+
+def fake_game() -> chess.Board:
+    """A game in which White plays the fake engine's best move every other move."""
+    board = chess.Board()
+    for ply in range(16):
+        moves = sorted(board.legal_moves, key=chess.Move.uci)
+        if ply % 4 == 0:
+            board.push(FakeEngine().play(board, analyse.ACPL_LIMIT).move)
+        else:
+            board.push(moves[ply % len(moves)])
+    return board
+
+
+class AnalyseGameTest(unittest.TestCase):
+    def setUp(self):
+        self.board = fake_game()
+        self.engines = [FakeEngine() for _ in range(2)]
+        analyse._engine_pool = EnginePool(self.engines)
+        self.white_moves = []  # (position before, move)
+        replay = self.board.root()
+        for move in self.board.move_stack:
+            if replay.turn == chess.WHITE:
+                self.white_moves.append((replay.copy(), move))
+            replay.push(move)
+
+    def tearDown(self):
+        analyse.close_engine_pool()
+
+    def searched(self) -> list[int]:
+        return [key for engine in self.engines for key in engine.positions]
+
+    # analyse_game()
+    ## NORMAL - the same results as the separate best move, blunder and ACPL analyses
+    def test_matches_separate_analyses(self):
+        pgn = str(chess.pgn.Game.from_board(self.board))
+        best_move_count = analyse.analyse_best_move(pgn, limit=analyse.ACPL_LIMIT, engines=2)
+        blunder_count = analyse.analyse_blunders(pgn)
+        acpl = [analyse.generate_ACPL(before.copy(), move, FakeEngine()) for before, move in self.white_moves]
+        for engine in self.engines:
+            engine.positions.clear()
+
+        analysis = analyse.analyse_game(self.board, engines=2)
+        self.assertGreater(best_move_count, 0)
+        self.assertEqual(analysis, {"bestMoveCount": best_move_count, "blunderCount": blunder_count, "acpl": acpl})
+        self.assertEqual(len(self.searched()), len(set(self.searched())), "Each position is searched once")
+
+    ## BOUNDARY - positions already in the cache are not sent to the engines
+    def test_cached_positions(self):
+        cache = EvalCache()
+        cached = set()
+        for before, move in self.white_moves[::2]:
+            cache.put(before, analyse.ACPL_LIMIT, FakeEngine().analyse(before, analyse.ACPL_LIMIT))
+            cached.add(chess.polyglot.zobrist_hash(before))
+        uncached = analyse.analyse_game(self.board, EvalCache(), engines=2)
+        for engine in self.engines:
+            engine.positions.clear()
+
+        self.assertEqual(analyse.analyse_game(self.board, cache, engines=2), uncached)
+        self.assertFalse(cached & set(self.searched()), "A cached position should not be searched")
+        self.assertEqual(len(self.searched()), 2 * len(self.white_moves) - len(cached))
+
+    ## INVALID - a cached analysis without a best move does not count as agreeing
+    def test_analysis_without_pv(self):
+        cache = EvalCache()
+        for before, _ in self.white_moves:
+            info = FakeEngine().analyse(before, analyse.ACPL_LIMIT)
+            info["pv"] = []
+            cache.put(before, analyse.ACPL_LIMIT, info)
+        analysis = analyse.analyse_game(self.board, cache, engines=2)
+        self.assertEqual(analysis["bestMoveCount"], 0)
+        self.assertEqual(len(analysis["acpl"]), len(self.white_moves))
+
+
+if __name__ == '__main__':
+    unittest.main()
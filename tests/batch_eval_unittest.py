@@ -0,0 +1,59 @@
+import unittest
+import chess
+from src.eval import evaluate_board, move_value, check_end_game
+from src.batch_eval import evaluate_boards, evaluate_game, move_values, ordered_moves
+from src.movegen import get_ordered_moves
+
+
+class BatchEvalTest(unittest.TestCase):
+    def setUp(self):
+        self.fens = [
+            chess.STARTING_FEN,
+            "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+            "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1",  # en passant, end game
+            "1n2k3/P7/8/8/8/8/8/4K3 w - - 0 1",  # promotion
+            "r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1",  # castling, black to move
+        ]
+        self.boards = [chess.Board(fen) for fen in self.fens]
+
+    ## evaluate_boards()
+    # NORMAL
+    def test_evaluate_boards_matches_scalar(self):
+        scores = evaluate_boards(self.boards)
+        self.assertEqual(list(scores), [evaluate_board(board) for board in self.boards])
+
+    # BOUNDARY
+    def test_evaluate_boards_empty(self):
+        self.assertEqual(len(evaluate_boards([])), 0)
+
+    # FURTHER
+    def test_evaluate_game(self):
+        board = chess.Board()
+        for san in ["e4", "e5", "Nf3", "Nc6", "Bb5"]:
+            board.push_san(san)
+        scores = evaluate_game(board)
+        self.assertEqual(len(scores), 6)
+        self.assertEqual(scores[-1], evaluate_board(board))
+
+    ## move_values()
+    # NORMAL
+    def test_move_values_matches_scalar(self):
+        for board in self.boards:
+            end_game = check_end_game(board)
+            moves = list(board.legal_moves)
+            expected = [move_value(board, move, end_game) for move in moves]
+            self.assertEqual(list(move_values(board, moves, end_game)), expected, board.fen())
+
+    # FURTHER - same ordering as the search's move ordering
+    def test_ordered_moves_matches_get_ordered_moves(self):
+        for board in self.boards:
+            self.assertEqual(ordered_moves(board), get_ordered_moves(board), board.fen())
+
+    # INVALID
+    def test_move_values_no_piece(self):
+        with self.assertRaises(Exception):
+            move_values(chess.Board(), [chess.Move.from_uci("e4e5")])
+
+
+if __name__ == '__main__':
+    unittest.main()
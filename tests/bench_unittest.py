@@ -0,0 +1,50 @@
+import unittest
+import chess
+from src.bench import bench_perft, bench_search, compare, SUITE_VERSION
+
+
+class BenchTest(unittest.TestCase):
+    def setUp(self):
+        self.baseline = {"version": SUITE_VERSION, "metrics": {"search_nps": 1000.0, "search_time": 2.0}}
+
+    # compare()
+    ## NORMAL - a rate that drops, or a time that grows, beyond the tolerance is a regression
+    def test_compare_regressions(self):
+        results = {"metrics": {"search_nps": 800.0, "search_time": 2.5}}
+        regressions = compare(results, self.baseline, tolerance=0.1)
+        self.assertEqual([regression["name"] for regression in regressions], ["search_nps", "search_time"])
+        self.assertAlmostEqual(regressions[0]["change"], -0.2)
+
+    ## BOUNDARY - changes within the tolerance, and improvements, pass
+    def test_compare_within_tolerance(self):
+        results = {"metrics": {"search_nps": 950.0, "search_time": 1.0, "new_metric": 1.0}}
+        self.assertEqual(compare(results, self.baseline, tolerance=0.1), [])
+
+    ## INVALID - a baseline from another version of the suite
+    def test_compare_other_version(self):
+        with self.assertRaises(Exception):
+            compare({"metrics": {}}, {"version": SUITE_VERSION + 1, "metrics": {}})
+
+    # bench_perft()
+    ## NORMAL
+    def test_bench_perft(self):
+        results = bench_perft([(chess.STARTING_FEN, 2, 400)])
+        self.assertEqual(results["chess.Board"]["nodes"], 400)
+        self.assertEqual(results["Position"]["nodes"], 400)
+
+    ## INVALID - a wrong leaf count fails the benchmark
+    def test_bench_perft_wrong_count(self):
+        with self.assertRaises(Exception):
+            bench_perft([(chess.STARTING_FEN, 2, 401)])
+
+    # bench_search()
+    ## NORMAL - node counts of a fixed depth search are repeatable
+    def test_bench_search(self):
+        first = bench_search(2, [chess.STARTING_FEN])
+        second = bench_search(2, [chess.STARTING_FEN])
+        self.assertGreater(first["nodes"], 0)
+        self.assertEqual(first["nodes"], second["nodes"])
+
+
+if __name__ == '__main__':
+    unittest.main()
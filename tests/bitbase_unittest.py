@@ -0,0 +1,97 @@
+import unittest
+import os
+import tempfile
+import chess
+from src.bitbase import Bitbase, verify
+from src import movegen
+
+
+class BitbaseTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "bitbase.bin")
+        cls.bitbase = Bitbase.generate()
+        cls.bitbase.save(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        movegen.set_bitbase(None)
+        cls.directory.cleanup()
+
+    # Bitbase.probe()
+    ## NORMAL - known KPK results, from the side to move
+    def test_probe_kpk(self):
+        self.assertEqual(self.bitbase.probe(chess.Board("4k3/8/8/4K3/4P3/8/8/8 w - - 0 1")), 1)
+        self.assertEqual(self.bitbase.probe(chess.Board("4k3/8/8/4K3/4P3/8/8/8 b - - 0 1")), 0,
+                         "The lone king to move takes the opposition")
+        self.assertEqual(self.bitbase.probe(chess.Board("4k3/8/4K3/4P3/8/8/8/8 b - - 0 1")), -1)
+        self.assertEqual(self.bitbase.probe(chess.Board("8/8/8/8/8/4k3/4P3/4K3 w - - 0 1")), 0)
+        self.assertEqual(self.bitbase.probe(chess.Board("8/8/8/8/8/4k3/4P3/4K3 b - - 0 1")), 0)
+        self.assertEqual(self.bitbase.probe(chess.Board("7k/8/8/8/6KP/8/8/8 w - - 0 1")), 0,
+                         "The rook pawn draws with the lone king in front of it")
+
+    ## NORMAL - the colour flipped position has the same result
+    def test_probe_black_piece(self):
+        board = chess.Board("8/8/8/8/2P5/K7/8/k7 w - - 0 1")
+        self.assertEqual(self.bitbase.probe(board), 1)
+        self.assertEqual(self.bitbase.probe(board.mirror()), 1)
+        self.assertEqual(self.bitbase.probe(chess.Board("8/8/8/8/8/8/8/K1k1q3 w - - 0 1")), -1)
+
+    ## BOUNDARY - stalemate, and a piece the lone king can capture, are draws
+    def test_probe_draws(self):
+        self.assertEqual(self.bitbase.probe(chess.Board("k7/2Q5/1K6/8/8/8/8/8 b - - 0 1")), 0)
+        self.assertEqual(self.bitbase.probe(chess.Board("k7/1R6/8/8/8/8/8/7K b - - 0 1")), 0)
+        self.assertEqual(self.bitbase.probe(chess.Board("K7/1r6/8/8/8/8/8/7k w - - 0 1")), 0)
+
+    ## INVALID - positions without a table
+    def test_probe_no_table(self):
+        self.assertIsNone(self.bitbase.probe(chess.Board()))
+        self.assertIsNone(self.bitbase.probe(chess.Board("k7/8/8/8/8/8/8/1N5K w - - 0 1")))
+        self.assertIsNone(self.bitbase.probe(chess.Board("4k3/8/8/8/8/8/8/R3K3 w Q - 0 1")))
+
+    # verify()
+    ## NORMAL - sampled positions agree with python-chess move generation
+    def test_verify(self):
+        self.assertGreater(verify(self.bitbase, samples=2000), 4000)
+
+    # Bitbase.load()
+    ## NORMAL - a saved file loads back to the same tables
+    def test_load(self):
+        self.assertEqual(Bitbase.load(self.path).tables, self.bitbase.tables)
+
+    ## INVALID - a file of another format, or a corrupt table, is rejected
+    def test_load_corrupt(self):
+        path = os.path.join(self.directory.name, "corrupt.bin")
+        with open(self.path, "rb") as f:
+            data = bytearray(f.read())
+        data[-1] ^= 0xFF
+        with open(path, "wb") as f:
+            f.write(data)
+        with self.assertRaises(Exception):
+            Bitbase.load(path)
+        with open(path, "wb") as f:
+            f.write(b"not a bitbase")
+        with self.assertRaises(Exception):
+            Bitbase.load(path)
+
+    # movegen.search_move() with a bitbase
+    ## NORMAL - only moves keeping the win are searched, and the search scores the win
+    def test_search_move_uses_bitbase(self):
+        movegen.set_bitbase(self.path)
+        board = chess.Board("8/8/8/8/2P5/K7/8/k7 w - - 0 1")
+        move, stats = movegen.search_move(3, board)
+        board.push(move)
+        self.assertEqual(self.bitbase.probe(board), -1)
+        self.assertGreater(stats.score, movegen.KNOWN_WIN)
+        self.assertGreater(stats.bitbase_hits, 0)
+
+    ## FURTHER TESTING - a winning promotion is played straight away
+    def test_search_move_promotes(self):
+        movegen.set_bitbase(self.path)
+        move, _ = movegen.search_move(4, chess.Board("8/2P5/8/8/8/K7/8/k7 w - - 0 1"))
+        self.assertEqual(move, chess.Move.from_uci("c7c8q"))
+
+
+if __name__ == '__main__':
+    unittest.main()
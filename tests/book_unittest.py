@@ -0,0 +1,120 @@
+import unittest
+import os
+import tempfile
+import chess
+import chess.polyglot
+from src.book import OpeningBook, build_book, encode_book_move
+from src import movegen
+
+GAMES = """[Event "a"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. O-O Nf6 (4... d6 5. c3) 5. d3 O-O 1-0
+
+[Event "b"]
+[Result "0-1"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 4. Ba4 Nf6 5. O-O Be7 0-1
+
+[Event "c"]
+[Result "1/2-1/2"]
+
+1. d4 d5 2. c4 e6 3. Nc3 Nf6 1/2-1/2
+
+[Event "d"]
+[Result "*"]
+
+1. e4 c5 2. Nf3 Qxz9 3. d4 *
+"""
+
+
+class BookTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.pgn_path = os.path.join(self.directory.name, "games.pgn")
+        self.book_path = os.path.join(self.directory.name, "book.bin")
+        with open(self.pgn_path, "w") as f:
+            f.write(GAMES)
+
+    def tearDown(self):
+        movegen.set_book(None)
+        self.directory.cleanup()
+
+    # build_book()
+    ## NORMAL - moves are weighted by how often they were played
+    def test_build_book(self):
+        summary = build_book(self.pgn_path, self.book_path, max_ply=10)
+        self.assertEqual(summary["games"], 4)
+        with chess.polyglot.open_reader(self.book_path) as reader:
+            entries = [(entry.move.uci(), entry.weight) for entry in reader.find_all(chess.Board())]
+            self.assertEqual(entries, [("e2e4", 2), ("d2d4", 1)], "The game with an illegal move is dropped")
+            keys = [entry.key for entry in reader]
+            self.assertEqual(keys, sorted(keys), "Entries should be sorted by key for binary search")
+
+    ## BOUNDARY - the same book is written when the counts are spilled to disk in many runs
+    def test_build_book_in_runs(self):
+        build_book(self.pgn_path, self.book_path, max_ply=10)
+        with open(self.book_path, "rb") as f:
+            in_memory = f.read()
+        summary = build_book(self.pgn_path, self.book_path, max_ply=10, max_positions=3)
+        self.assertGreater(summary["runs"], 1)
+        with open(self.book_path, "rb") as f:
+            self.assertEqual(f.read(), in_memory)
+        self.assertEqual([name for name in os.listdir(self.directory.name) if name.endswith(".run")], [])
+
+    ## BOUNDARY - only the first max_ply plies and the main line are included, and min_count filters moves
+    def test_build_book_limits(self):
+        build_book(self.pgn_path, self.book_path, max_ply=2, min_count=2)
+        with chess.polyglot.open_reader(self.book_path) as reader:
+            self.assertEqual(sorted(entry.move.uci() for entry in reader), ["e2e4", "e7e5"])
+
+    ## INVALID - a game with an illegal move adds none of its moves, not even those before the illegal one
+    def test_build_book_illegal_move(self):
+        with open(self.pgn_path, "w") as f:
+            f.write(GAMES[GAMES.index('[Event "d"]'):])
+        summary = build_book(self.pgn_path, self.book_path, max_ply=10)
+        self.assertEqual(summary["games"], 1)
+        self.assertEqual(summary["entries"], 0)
+
+    ## FURTHER TESTING - castling is written in Polyglot's king takes rook form and read back as a castling move
+    def test_castling_entry(self):
+        board = chess.Board("r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4")
+        self.assertEqual(encode_book_move(board, chess.Move.from_uci("e1g1")), chess.H1 | (chess.E1 << 6))
+        build_book(self.pgn_path, self.book_path, max_ply=10)
+        self.assertEqual(OpeningBook(self.book_path).moves(board), [(chess.Move.from_uci("e1g1"), 1)])
+
+    # OpeningBook.probe()
+    ## NORMAL
+    def test_probe(self):
+        build_book(self.pgn_path, self.book_path)
+        book = OpeningBook(self.book_path, seed=1)
+        moves = {book.probe(chess.Board()) for _ in range(50)}
+        self.assertEqual(moves, {chess.Move.from_uci("e2e4"), chess.Move.from_uci("d2d4")})
+        self.assertIsNone(book.probe(chess.Board("8/8/4k3/8/8/3KR3/8/8 w - - 0 1")))
+        self.assertEqual((book.hits, book.misses), (50, 1))
+
+    ## INVALID
+    def test_invalid_book_file(self):
+        with open(self.book_path, "wb") as f:
+            f.write(b"not a book")
+        with self.assertRaises(Exception):
+            OpeningBook(self.book_path)
+
+    # movegen.search_move() with a book
+    ## NORMAL - book moves are played without a search, and the search takes over when the book ends
+    def test_search_move_uses_book(self):
+        build_book(self.pgn_path, self.book_path)
+        movegen.set_book(self.book_path, seed=0)
+        board = chess.Board()
+        move, stats = movegen.search_move(2, board)
+        self.assertIn(move.uci(), ("e2e4", "d2d4"))
+        self.assertTrue(stats.book_move)
+        self.assertEqual(stats.nodes, 0)
+        board = chess.Board("8/8/4k3/8/8/3KR3/8/8 w - - 0 1")
+        move, stats = movegen.search_move(2, board)
+        self.assertFalse(stats.book_move)
+        self.assertGreater(stats.nodes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+import time
+import chess
+import chess.engine
+import chess.polyglot
+from src.engines import EnginePool, EvalCache, PersistentEvalCache, limit_covers
+
+
+class FakeEngine:
+    """Stands in for a Stockfish process: its results only depend on the position, and it records its calls."""
+
+    def __init__(self):
+        self.games = []
+        self.positions = []  # Zobrist hash of every position searched
+        self.quit_called = False
+
+    def _search(self, board: chess.Board, game) -> int:
+        self.games.append(game)
+        self.positions.append(chess.polyglot.zobrist_hash(board))
+        time.sleep(0.001 * (3 - len(board.move_stack) % 4))  # earlier positions finish later
+        return chess.polyglot.zobrist_hash(board)
+
+    def play(self, board: chess.Board, limit: chess.engine.Limit, game=None) -> chess.engine.PlayResult:
+        moves = sorted(board.legal_moves, key=chess.Move.uci)
+        return chess.engine.PlayResult(moves[self._search(board, game) % len(moves)], None)
+
+    def analyse(self, board: chess.Board, limit: chess.engine.Limit, game=None) -> chess.engine.InfoDict:
+        key = self._search(board, game)
+        moves = sorted(board.legal_moves, key=chess.Move.uci)
+        return {"score": chess.engine.PovScore(chess.engine.Cp(key % 201 - 100), board.turn),
+                "pv": [moves[key % len(moves)]], "depth": limit.depth}
+
+    def quit(self):
+        self.quit_called = True
+
+
+def game_positions() -> list[chess.Board]:
+    board = chess.Board()
+    boards = [board.copy()]
+    for uci in ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5", "a7a6", "b5a4", "g8f6", "e1g1", "f8e7"]:
+        board.push_uci(uci)
+        boards.append(board.copy())
+    return boards
+
+
+class EnginePoolTest(unittest.TestCase):
+    def setUp(self):
+        self.boards = game_positions()
+        self.limit = chess.engine.Limit(depth=10)
+
+    # EnginePool.map()
+    ## NORMAL - results come back in the order of the positions, whichever engine finishes first
+    def test_order(self):
+        pool = EnginePool([FakeEngine() for _ in range(3)])
+        expected = [FakeEngine().analyse(board, self.limit) for board in self.boards]
+        self.assertEqual(pool.analyse(self.boards, self.limit), expected)
+        self.assertEqual([result.move for result in pool.play(self.boards, self.limit)],
+                         [FakeEngine().play(board, self.limit).move for board in self.boards])
+        pool.close()
+
+    ## NORMAL - every search is sent as a new game
+    def test_new_game_per_position(self):
+        engines = [FakeEngine() for _ in range(3)]
+        pool = EnginePool(engines)
+        pool.analyse(self.boards, self.limit)
+        games = [game for engine in engines for game in engine.games]
+        self.assertEqual(len(games), len(self.boards))
+        self.assertEqual(len({id(game) for game in games}), len(self.boards))
+        self.assertNotIn(None, games)
+        pool.close()
+
+    ## BOUNDARY - one engine and several engines give the same results
+    def test_pool_sizes(self):
+        single, several = EnginePool([FakeEngine()]), EnginePool([FakeEngine() for _ in range(4)])
+        self.assertEqual(single.analyse(self.boards, self.limit), several.analyse(self.boards, self.limit))
+        self.assertEqual([result.move for result in single.play(self.boards, self.limit)],
+                         [result.move for result in several.play(self.boards, self.limit)])
+        single.close()
+        several.close()
+
+    # EnginePool.start()/close()
+    ## INVALID - a pool without engines
+    def test_start_empty(self):
+        with self.assertRaises(Exception):
+            EnginePool.start(0)
+
+    ## FURTHER TESTING - engines passed in keep running after close
+    def test_close_keep(self):
+        kept, started = FakeEngine(), FakeEngine()
+        pool = EnginePool.start(2, [kept, started])
+        pool.close(keep=[kept])
+        self.assertEqual((kept.quit_called, started.quit_called), (False, True))
+
+
+class EvalCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = EvalCache()
+        self.board = chess.Board()
+        self.info = {"score": chess.engine.PovScore(chess.engine.Cp(30), chess.WHITE),
+                     "pv": [chess.Move.from_uci("e2e4")]}
+
+    # limit_covers()
+    ## NORMAL
+    def test_limit_covers(self):
+        self.assertTrue(limit_covers(chess.engine.Limit(depth=15), chess.engine.Limit(depth=15)))
+        self.assertTrue(limit_covers(chess.engine.Limit(depth=15), chess.engine.Limit(depth=10)))
+        self.assertFalse(limit_covers(chess.engine.Limit(depth=10), chess.engine.Limit(depth=15)))
+
+    ## BOUNDARY - limits of different kinds do not compare
+    def test_limit_covers_other_kind(self):
+        self.assertFalse(limit_covers(chess.engine.Limit(depth=15), chess.engine.Limit(time=0.5)))
+        self.assertFalse(limit_covers(chess.engine.Limit(depth=15), chess.engine.Limit()))
+
+    # EvalCache.get()/put()
+    ## NORMAL - a position is found at the same or a lower limit, also after a transposition
+    def test_get(self):
+        self.cache.put(self.board, chess.engine.Limit(depth=15), self.info)
+        self.assertIs(self.cache.get(chess.Board(), chess.engine.Limit(depth=12)), self.info)
+        board = chess.Board()
+        for uci in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+            board.push_uci(uci)
+        self.assertIs(self.cache.get(board, chess.engine.Limit(depth=15)), self.info)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 0))
+
+    ## BOUNDARY - a deeper request misses, and a shallower analysis does not replace a deeper one
+    def test_get_deeper(self):
+        self.cache.put(self.board, chess.engine.Limit(depth=15), self.info)
+        self.assertIsNone(self.cache.get(self.board, chess.engine.Limit(depth=20)))
+        self.cache.put(self.board, chess.engine.Limit(depth=5), {"pv": []})
+        self.assertIs(self.cache.get(self.board, chess.engine.Limit(depth=15)), self.info)
+        self.assertEqual(len(self.cache), 1)
+
+    ## INVALID - an unknown position
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get(self.board, chess.engine.Limit(depth=1)))
+        self.assertEqual(self.cache.misses, 1)
+
+
+class PersistentEvalCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "evals.sqlite")
+        self.board = chess.Board()
+        self.info = {"score": chess.engine.PovScore(chess.engine.Cp(-30), chess.BLACK),
+                     "pv": [chess.Move.from_uci("e2e4")], "depth": 15}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # PersistentEvalCache.get()/put()
+    ## NORMAL - an analysis is found by the next process, at the same or a lower limit
+    def test_reuse_after_restart(self):
+        cache = PersistentEvalCache(self.path)
+        cache.put(self.board, chess.engine.Limit(depth=15), self.info)
+        cache.close()
+        cache = PersistentEvalCache(self.path)
+        info = cache.get(chess.Board(), chess.engine.Limit(depth=12))
+        self.assertEqual(info["score"].white(), chess.engine.Cp(30))
+        self.assertEqual((info["pv"], info["depth"]), ([chess.Move.from_uci("e2e4")], 15))
+        self.assertIsNone(cache.get(chess.Board(), chess.engine.Limit(depth=20)))
+        self.assertIsNone(cache.get(chess.Board(), chess.engine.Limit(time=0.5)))
+        self.assertEqual((cache.hits, cache.store_hits, cache.misses), (1, 1, 2))
+        cache.close()
+
+    ## BOUNDARY - mate scores are kept, and a shallower analysis does not replace a deeper one
+    def test_mate_and_depth(self):
+        board = chess.Board("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        cache = PersistentEvalCache(self.path)
+        mate = {"score": chess.engine.PovScore(chess.engine.Mate(1), chess.WHITE), "pv": [chess.Move.from_uci("a1a8")]}
+        cache.put(board, chess.engine.Limit(depth=15), mate)
+        cache.put(board, chess.engine.Limit(depth=5), {"score": chess.engine.PovScore(chess.engine.Cp(0), chess.WHITE)})
+        cache.close()
+        info = PersistentEvalCache(self.path).get(board, chess.engine.Limit(depth=15))
+        self.assertEqual(info["score"].white(), chess.engine.Mate(1))
+
+    ## BOUNDARY - the least recently used rows are evicted once the store is full
+    def test_eviction(self):
+        cache = PersistentEvalCache(self.path, max_entries=10)
+        board = chess.Board()
+        boards = []
+        for move in list(board.legal_moves)[:15]:
+            boards.append(board.copy())
+            boards[-1].push(move)
+            cache.put(boards[-1], chess.engine.Limit(depth=10), self.info)
+        self.assertIsNotNone(PersistentEvalCache(self.path).get(boards[0], chess.engine.Limit(depth=10)))
+        self.assertEqual(cache.evict(), 6)
+        self.assertEqual(cache.stored(), 9)
+        fresh = PersistentEvalCache(self.path)
+        self.assertIsNotNone(fresh.get(boards[0], chess.engine.Limit(depth=10)), "Recently read rows are kept")
+        self.assertIsNone(fresh.get(boards[1], chess.engine.Limit(depth=10)))
+        cache.close()
+
+    ## FURTHER TESTING - a reader sees the writes of another connection without blocking it
+    def test_concurrent_reader(self):
+        writer = PersistentEvalCache(self.path)
+        reader = sqlite3.connect(self.path)
+        reader.execute("BEGIN")
+        self.assertEqual(reader.execute("SELECT COUNT(*) FROM evals").fetchone()[0], 0)
+        writer.put(self.board, chess.engine.Limit(depth=15), self.info)  # does not wait for the open read
+        reader.execute("COMMIT")
+        self.assertEqual(reader.execute("SELECT COUNT(*) FROM evals").fetchone()[0], 1)
+        reader.close()
+        writer.close()
+
+    ## INVALID - a store of another schema version is rebuilt
+    def test_other_version(self):
+        cache = PersistentEvalCache(self.path)
+        cache.put(self.board, chess.engine.Limit(depth=15), self.info)
+        cache.connection.execute("PRAGMA user_version=99")
+        cache.close()
+        cache = PersistentEvalCache(self.path)
+        self.assertEqual(cache.stored(), 0)
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import tempfile
+import chess
+from src.epd_suite import load_suite, is_solution, solve_position, run_suite, compare_runs
+
+SUITE = """2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - bm Qg6; id "WAC.001";
+r1bq2rk/pp3pbp/2p1p1pQ/7P/3P4/2PB1N2/PP3PPR/2KR4 w - - bm Qxh7+; id "WAC.004";
+# a comment
+rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - id "no operations";
+rnbqkb1r/pppp1ppp/8/4P3/6n1/7P/PPPNPPP1/R1BQKBNR b KQkq - am Nxe5 Ne3; id "avoid";
+"""
+
+
+class EpdSuiteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "suite.epd")
+        with open(self.path, "w") as f:
+            f.write(SUITE)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # load_suite()
+    ## NORMAL - SAN operations are read as UCI, positions without bm or am are skipped
+    def test_load_suite(self):
+        positions = load_suite(self.path)
+        self.assertEqual([position["id"] for position in positions], ["WAC.001", "WAC.004", "avoid"])
+        self.assertEqual(positions[1]["bm"], ["h6h7"])
+        self.assertEqual(positions[2]["am"], ["g4e5", "g4e3"])
+
+    ## INVALID
+    def test_load_invalid_suite(self):
+        with open(self.path, "w") as f:
+            f.write("not an epd line bm e4;\n")
+        with self.assertRaises(Exception):
+            load_suite(self.path)
+
+    # is_solution()
+    ## BOUNDARY - moves to avoid, and no move at all, do not solve a position
+    def test_is_solution(self):
+        position = load_suite(self.path)[2]
+        self.assertFalse(is_solution(position, chess.Move.from_uci("g4e5")))
+        self.assertTrue(is_solution(position, chess.Move.from_uci("d7d6")))
+        self.assertFalse(is_solution(position, None))
+
+    # solve_position()
+    ## NORMAL - time and nodes to solution are within the search
+    def test_solve_position(self):
+        result = solve_position(load_suite(self.path)[1], depth=3)
+        self.assertTrue(result["solved"])
+        self.assertEqual(result["move"], "h6h7")
+        self.assertLessEqual(result["nodes_to_solution"], result["nodes"])
+        self.assertLessEqual(result["time_to_solution"], result["time"])
+
+    # run_suite()/compare_runs()
+    ## FURTHER TESTING - a run compared with itself is solved equally fast
+    def test_compare_runs(self):
+        positions = load_suite(self.path)[1:]
+        run = run_suite(positions, nodes=500)
+        self.assertEqual(run["total"], 2)
+        comparison = compare_runs(run, run)
+        self.assertEqual(comparison["only_first"], [])
+        self.assertEqual(comparison["both"], run["solved"])
+        if run["solved"]:
+            self.assertAlmostEqual(comparison["nodes_ratio"], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 import chess
-from src.eval import check_end_game, evaluate_piece, evaluate_capture, move_value
+from src.eval import check_end_game, evaluate_piece, evaluate_capture, move_value, evaluate_board, \
+    IncrementalEvaluator, evaluate_capture_see, static_exchange_evaluation, exchange_value
+from src.position import Position, NULL_MOVE, move_from_chess
 
 
 class EvalTest(unittest.TestCase):
@@ -97,6 +99,47 @@ class EvalTest(unittest.TestCase):
         value = evaluate_capture(self.board, move)
         self.assertIsNone(value, "Value should be None when no piece is present")
 
+    ## evaluate_capture_see()
+    # NORMAL - an undefended piece is won outright, a defended one costs the capturing piece
+    def test_capture_see_evaluation(self):
+        self.board.set_fen("4k3/8/2p5/3p4/8/8/3Q4/4K3 w - - 0 1")
+        self.assertEqual(evaluate_capture_see(self.board, chess.Move.from_uci('d2d5')), 100 - 900)
+        self.board.set_fen("4k3/8/8/3r4/8/8/3Q4/3RK3 w - - 0 1")
+        self.assertEqual(evaluate_capture_see(self.board, chess.Move.from_uci('d2d5')), 500)
+
+    # FURTHER - x-ray attackers join the exchange, and either side stops when recapturing would lose
+    def test_static_exchange_evaluation_x_ray(self):
+        self.board.set_fen("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1")
+        self.assertEqual(static_exchange_evaluation(self.board, chess.Move.from_uci('d3e5')), -220)
+        self.board.set_fen("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1")
+        self.assertEqual(static_exchange_evaluation(self.board, chess.Move.from_uci('e1e5')), 100)
+
+    ## exchange_value()
+    # NORMAL - the same exchange values on a Position, as the search computes them
+    def test_exchange_value_on_position(self):
+        for fen, uci in [("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5"),
+                         ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5d6"),
+                         ("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a7b8q")]:
+            self.board.set_fen(fen)
+            position = Position(self.board)
+            move = move_from_chess(chess.Move.from_uci(uci))
+            self.assertEqual(exchange_value(position, move & 63, (move >> 6) & 63, move >> 12,
+                                            position.is_en_passant(move)),
+                             static_exchange_evaluation(self.board, chess.Move.from_uci(uci)), fen)
+
+    # BOUNDARY - en passant and capturing promotions
+    def test_static_exchange_evaluation_special_moves(self):
+        self.board.set_fen("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1")
+        self.assertEqual(static_exchange_evaluation(self.board, chess.Move.from_uci('e5d6')), 100)
+        self.board.set_fen("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1")
+        self.assertEqual(static_exchange_evaluation(self.board, chess.Move.from_uci('a7b8q')), 500 + 800)
+
+    # INVALID
+    def test_capture_see_evaluation_no_piece(self):
+        self.board.reset()
+        with self.assertRaises(Exception):
+            evaluate_capture_see(self.board, chess.Move.from_uci('e5d6'))
+
     ## move_value()
     # NORMAL
     def test_move_value_calculation(self):
@@ -117,6 +160,48 @@ class EvalTest(unittest.TestCase):
         print("test_move_value_resulting_in_checkmate: CHECKMATE VALUE", value)
         self.assertTrue(value > 100, "Value should be extremely high (+inf) due to checkmate")
 
+    ## IncrementalEvaluator
+    # NORMAL
+    def test_incremental_matches_evaluate_board(self):
+        position = Position(self.board)
+        evaluator = IncrementalEvaluator(position, debug=True)
+        for san in ["e4", "d5", "exd5", "Qxd5", "Nc3", "Qa5", "Bc4", "Nf6", "Nf3", "Bg4", "O-O"]:
+            move = self.board.parse_san(san)
+            self.board.push(move)
+            evaluator.push(position, move_from_chess(move))
+            self.assertEqual(evaluator.evaluate(position), evaluate_board(self.board))
+        for _ in range(11):
+            evaluator.pop(position)
+        self.assertEqual(evaluator.evaluate(position), evaluate_board(chess.Board()))
+
+    # FURTHER - castling queenside, en passant, promotions and end game switches
+    def test_incremental_special_moves(self):
+        positions = [
+            ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", ["e1c1", "e8g8"]),
+            ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", ["e5d6"]),
+            ("1n2k3/P7/8/8/8/8/8/4K3 w - - 0 1", ["a7b8n", "e8d7", "b8a6"]),
+            ("3qk3/4P3/8/8/8/8/8/Q3K3 w - - 0 1", ["e7d8q", "e8d8", "a1a8"]),
+        ]
+        for fen, moves in positions:
+            board = chess.Board(fen)
+            position = Position(board)
+            evaluator = IncrementalEvaluator(position, debug=True)
+            for uci in moves:
+                move = chess.Move.from_uci(uci)
+                board.push(move)
+                evaluator.push(position, move_from_chess(move))
+                self.assertEqual(evaluator.evaluate(position), evaluate_board(board), f"{fen} after {uci}")
+                self.assertEqual(evaluator.is_end_game(), check_end_game(board), f"{fen} after {uci}")
+
+    # INVALID - a null move leaves the score unchanged
+    def test_incremental_null_move(self):
+        position = Position(self.board)
+        evaluator = IncrementalEvaluator(position)
+        before = evaluator.evaluate()
+        evaluator.push(position, NULL_MOVE)
+        self.assertEqual(evaluator.evaluate(), before)
+        evaluator.pop(position)
+
 
 if __name__ == '__main__':
     unittest.main()
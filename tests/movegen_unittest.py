@@ -1,6 +1,10 @@
 import unittest
 import chess
-from src.movegen import next_move, get_move_quality, get_ordered_moves, find_best_move_minimax, minimax
+import parallel  # the module instance next_move starts its worker pool in
+from src.movegen import next_move, get_move_quality, get_ordered_moves, find_best_move_minimax, minimax, \
+    iterative_deepening, SearchContext, search_move, set_hash_size, is_draw_by_rule, MATE_SCORE, DEFAULT_PRUNING
+from src.tt import TranspositionTable
+from src.position import move_to_chess, move_from_chess
 
 
 class MoveGenTest(unittest.TestCase):
@@ -36,6 +40,58 @@ class MoveGenTest(unittest.TestCase):
         print("test_next_move(): best_move", best_move)
         self.assertIsInstance(best_move, chess.Move, "next_move should return a chess.Move object")
 
+    # iterative_deepening()
+    ## NORMAL
+    def test_iterative_deepening_fixed_depth(self):
+        ctx = SearchContext()
+        best_move = iterative_deepening(self.board, 2, ctx)
+        self.assertIsInstance(best_move, chess.Move, "iterative_deepening should return a chess.Move object")
+        self.assertEqual(ctx.completed_depth, 2, "Without budgets every iteration should complete")
+        self.assertEqual(move_to_chess(ctx.pv[0]), best_move, "The principal variation should start with the best move")
+
+    ## BOUNDARY
+    def test_iterative_deepening_node_budget(self):
+        ctx = SearchContext(node_limit=200)
+        best_move = iterative_deepening(self.board, None, ctx)
+        self.assertIsInstance(best_move, chess.Move, "A move should be returned when the budget runs out")
+        self.assertLessEqual(ctx.nodes, 200, "Search should stop at the node budget once depth 1 completes")
+        self.assertEqual(len(self.board.move_stack), 0, "An aborted iteration should leave the board unchanged")
+
+    ## FURTHER TESTING - the incremental evaluation matches evaluate_board at every leaf
+    def test_iterative_deepening_debug_eval(self):
+        self.board.set_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        best_move = iterative_deepening(self.board, 2, SearchContext(debug_eval=True))
+        self.assertIsInstance(best_move, chess.Move, "iterative_deepening should return a chess.Move object")
+
+    # search_move()
+    ## NORMAL
+    def test_search_move_stats(self):
+        set_hash_size(16)  # an empty table, so no subtree is cut short by earlier tests
+        best_move, stats = search_move(3, self.board)
+        self.assertIsInstance(best_move, chess.Move, "search_move should return a chess.Move object")
+        self.assertEqual(stats.depth, 3)
+        self.assertEqual([iteration["depth"] for iteration in stats.iterations], [1, 2, 3])
+        self.assertEqual(stats.nodes, sum(iteration["nodes"] for iteration in stats.iterations))
+        self.assertGreaterEqual(stats.seldepth, 3)
+        self.assertEqual(stats.pv[0], best_move.uci())
+        self.assertGreater(stats.effective_branching_factor, 0)
+        self.assertIn("firstMoveCutoffRate", stats.to_dict())
+
+    ## FURTHER TESTING - parallel root splitting
+    def test_next_move_workers(self):
+        self.board.set_fen("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        try:
+            best_move = next_move(2, self.board, workers=2)
+        finally:
+            parallel.shutdown()
+        self.assertIn(best_move, self.board.legal_moves, "Parallel search should return a legal move")
+        self.assertEqual(len(self.board.move_stack), 0, "Parallel search should leave the board unchanged")
+
+    ## FURTHER TESTING
+    def test_next_move_movetime(self):
+        best_move = next_move(None, self.board, movetime=0.2)
+        self.assertIsInstance(best_move, chess.Move, "next_move should return a chess.Move object")
+
     # get_ordered_moves()
     ## NORMAL
     def test_ordered_moves_generation(self):
@@ -97,6 +153,99 @@ class MoveGenTest(unittest.TestCase):
         print("test_minimax_algorithm_stalemate(): score", score)
         self.assertEqual(score, 0, "minimax should recognize stalemate as the best outcome")
 
+    ## FURTHER TESTING - mate found from the generated move list at a leaf
+    def test_minimax_checkmate_at_leaf(self):
+        self.board.set_fen("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+        self.board.push_uci("d1d8")
+        score = minimax(0, self.board, self.alpha, self.beta, False)
+        self.assertEqual(score, 9999, "Black is checkmated, which is the best outcome for White")
+
+    # is_draw_by_rule()
+    def test_draw_by_rule(self):
+        self.assertTrue(is_draw_by_rule(chess.Board("8/8/4k3/8/8/3NK3/8/8 w - - 0 1")), "King and knight cannot mate")
+        self.assertTrue(is_draw_by_rule(chess.Board("8/8/4k3/8/8/4K3/8/R7 w - - 100 80")), "Fifty-move rule")
+        self.assertFalse(is_draw_by_rule(chess.Board("8/8/4k3/8/8/3NK3/4N3/8 w - - 0 1")))
+        self.assertFalse(is_draw_by_rule(self.board))
+
+    # selective search
+    ## NORMAL - the pruning techniques search fewer nodes
+    def test_pruning_reduces_nodes(self):
+        pruned = SearchContext(tt=TranspositionTable(16))
+        full_width = SearchContext(tt=TranspositionTable(16), pruning={name: False for name in DEFAULT_PRUNING})
+        iterative_deepening(self.board.copy(), 4, pruned)
+        iterative_deepening(self.board.copy(), 4, full_width)
+        self.assertLess(pruned.nodes, full_width.nodes)
+
+    ## NORMAL - principal variation search and aspiration windows find the moves and scores of the
+    ## full window minimax search they replaced
+    def test_pvs_matches_full_window_search(self):
+        full_width = {name: False for name in DEFAULT_PRUNING}
+        for fen, move, score in [
+            ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", "e2a6", 400),
+            ("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3", "f1b5", 150),
+            ("r1bq1rk1/pp2ppbp/2np1np1/8/3NP3/2N1BP2/PPPQ2PP/R3KB1R w KQ - 3 9", "d4c6", 150),
+        ]:
+            ctx = SearchContext(tt=TranspositionTable(16), pruning=full_width, quiescence=False)
+            self.assertEqual(iterative_deepening(chess.Board(fen), 3, ctx), chess.Move.from_uci(move), fen)
+            self.assertEqual(ctx.score, score, fen)
+
+    ## NORMAL - quiescence search sees the recapture a depth 1 search stops before
+    def test_quiescence_search(self):
+        self.board.set_fen("4k3/8/2p5/3p4/8/8/3Q4/4K3 w - - 0 1")
+        queen_takes = chess.Move.from_uci("d2d5")
+        ctx = SearchContext(tt=TranspositionTable(1), quiescence=False)
+        self.assertEqual(iterative_deepening(self.board, 1, ctx), queen_takes)
+        ctx = SearchContext(tt=TranspositionTable(1))
+        self.assertNotEqual(iterative_deepening(self.board, 1, ctx), queen_takes)
+        self.assertGreater(ctx.seldepth, 1)
+
+    ## FURTHER TESTING - mate scores count the plies to mate, so the shortest mate is preferred
+    def test_shortest_mate(self):
+        self.board.set_fen("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+        ctx = SearchContext(tt=TranspositionTable(16))
+        move = iterative_deepening(self.board, 3, ctx)
+        self.assertEqual(move, chess.Move.from_uci("d1d8"))
+        self.assertEqual(ctx.score, MATE_SCORE - 1)
+
+    ## INVALID
+    def test_unknown_pruning_technique(self):
+        with self.assertRaises(Exception):
+            SearchContext(pruning={"razoring": True})
+
+    # SearchContext.is_repetition()
+    ## NORMAL - a repetition inside the search is a draw
+    def test_repetition_in_search(self):
+        ctx = SearchContext()
+        position = ctx.set_root(self.board)
+        for uci in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+            self.assertFalse(ctx.is_repetition(position))
+            ctx.push(position, move_from_chess(chess.Move.from_uci(uci)))
+        self.assertTrue(ctx.is_repetition(position))
+
+    ## BOUNDARY - a position from the game history must have occurred twice before
+    def test_repetition_in_game_history(self):
+        for uci in ["g1f3", "g8f6", "f3g1", "f6g8", "g1f3"]:
+            self.board.push_uci(uci)
+        ctx = SearchContext()
+        position = ctx.set_root(self.board)
+        ctx.push(position, move_from_chess(chess.Move.from_uci("g8f6")))
+        self.assertFalse(ctx.is_repetition(position), "Second occurrence, no draw can be claimed")
+        ctx.pop(position)
+        for uci in ["g8f6", "f3g1", "f6g8", "g1f3"]:
+            self.board.push_uci(uci)
+        position = ctx.set_root(self.board)
+        ctx.push(position, move_from_chess(chess.Move.from_uci("g8f6")))
+        self.assertTrue(ctx.is_repetition(position), "Third occurrence")
+
+    ## BOUNDARY - positions before an irreversible move cannot repeat
+    def test_repetition_after_pawn_move(self):
+        for uci in ["g1f3", "g8f6", "f3g1", "f6g8", "e2e4"]:
+            self.board.push_uci(uci)
+        ctx = SearchContext()
+        position = ctx.set_root(self.board)
+        self.assertEqual(len(ctx.keys), 1)
+        self.assertFalse(ctx.is_repetition(position))
+
     ## INVALID
     def test_minimax_algorithm_swapped_alpha_beta(self):
         self.board.set_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
@@ -0,0 +1,77 @@
+import unittest
+import chess
+from src.ordering import MoveOrderer, HeuristicOrderer, MVV_LVA
+from src.movegen import get_ordered_moves, iterative_deepening, SearchContext
+from src.tt import TranspositionTable
+from src.position import Position, make_move, move_to_chess, move_from_chess
+
+
+class OrderingTest(unittest.TestCase):
+    def setUp(self):
+        self.board = chess.Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        self.position = Position(self.board)
+
+    ## MoveOrderer
+    # NORMAL - the static orderer matches get_ordered_moves
+    def test_static_orderer_matches_get_ordered_moves(self):
+        hash_move = chess.Move.from_uci("a2a3")
+        moves = [move_from_chess(move) for move in self.board.legal_moves]  # same order, so ties sort the same
+        ordered = MoveOrderer().order(self.position, move_from_chess(hash_move), 0, False, moves)
+        self.assertEqual([move_to_chess(move) for move in ordered], get_ordered_moves(self.board, hash_move, False))
+
+    ## HeuristicOrderer
+    # NORMAL - hash move first, then captures by MVV-LVA
+    def test_hash_move_then_captures(self):
+        hash_move = make_move(chess.A2, chess.A3)
+        moves = HeuristicOrderer().order(self.position, hash_move, 0, False)
+        self.assertEqual(moves[0], hash_move)
+        self.assertTrue(self.position.is_capture(moves[1]), "Captures should follow the hash move")
+        self.assertEqual(moves[1], make_move(chess.E2, chess.A6), "Bishop takes bishop has the best MVV-LVA score")
+        self.assertGreater(MVV_LVA[chess.QUEEN][chess.PAWN], MVV_LVA[chess.PAWN][chess.QUEEN])
+
+    # FURTHER - killers are ordered before other quiet moves
+    def test_killer_move_before_quiets(self):
+        orderer = HeuristicOrderer()
+        killer = make_move(chess.G2, chess.G3)
+        orderer.record_cutoff(self.position, killer, 3, 2, 5)
+        moves = orderer.order(self.position, None, 2, False)
+        quiet_moves = [move for move in moves if not self.position.is_capture(move) and not move >> 12]
+        self.assertEqual(quiet_moves[0], killer)
+        self.assertEqual(orderer.history[chess.WHITE][chess.G2 + chess.G3 * 64], 9)
+        self.assertEqual(orderer.first_move_cutoff_rate(), 0.0)
+
+    ## pick_moves()
+    # NORMAL - every legal move exactly once, hash move first, then captures
+    def test_pick_moves_yields_each_legal_move_once(self):
+        positions = [self.board, chess.Board("4k3/1P6/8/3pP3/8/8/8/4K3 w - d6 0 1"), chess.Board()]
+        for board in positions:
+            position = Position(board)
+            orderer = HeuristicOrderer()
+            hash_move = move_from_chess(list(board.legal_moves)[-1])
+            moves = list(orderer.pick_moves(position, hash_move, 0, False))
+            self.assertEqual(sorted(moves), sorted(move_from_chess(move) for move in board.legal_moves), board.fen())
+            self.assertEqual(moves[0], hash_move)
+
+    # FURTHER - stages are generated lazily
+    def test_pick_moves_stages(self):
+        picker = HeuristicOrderer().pick_moves(self.position, None, 0, False)
+        self.assertTrue(self.position.is_capture(next(picker)), "Captures come before quiet moves")
+
+    # INVALID - an illegal hash move is skipped
+    def test_pick_moves_illegal_hash_move(self):
+        moves = list(HeuristicOrderer().pick_moves(self.position, make_move(chess.A1, chess.A8), 0, False))
+        self.assertNotIn(make_move(chess.A1, chess.A8), moves)
+        self.assertEqual(len(moves), self.board.legal_moves.count())
+
+    # BOUNDARY - fewer nodes than the static ordering at the same depth, with the same move
+    def test_heuristic_ordering_searches_fewer_nodes(self):
+        static = SearchContext(tt=TranspositionTable(1), orderer=MoveOrderer())
+        heuristic = SearchContext(tt=TranspositionTable(1), orderer=HeuristicOrderer())
+        static_move = iterative_deepening(self.board, 3, static)
+        heuristic_move = iterative_deepening(self.board, 3, heuristic)
+        self.assertEqual(static_move, heuristic_move)
+        self.assertLess(heuristic.nodes, static.nodes)
+
+
+if __name__ == '__main__':
+    unittest.main()
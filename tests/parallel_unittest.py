@@ -0,0 +1,70 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+import chess
+# the module instances the worker pool reads its settings from
+import movegen
+import parallel
+from src.tt import PersistentTranspositionTable, TranspositionTable, DEFAULT_SIZE_MB, EXACT, zobrist_key
+from src.position import move_from_chess
+
+
+class ParallelTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        movegen.set_bitbase(os.path.join(cls.directory.name, "bitbase.bin"))
+
+    @classmethod
+    def tearDownClass(cls):
+        movegen.set_bitbase(None)
+        cls.directory.cleanup()
+
+    def tearDown(self):
+        parallel.shutdown()
+        if isinstance(movegen.transposition_table, PersistentTranspositionTable):
+            movegen.transposition_table.close()
+        movegen.set_hash_size(DEFAULT_SIZE_MB)
+
+    # get_pool()
+    ## NORMAL - spawned workers search with the table size, table file entries and bitbase of the main process
+    def test_spawned_workers(self):
+        path = os.path.join(self.directory.name, "tt.bin")
+        board = chess.Board("4k3/8/8/8/8/8/8/3QK3 w - - 0 1")
+        stored, searched = chess.Move.from_uci("d1d7"), chess.Move.from_uci("d1d2")
+        board.push(stored)
+        table = PersistentTranspositionTable(path, 1)
+        table.store(zobrist_key(board), 10, -1234, EXACT, None)
+        table.close()
+        board.pop()
+        movegen.set_hash_size(1)
+        movegen.set_hash_file(path)
+
+        pool = parallel.get_pool(1, multiprocessing.get_context("spawn"))
+        self.assertEqual(pool.submit(parallel.search_settings).result()[::2], (1, movegen.bitbase_path))
+        parallel._shared_bound.value = 0  # set by find_best_move_parallel from the first root move
+        value = pool.submit(parallel._search_root_move_task, board, move_from_chess(stored), 2, None, None).result()[0]
+        self.assertEqual(value, 1234, "The worker should start from the entries of the table file")
+        value = pool.submit(parallel._search_root_move_task, board, move_from_chess(searched), 2, None,
+                            None).result()[0]
+        self.assertGreaterEqual(value, movegen.KNOWN_WIN, "The worker should probe the bitbase")
+
+    ## BOUNDARY - the pool is restarted when the settings change
+    def test_restart_on_settings(self):
+        pool = parallel.get_pool(1)
+        self.assertIs(parallel.get_pool(1), pool)
+        movegen.set_hash_size(2)
+        self.assertIsNot(parallel.get_pool(1), pool)
+
+    # TranspositionTable.load_file()
+    ## INVALID - a file of another size is not loaded
+    def test_load_file_of_another_size(self):
+        path = os.path.join(self.directory.name, "other.bin")
+        PersistentTranspositionTable(path, 1).close()
+        self.assertFalse(TranspositionTable(2).load_file(path))
+        self.assertTrue(TranspositionTable(1).load_file(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
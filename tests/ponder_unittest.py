@@ -0,0 +1,108 @@
+import unittest
+import os
+import tempfile
+import time
+import chess
+import movegen  # the module instance the ponder search reads the opening book from
+from src.book import build_book
+from src.ponder import Ponderer
+from src.movegen import SearchContext, iterative_deepening, search_move
+from src.tt import TranspositionTable
+
+
+class PonderTest(unittest.TestCase):
+    def setUp(self):
+        self.ponderer = Ponderer()
+        self.board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+
+    def tearDown(self):
+        self.ponderer.stop()
+
+    # predict()
+    ## NORMAL - the expected reply is the second move of the principal variation
+    def test_predict_from_pv(self):
+        move, stats = search_move(3, self.board)
+        self.board.push(move)
+        predicted = Ponderer.predict(self.board, stats)
+        self.assertEqual(predicted, chess.Move.from_uci(stats.pv[1]))
+        self.assertTrue(self.board.is_legal(predicted))
+
+    # finish()
+    ## NORMAL - a hit returns the completed ponder search
+    def test_ponder_hit(self):
+        predicted = chess.Move.from_uci("f8c5")
+        self.board.push(chess.Move.from_uci("f1c4"))
+        self.ponderer.start(self.board, predicted, 2)
+        result = self.ponderer.finish(predicted)
+        self.assertIsNotNone(result)
+        move, stats = result
+        self.board.push(predicted)
+        self.assertTrue(self.board.is_legal(move))
+        self.assertEqual(stats.depth, 2)
+        self.assertEqual((self.ponderer.hits, self.ponderer.misses), (1, 0))
+        self.assertEqual(self.ponderer.hit_rate, 1.0)
+
+    ## NORMAL - a miss stops the ponder search
+    def test_ponder_miss(self):
+        self.board.push(chess.Move.from_uci("f1c4"))
+        self.ponderer.start(self.board, chess.Move.from_uci("f8c5"), None)
+        self.assertIsNone(self.ponderer.finish(chess.Move.from_uci("g8f6")))
+        self.assertIsNone(self.ponderer.thread)
+        self.assertEqual((self.ponderer.hits, self.ponderer.misses), (0, 1))
+
+    ## BOUNDARY - nothing is being pondered
+    def test_finish_without_ponder(self):
+        self.assertIsNone(self.ponderer.finish(chess.Move.from_uci("e2e4")))
+        self.assertEqual(self.ponderer.hit_rate, 0.0)
+
+    ## FURTHER TESTING - on a hit, the time budget counts from the start of the ponder search
+    def test_ponder_hit_movetime(self):
+        predicted = chess.Move.from_uci("f8c5")
+        self.board.push(chess.Move.from_uci("f1c4"))
+        self.ponderer.start(self.board, predicted, None, movetime=0.3)
+        time.sleep(0.5)
+        t0 = time.perf_counter()
+        move, stats = self.ponderer.finish(predicted)
+        self.assertLess(time.perf_counter() - t0, 0.3, "Search should stop soon after a late ponder hit")
+        self.assertIsNotNone(move)
+        self.assertGreater(self.ponderer.saved_time, 0.3)
+
+    ## FURTHER TESTING - a pondered position in the book plays the book move, as search_move does
+    def test_ponder_hit_book(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pgn_path, book_path = os.path.join(directory, "games.pgn"), os.path.join(directory, "book.bin")
+            with open(pgn_path, "w") as f:
+                f.write('[Result "*"]\n\n1. e4 e5 2. Nf3 *\n')
+            build_book(pgn_path, book_path)
+            movegen.set_book(book_path)
+            try:
+                board = chess.Board()
+                board.push(chess.Move.from_uci("e2e4"))
+                predicted = chess.Move.from_uci("e7e5")
+                self.ponderer.start(board, predicted, 3)
+                move, stats = self.ponderer.finish(predicted)
+            finally:
+                movegen.set_book(None)
+        self.assertEqual(move, chess.Move.from_uci("g1f3"))
+        self.assertTrue(stats.book_move)
+
+    ## INVALID - a parallel search is not pondered
+    def test_no_ponder_with_workers(self):
+        predicted = chess.Move.from_uci("f8c5")
+        self.board.push(chess.Move.from_uci("f1c4"))
+        self.assertFalse(self.ponderer.start(self.board, predicted, 2, workers=2))
+        self.assertIsNone(self.ponderer.thread)
+        self.assertIsNone(self.ponderer.finish(predicted))
+        self.assertEqual((self.ponderer.hits, self.ponderer.misses), (0, 0))
+
+    # SearchContext.stop()
+    ## BOUNDARY - a stop aborts even the first iteration
+    def test_stop_first_iteration(self):
+        ctx = SearchContext(tt=TranspositionTable(1))
+        ctx.stop()
+        self.assertIsNone(iterative_deepening(self.board, 3, ctx))
+        self.assertEqual(len(self.board.move_stack), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
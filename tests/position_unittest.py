@@ -0,0 +1,124 @@
+import unittest
+import random
+import chess
+import chess.polyglot
+from src.position import Position, NULL_MOVE, make_move, move_to_chess, move_from_chess
+from src.eval import evaluate_board, check_end_game
+from src.movegen import is_draw_by_rule
+
+# perft positions from https://www.chessprogramming.org/Perft_Results
+PERFT_POSITIONS = [
+    chess.STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+]
+
+
+def board_perft(board: chess.Board, depth: int) -> int:
+    if depth == 1:
+        return board.legal_moves.count()
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += board_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+class PositionTest(unittest.TestCase):
+    # perft()
+    ## NORMAL - same leaf counts as python-chess
+    def test_perft_matches_python_chess(self):
+        for fen in PERFT_POSITIONS:
+            board = chess.Board(fen)
+            self.assertEqual(Position(board).perft(3), board_perft(board, 3), fen)
+
+    ## NORMAL - known counts from the perft results page
+    def test_perft_known_counts(self):
+        self.assertEqual(Position().perft(4), 197281)
+        self.assertEqual(Position(chess.Board(PERFT_POSITIONS[3])).perft(3), 9467)
+
+    ## BOUNDARY
+    def test_perft_depth_zero(self):
+        self.assertEqual(Position().perft(0), 1)
+
+    # generate_legal_moves()/push()/pop()
+    ## FURTHER TESTING - random games: moves, captures, checks and keys match python-chess after each make/unmake
+    def test_random_games(self):
+        rng = random.Random(7)
+        for _ in range(20):
+            board = chess.Board()
+            position = Position(board)
+            for _ in range(150):
+                moves = sorted(move_from_chess(move) for move in board.legal_moves)
+                self.assertEqual(sorted(position.generate_legal_moves()), moves, board.fen())
+                self.assertEqual(sorted(position.generate_legal_captures()),
+                                 sorted(move_from_chess(move) for move in board.generate_legal_captures()), board.fen())
+                self.assertEqual(position.key, chess.polyglot.zobrist_hash(board), board.fen())
+                self.assertEqual(position.is_check(), board.is_check())
+                self.assertEqual(position.has_legal_moves(), bool(moves))
+                if not moves:
+                    break
+                move = rng.choice(moves)
+                board.push(move_to_chess(move))
+                position.push(move)
+                if rng.random() < 0.2:
+                    board.pop()
+                    position.pop()
+            while board.move_stack:
+                board.pop()
+                position.pop()
+            self.assertEqual(position.to_board().fen(), board.fen())
+
+    ## BOUNDARY - en passant that would expose the king along the rank is not legal
+    def test_en_passant_pin(self):
+        board = chess.Board("8/8/8/KPp4r/8/8/8/7k w - c6 0 2")
+        moves = Position(board).generate_legal_moves()
+        self.assertNotIn(make_move(chess.B5, chess.C6), moves)
+        self.assertEqual(sorted(moves), sorted(move_from_chess(move) for move in board.legal_moves))
+
+    ## BOUNDARY - the null move only passes the turn
+    def test_null_move(self):
+        board = chess.Board("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2")
+        position = Position(board)
+        position.push(NULL_MOVE)
+        board.push(chess.Move.null())
+        self.assertEqual(position.key, chess.polyglot.zobrist_hash(board))
+        self.assertEqual(position.to_board().fen(), board.fen())
+        position.pop()
+        self.assertEqual(position.turn, chess.WHITE)
+
+    # move conversion
+    ## NORMAL
+    def test_move_conversion(self):
+        for uci in ("e2e4", "e1g1", "a7a8q", "b2b1n"):
+            move = chess.Move.from_uci(uci)
+            self.assertEqual(move_to_chess(move_from_chess(move)), move)
+        self.assertEqual(move_from_chess(chess.Move.null()), NULL_MOVE)
+
+    ## INVALID
+    def test_chess960_position(self):
+        with self.assertRaises(Exception):
+            Position(chess.Board(chess960=True))
+
+    # eval and movegen on a Position
+    ## NORMAL
+    def test_evaluate_position(self):
+        for fen in PERFT_POSITIONS:
+            board = chess.Board(fen)
+            position = Position(board)
+            self.assertEqual(evaluate_board(position), evaluate_board(board), fen)
+            self.assertEqual(check_end_game(position), check_end_game(board), fen)
+
+    ## BOUNDARY
+    def test_draw_by_rule(self):
+        self.assertTrue(is_draw_by_rule(Position(chess.Board("8/8/4k3/8/8/3KN3/8/8 w - - 0 1"))))
+        self.assertFalse(is_draw_by_rule(Position(chess.Board("8/8/4k3/8/8/3KR3/8/8 w - - 0 1"))))
+        self.assertTrue(is_draw_by_rule(Position(chess.Board("8/8/4k3/8/8/3KR3/8/8 w - - 100 80"))))
+
+
+if __name__ == '__main__':
+    unittest.main()
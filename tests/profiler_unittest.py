@@ -0,0 +1,76 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+import chess
+from src.profiler import Profiler, profile_call
+from src import movegen
+
+
+def _leaf(n):
+    return sum(i * i for i in range(n))
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += _leaf(200)
+    return total
+
+
+class ProfilerTest(unittest.TestCase):
+    # Profiler - deterministic
+    ## NORMAL - every call is on a stack below the function the profiler was started from
+    def test_deterministic_stacks(self):
+        result, profiler = profile_call("deterministic", _busy, 0.05)
+        self.assertGreater(result, 0)
+        stacks = list(profiler.stacks)
+        root = "profiler_unittest.py:ProfilerTest.test_deterministic_stacks"
+        self.assertTrue(all(stack[0] == root for stack in stacks))
+        self.assertIn((root, "profiler.py:profile_call", "profiler_unittest.py:_busy", "profiler_unittest.py:_leaf"),
+                      stacks)
+        self.assertFalse(any("Profiler.start" in name for stack in stacks for name in stack))
+        self.assertIsNone(sys.getprofile(), "Profiling should be switched off after stop")
+
+    ## NORMAL - a function's total time covers its callees, and self times add up to the profiled time
+    def test_summary(self):
+        _, profiler = profile_call("deterministic", _busy, 0.05)
+        rows = {row["function"]: row for row in profiler.summary()}
+        busy, leaf = rows["profiler_unittest.py:_busy"], rows["profiler_unittest.py:_leaf"]
+        self.assertGreaterEqual(busy["total"], leaf["total"] + busy["self"] - 1e-9)
+        self.assertAlmostEqual(sum(row["self"] for row in rows.values()), sum(profiler.stacks.values()))
+
+    # Profiler - sampling
+    ## NORMAL
+    def test_sampling(self):
+        with Profiler("sampling") as profiler:
+            _busy(0.2)
+        self.assertGreater(len(profiler.stacks), 0)
+        self.assertIn("profiler_unittest.py:_busy", {row["function"] for row in profiler.summary()})
+        self.assertAlmostEqual(profiler.elapsed, 0.2, delta=0.1)
+
+    ## INVALID
+    def test_unknown_mode(self):
+        with self.assertRaises(Exception):
+            Profiler("instrumenting")
+
+    # Profiler.write()
+    ## FURTHER TESTING - a search profile is written as collapsed stacks and a summary
+    def test_write_search_profile(self):
+        (move, _), profiler = profile_call("deterministic", movegen.search_move, 2, chess.Board())
+        self.assertIsNotNone(move)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profiles", "ply_0")
+            profiler.write(path)
+            with open(path + ".folded") as f:
+                lines = f.read().splitlines()
+            with open(path + ".txt") as f:
+                self.assertIn("movegen.py:negamax", f.read())
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+        self.assertTrue(any("movegen.py:search_move;movegen.py:iterative_deepening" in line for line in lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
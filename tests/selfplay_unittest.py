@@ -0,0 +1,71 @@
+import unittest
+import math
+import chess
+from src.selfplay import parse_config, adjudicate, elo, expected_score, match_statistics, sprt, run_tournament, \
+    DEFAULT_OPENINGS, DRAW_PLIES, RESIGN_SCORE
+
+
+class SelfPlayTest(unittest.TestCase):
+    # parse_config()
+    ## NORMAL
+    def test_parse_config(self):
+        config = parse_config("depth=4,movetime=0.5,null_move=0,quiescence=off", "test")
+        self.assertEqual((config["name"], config["depth"], config["movetime"]), ("test", 4, 0.5))
+        self.assertEqual(config["pruning"], {"null_move": False})
+        self.assertFalse(config["quiescence"])
+        self.assertEqual(parse_config("", "default")["depth"], 3)
+
+    ## INVALID
+    def test_parse_config_unknown_key(self):
+        with self.assertRaises(Exception):
+            parse_config("depht=4", "test")
+
+    # adjudicate()
+    ## NORMAL - both sides agreeing a side is lost ends the game
+    def test_adjudicate_resign(self):
+        board = chess.Board()
+        self.assertEqual(adjudicate(board, [0, RESIGN_SCORE, RESIGN_SCORE + 50, RESIGN_SCORE, RESIGN_SCORE]),
+                         ("1-0", "adjudication"))
+        self.assertEqual(adjudicate(board, [-RESIGN_SCORE] * 3), (None, None))
+
+    ## BOUNDARY - level scores are only adjudicated as a draw late in the game
+    def test_adjudicate_draw(self):
+        board = chess.Board("8/5k2/8/8/8/8/2K5/8 w - - 0 40")
+        self.assertEqual(adjudicate(board, [0] * DRAW_PLIES), ("1/2-1/2", "adjudication"))
+        self.assertEqual(adjudicate(chess.Board(), [0] * DRAW_PLIES), (None, None))
+
+    # match_statistics()/elo()
+    ## NORMAL
+    def test_match_statistics(self):
+        self.assertEqual(elo(0.5), 0)
+        self.assertAlmostEqual(expected_score(elo(0.64)), 0.64)
+        stats = match_statistics(30, 40, 30)
+        self.assertEqual(stats["elo"], 0)
+        self.assertAlmostEqual(stats["elo_lower"], -stats["elo_upper"])
+        self.assertLess(stats["elo_lower"], 0)
+
+    ## BOUNDARY - a clean sweep has no upper bound
+    def test_match_statistics_sweep(self):
+        stats = match_statistics(10, 0, 0)
+        self.assertEqual(stats["elo"], math.inf)
+
+    # sprt()
+    ## NORMAL - a clear gain accepts H1, a clear loss H0, a close match needs more games
+    def test_sprt(self):
+        self.assertEqual(sprt(600, 300, 100, 0, 5)["verdict"], "H1")
+        self.assertEqual(sprt(100, 300, 600, 0, 5)["verdict"], "H0")
+        self.assertEqual(sprt(5, 10, 5, 0, 5)["verdict"], "continue")
+
+    # run_tournament()
+    ## FURTHER TESTING - an opening is played with both colours and every game is counted
+    def test_run_tournament(self):
+        first, second = parse_config("depth=1", "first"), parse_config("depth=1,nodes=50", "second")
+        results, summary = run_tournament(first, second, 2, DEFAULT_OPENINGS[:1])
+        self.assertEqual([(game["white"], game["black"]) for game in results], [("first", "second"),
+                                                                                ("second", "first")])
+        self.assertEqual(summary["wins"] + summary["draws"] + summary["losses"], 2)
+        self.assertGreater(summary["engines"]["first"]["nodes_per_move"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
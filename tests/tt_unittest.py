@@ -0,0 +1,145 @@
+import unittest
+import os
+import tempfile
+import chess
+from src.tt import TranspositionTable, PersistentTranspositionTable, EXACT, LOWER, UPPER, ENTRY_SIZE, \
+    FILE_HEADER_SIZE, zobrist_key
+from src.position import make_move
+
+
+class TranspositionTableTest(unittest.TestCase):
+    def setUp(self):
+        self.tt = TranspositionTable(size_mb=1)
+        self.board = chess.Board()
+
+    # store()/probe()
+    ## NORMAL
+    def test_store_and_probe(self):
+        key = zobrist_key(self.board)
+        move = make_move(chess.E2, chess.E4)
+        self.tt.store(key, 3, 25, EXACT, move)
+        self.assertEqual(self.tt.probe(key), (3, 25, EXACT, move))
+        self.assertEqual(self.tt.hits, 1)
+
+    ## BOUNDARY
+    def test_probe_missing_position(self):
+        self.assertIsNone(self.tt.probe(zobrist_key(self.board)))
+        self.assertEqual(self.tt.misses, 1)
+
+    ## FURTHER TESTING - promotions fit in the 16 bit move field, and a position stored without a move keeps its move
+    def test_move_field(self):
+        key = zobrist_key(self.board)
+        move = make_move(chess.G7, chess.G8, chess.QUEEN)
+        self.tt.store(key, 1, 0, EXACT, move)
+        self.assertEqual(self.tt.probe(key)[3], move)
+        self.tt.store(key, 2, 0, LOWER, None)
+        self.assertEqual(self.tt.probe(key)[3], move)
+        self.assertIsNone(self.tt.probe(key + 1), "No entry")
+        self.tt.store(key + 1, 1, 0, EXACT, None)
+        self.assertIsNone(self.tt.probe(key + 1)[3])
+
+    # replacement policy
+    ## NORMAL - a shallower search goes to the always-replace slot
+    def test_depth_preferred_slot_is_kept(self):
+        tt = TranspositionTable(size_mb=32 / (1024 * 1024))  # a single bucket
+        tt.store(1, 5, 10, LOWER, None)
+        tt.store(2, 1, 20, UPPER, None)
+        tt.store(3, 2, 30, EXACT, None)
+        self.assertEqual(tt.probe(1)[0], 5, "Deep entry should stay in the depth-preferred slot")
+        self.assertIsNone(tt.probe(2), "Always-replace slot should hold the latest shallow entry")
+        self.assertEqual(tt.probe(3)[1], 30)
+        self.assertEqual(tt.collisions, 1)
+
+    ## BOUNDARY - entries from an older search can be replaced by any depth
+    def test_old_generation_is_replaced(self):
+        tt = TranspositionTable(size_mb=2 * ENTRY_SIZE / (1024 * 1024))
+        tt.store(1, 5, 10, EXACT, None)
+        tt.new_search()
+        tt.store(2, 1, 20, EXACT, None)
+        tt.store(3, 1, 30, EXACT, None)
+        self.assertIsNone(tt.probe(1))
+
+    # clear()
+    ## NORMAL
+    def test_clear(self):
+        key = zobrist_key(self.board)
+        self.tt.store(key, 1, 0, EXACT, None)
+        self.tt.clear()
+        self.assertIsNone(self.tt.probe(key))
+        self.assertEqual(self.tt.stats()["stores"], 0)
+
+
+class PersistentTranspositionTableTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "tt.bin")
+        self.key = zobrist_key(chess.Board())
+        self.move = make_move(chess.E2, chess.E4)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write_table(self):
+        tt = PersistentTranspositionTable(self.path, size_mb=1)
+        tt.new_search()
+        tt.store(self.key, 4, 30, EXACT, self.move)
+        tt.close()
+
+    # PersistentTranspositionTable()
+    ## NORMAL - a closed table is loaded warm by the next process
+    def test_warm_start(self):
+        self._write_table()
+        tt = PersistentTranspositionTable(self.path, size_mb=1)
+        self.assertTrue(tt.warm)
+        self.assertIsNone(tt.load_error)
+        self.assertEqual(tt.probe(self.key), (4, 30, EXACT, self.move))
+        self.assertEqual(tt.generation, 1)
+        tt.close()
+
+    ## BOUNDARY - a new file starts cold and empty
+    def test_cold_start(self):
+        tt = PersistentTranspositionTable(self.path, size_mb=1)
+        self.assertFalse(tt.warm)
+        self.assertIsNone(tt.probe(self.key))
+        self.assertEqual(os.path.getsize(self.path), FILE_HEADER_SIZE + tt.num_buckets * 2 * ENTRY_SIZE)
+        tt.close()
+
+    ## INVALID - corrupt entries, a different size or another kind of file start cold
+    def test_invalid_file(self):
+        self._write_table()
+        with open(self.path, "r+b") as f:
+            f.seek(FILE_HEADER_SIZE + 100)
+            f.write(b"\xff")
+        tt = PersistentTranspositionTable(self.path, size_mb=1)
+        self.assertFalse(tt.warm)
+        self.assertIn("checksum", tt.load_error)
+        self.assertIsNone(tt.probe(self.key))
+        tt.close()
+
+        self._write_table()
+        tt = PersistentTranspositionTable(self.path, size_mb=2)
+        self.assertFalse(tt.warm)
+        tt.close()
+
+        with open(self.path, "wb") as f:
+            f.write(b"not a transposition table")
+        tt = PersistentTranspositionTable(self.path, size_mb=1)
+        self.assertFalse(tt.warm)
+        tt.store(self.key, 1, 0, EXACT, None)
+        tt.close()
+
+    ## FURTHER TESTING - entries stored after the last flush, as when the process is killed, are not trusted
+    def test_unflushed_changes(self):
+        tt = PersistentTranspositionTable(self.path, size_mb=1)
+        tt.flush()
+        tt.store(self.key, 4, 30, EXACT, self.move)
+        tt.data.flush()
+        tt2 = PersistentTranspositionTable(self.path, size_mb=1)
+        self.assertFalse(tt2.warm)
+        tt2.close()
+        tt.data.close()
+        tt.file.close()
+
+
+if __name__ == '__main__':
+    unittest.main()